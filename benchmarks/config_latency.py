@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Offline keystroke-latency benchmark for the Toshy config files.
+
+Loads `toshy_config.py` and/or `toshy_config_barebones.py` against a stub of the
+`keyszer` API (no input devices, no uinput, no desktop needed), then replays a
+synthetic stream of (window class, title, device, key combo) events through a
+minimal copy of keyszer's modmap -> multipurpose modmap -> keymap pipeline.
+
+Reports, per config:
+    - config load time and number of registered maps
+    - per-event latency percentiles of the map condition evaluation
+    - memory allocated while replaying (tracemalloc, in a separate pass)
+
+Usage (from the repo root):
+
+    python3 benchmarks/config_latency.py
+    python3 benchmarks/config_latency.py --events 50000 --seed 7
+    python3 benchmarks/config_latency.py --config default-toshy-config/toshy_config.py
+    python3 benchmarks/config_latency.py --desktop kde --session wayland --json results.json
+
+Each config is loaded from a temporary copy (with the repo `lib` folder next to it),
+so the user preferences database created by the config never lands in the repo.
+"""
+
+import os
+import sys
+import json
+import time
+import enum
+import types
+import random
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+from typing import Dict, List, Tuple
+
+this_file_path      = os.path.abspath(__file__)
+repo_root           = os.path.dirname(os.path.dirname(this_file_path))
+default_configs     = [
+    os.path.join(repo_root, 'default-toshy-config', 'toshy_config.py'),
+    os.path.join(repo_root, 'default-toshy-config', 'toshy_config_barebones.py'),
+]
+
+
+###############################################################################
+# Stub "keyszer" API
+
+# Modifier aliases accepted in C("...") strings, reduced to one name each
+MODIFIER_ALIASES = {
+    'C': 'C', 'CTRL': 'C', 'LC': 'LC', 'LCTRL': 'LC', 'RC': 'RC', 'RCTRL': 'RC',
+    'M': 'Alt', 'ALT': 'Alt', 'LM': 'LAlt', 'LALT': 'LAlt', 'RM': 'RAlt', 'RALT': 'RAlt',
+    'OPT': 'Alt', 'ROPT': 'RAlt', 'LOPT': 'LAlt',
+    'SHIFT': 'Shift', 'LSHIFT': 'LShift', 'RSHIFT': 'RShift',
+    'SUPER': 'Super', 'WIN': 'Super', 'CMD': 'Super', 'META': 'Super',
+    'LSUPER': 'LSuper', 'LWIN': 'LSuper', 'LCMD': 'LSuper', 'LMETA': 'LSuper',
+    'RSUPER': 'RSuper', 'RWIN': 'RSuper', 'RCMD': 'RSuper', 'RMETA': 'RSuper',
+    'FN': 'Fn',
+}
+
+
+class _KeyMeta(type):
+    """Any Key.NAME attribute is a valid key, created on first use."""
+    def __getattr__(cls, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        key = cls(name)
+        setattr(cls, name, key)
+        return key
+
+    def __getitem__(cls, name):
+        return getattr(cls, name.upper())
+
+
+class Key(metaclass=_KeyMeta):
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"Key.{self.name}"
+
+
+class Combo:
+    def __init__(self, modifiers, key):
+        self.modifiers  = frozenset(modifiers)
+        self.key        = key
+        self._hash      = hash((self.modifiers, key))
+
+    def __eq__(self, other):
+        return (isinstance(other, Combo) and
+                other.key is self.key and other.modifiers == self.modifiers)
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return '-'.join(sorted(self.modifiers) + [self.key.name])
+
+
+def C(exp: str) -> Combo:
+    *mods, key_name = exp.split('-')
+    return Combo([MODIFIER_ALIASES.get(mod.upper(), mod) for mod in mods], Key[key_name])
+
+
+class ComboHint(enum.IntEnum):
+    BIND        = 1
+    ESCAPE_NEXT = 2
+    IGNORE      = 3
+
+
+class _Map:
+    def __init__(self, name, mappings, when=None):
+        self.name           = name
+        self.mappings       = mappings
+        self.conditional    = when
+
+    def __contains__(self, key):
+        return key in self.mappings
+
+    def __getitem__(self, key):
+        return self.mappings[key]
+
+    def matches(self, ctx):
+        return self.conditional is None or self.conditional(ctx)
+
+
+class KeyContext:
+    """Stand-in for keyszer's KeyContext, with the window info already known."""
+    def __init__(self, wm_class='', wm_name='', device_name='',
+                        numlock_on=False, capslock_on=False):
+        self.wm_class       = wm_class
+        self.wm_name        = wm_name
+        self.device_name    = device_name
+        self.numlock_on     = numlock_on
+        self.capslock_on    = capslock_on
+        self.x_error        = False
+
+
+def _build_config_api():
+    api = types.ModuleType('keyszer.config_api')
+    api.Key, api.Combo, api.C, api.ComboHint = Key, Combo, C, ComboHint
+    api.bind            = ComboHint.BIND
+    api.ignore_key      = ComboHint.IGNORE
+    api.escape_next_key = ComboHint.ESCAPE_NEXT
+    api._MODMAPS, api._MULTI_MODMAPS, api._KEYMAPS = [], [], []
+    api.DUMP_DIAGNOSTICS_KEY = None
+    api.EMERGENCY_EJECT_KEY = None
+
+    def modmap(name, mappings, when=None):
+        _map = _Map(name, mappings, when)
+        api._MODMAPS.append(_map)
+        return _map
+
+    def multipurpose_modmap(name, mappings, when=None):
+        _map = _Map(name, mappings, when)
+        api._MULTI_MODMAPS.append(_map)
+        return _map
+
+    def keymap(name, mappings, when=None):
+        _map = _Map(name, mappings, when)
+        api._KEYMAPS.append(_map)
+        return _map
+
+    def dump_diagnostics_key(key):
+        api.DUMP_DIAGNOSTICS_KEY = key
+
+    def emergency_eject_key(key):
+        api.EMERGENCY_EJECT_KEY = key
+
+    def _no_op(*args, **kwargs):
+        pass
+
+    def _command(*args, **kwargs):
+        return lambda *a, **k: None
+
+    api.modmap, api.multipurpose_modmap, api.keymap = modmap, multipurpose_modmap, keymap
+    api.dump_diagnostics_key = dump_diagnostics_key
+    api.emergency_eject_key = emergency_eject_key
+    api.timeouts = api.throttle_delays = api.environ_api = _no_op
+    api.to_US_keystrokes = api.unicode_keystrokes = api.sleep = api.usleep = _command
+    api.__all__ = [name for name in vars(api) if not name.startswith('__')]
+    return api
+
+
+def _build_transform(api):
+    """Minimal copy of keyszer's event pipeline, looking functions up as globals
+    (like keyszer does) so the config's hooks on them are used."""
+    transform = types.ModuleType('keyszer.transform')
+    source = '''
+_pressed_mods = []
+_MODMAPS = _MULTI_MODMAPS = _KEYMAPS = None
+
+def boot_config():
+    global _MODMAPS, _MULTI_MODMAPS, _KEYMAPS
+    _MODMAPS        = [_Map('default', {})] + [m for m in api._MODMAPS if m.conditional]
+    _MULTI_MODMAPS  = [_Map('default', {})] + [m for m in api._MULTI_MODMAPS if m.conditional]
+    _KEYMAPS        = list(api._KEYMAPS)
+
+def get_pressed_mods():
+    return _pressed_mods
+
+def dump_diagnostics():
+    pass
+
+class Keystate:
+    __slots__ = ('inkey', 'key')
+    def __init__(self, inkey):
+        self.inkey  = inkey
+        self.key    = None
+
+def apply_modmap(keystate, context):
+    inkey = keystate.inkey
+    keystate.key = inkey
+    for modmap in _MODMAPS[1:]:
+        if inkey in modmap and modmap.conditional(context):
+            keystate.key = modmap[inkey]
+            return
+
+def apply_multi_modmap(keystate, context):
+    for modmap in _MULTI_MODMAPS[1:]:
+        if modmap.conditional(context):
+            return
+
+def transform_key(key, action, ctx):
+    combo = Combo(_pressed_mods, key)
+    for keymap in [km for km in _KEYMAPS if km.matches(ctx)]:
+        if combo in keymap:
+            return keymap.name
+    return None
+
+def on_event(combo, ctx):
+    global _pressed_mods
+    _pressed_mods = list(combo.modifiers)
+    keystate = Keystate(combo.key)
+    apply_modmap(keystate, ctx)
+    apply_multi_modmap(keystate, ctx)
+    return transform_key(keystate.key, 1, ctx)
+'''
+    transform.__dict__.update({'api': api, '_Map': _Map, 'Combo': Combo})
+    exec(source, transform.__dict__)
+    return transform
+
+
+def install_stubs():
+    """Put a fresh stub `keyszer` (and `watchdog`, if missing) into sys.modules."""
+    for mod_name in list(sys.modules):
+        if mod_name == 'keyszer' or mod_name.startswith('keyszer.'):
+            del sys.modules[mod_name]
+
+    def package(name):
+        module = types.ModuleType(name)
+        module.__path__ = []
+        sys.modules[name] = module
+        return module
+
+    keyszer_pkg             = package('keyszer')
+    keyszer_lib             = package('keyszer.lib')
+    keyszer_models          = package('keyszer.models')
+
+    logger = types.ModuleType('keyszer.lib.logger')
+    logger.VERBOSE = False
+    def debug(*args, ctx="DD"):
+        if logger.VERBOSE:
+            print(f"({ctx})", *args)
+    def _printer(default_ctx):
+        def _print(*args, ctx=default_ctx):
+            print(f"({ctx})", *args)
+        return _print
+    logger.debug = debug
+    logger.error, logger.warn = _printer("EE"), _printer("WW")
+    logger.info = logger.log = _printer("--")
+
+    key_context             = types.ModuleType('keyszer.lib.key_context')
+    key_context.KeyContext  = KeyContext
+    combo_mod               = types.ModuleType('keyszer.models.combo')
+    combo_mod.Combo         = Combo
+    combo_mod.ComboHint     = ComboHint
+    api                     = _build_config_api()
+    transform               = _build_transform(api)
+
+    for module in (logger, key_context, combo_mod, api, transform):
+        sys.modules[module.__name__] = module
+    keyszer_pkg.config_api, keyszer_pkg.transform = api, transform
+    keyszer_pkg.lib, keyszer_pkg.models = keyszer_lib, keyszer_models
+    keyszer_lib.logger, keyszer_lib.key_context = logger, key_context
+    keyszer_models.combo = combo_mod
+
+    try:
+        import watchdog.observers   # noqa: F401
+        import watchdog.events      # noqa: F401
+    except ImportError:
+        watchdog_pkg = package('watchdog')
+        observers = types.ModuleType('watchdog.observers')
+        events = types.ModuleType('watchdog.events')
+        class Observer:
+            def schedule(self, *args, **kwargs): pass
+            def start(self): pass
+        class FileSystemEvent: pass
+        class FileSystemEventHandler: pass
+        observers.Observer = Observer
+        events.FileSystemEvent, events.FileSystemEventHandler = FileSystemEvent, FileSystemEventHandler
+        sys.modules['watchdog.observers'], sys.modules['watchdog.events'] = observers, events
+        watchdog_pkg.observers, watchdog_pkg.events = observers, events
+
+    return api, transform
+
+
+###############################################################################
+# Config loading
+
+def load_config(config_path: str, work_dir: str):
+    """Exec a config file the way keyszer does, from a temporary copy."""
+    api, transform = install_stubs()
+    for mod_name in list(sys.modules):
+        if mod_name == 'lib' or mod_name.startswith('lib.'):
+            del sys.modules[mod_name]
+
+    cfg_dir = tempfile.mkdtemp(dir=work_dir)
+    shutil.copytree(os.path.join(repo_root, 'lib'), os.path.join(cfg_dir, 'lib'))
+    cfg_copy = os.path.join(cfg_dir, os.path.basename(config_path))
+    shutil.copy(config_path, cfg_copy)
+
+    # NotificationManager runs 'notify-send' when created, so don't depend on it
+    sys.path.insert(0, cfg_dir)
+    import lib.notification_manager
+    lib.notification_manager.NotificationManager.check_p_option = staticmethod(lambda: False)
+
+    config_globals = {'__config__': cfg_copy, '__name__': '__config__'}
+    with open(cfg_copy, 'r', encoding='UTF-8') as f:
+        code = compile(f.read(), cfg_copy, 'exec')
+    start = time.perf_counter()
+    _exec_config(code, config_globals)
+    load_secs = time.perf_counter() - start
+    sys.path.remove(cfg_dir)
+    transform.boot_config()
+    return api, transform, load_secs
+
+
+def _exec_config(code, config_globals):
+    # The config finds its own path in the globals of the frame that runs it,
+    # like keyszer's loader module, so it has to be a global of this module.
+    globals()['__config__'] = config_globals['__config__']
+    exec(code, config_globals)
+
+
+###############################################################################
+# Synthetic event stream
+
+WINDOWS = [
+    ('kitty', 'user@host: ~'),
+    ('org.kde.konsole', 'Konsole'),
+    ('gnome-terminal-server', 'Terminal'),
+    ('firefox', 'Mozilla Firefox'),
+    ('Google-chrome', 'New Tab - Google Chrome'),
+    ('Vivaldi-stable', 'Vivaldi'),
+    ('code', 'file.py - Visual Studio Code'),
+    ('jetbrains-pycharm', 'project - PyCharm'),
+    ('org.gnome.Nautilus', 'Home'),
+    ('dolphin', 'Home - Dolphin'),
+    ('thunderbird', 'Inbox - Mozilla Thunderbird'),
+    ('org.remmina.Remmina', 'Remote Desktop'),
+    ('gedit', 'Untitled Document 1 - gedit'),
+    ('libreoffice-writer', 'Untitled 1 - LibreOffice Writer'),
+    ('', ''),
+]
+
+DEVICES = [
+    'AT Translated Set 2 keyboard',
+    'Apple Inc. Apple Internal Keyboard / Trackpad',
+    'Apple Magic Keyboard',
+    'Google Chromebook keyboard',
+    'IBM Model M',
+    'Logitech K380 Keyboard',
+]
+
+COMBOS = (
+    # plain typing dominates real streams
+    [c for c in 'ABCDEFGHIJKLMNOPQRSTUVWXYZ'] * 6 +
+    ['Space', 'Enter', 'Backspace', 'Tab', 'Esc', 'Left', 'Right', 'Up', 'Down',
+     'Shift-A', 'Shift-Key_1', 'Dot', 'Comma'] * 3 +
+    ['RC-C', 'RC-V', 'RC-X', 'RC-Z', 'RC-S', 'RC-T', 'RC-W', 'RC-Q', 'RC-Tab',
+     'Shift-RC-Tab', 'RC-Left', 'RC-Right', 'RC-Backspace', 'Alt-Left', 'Alt-E',
+     'Alt-U', 'Super-Space', 'LEFT_META', 'LEFT_ALT', 'RIGHT_CTRL', 'CAPSLOCK',
+     'KP1', 'KP8', 'PLAYPAUSE']
+)
+
+
+def make_event_stream(count: int, seed: int) -> List[Tuple[Combo, KeyContext]]:
+    """Bursts of typing in one window, with focus/device changes between bursts."""
+    rnd = random.Random(seed)
+    events = []
+    while len(events) < count:
+        wm_class, wm_name = rnd.choice(WINDOWS)
+        device = rnd.choice(DEVICES)
+        numlock = rnd.random() < 0.5
+        for _ in range(rnd.randint(5, 60)):
+            # keyszer makes a new context object for every event, so keep only the args
+            events.append((C(rnd.choice(COMBOS)), (wm_class, wm_name, device, numlock, False)))
+    return events[:count]
+
+
+###############################################################################
+# Measurement
+
+def percentile(ordered: List[int], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def replay(transform, events) -> List[int]:
+    on_event = transform.on_event
+    perf_counter_ns = time.perf_counter_ns
+    timings = []
+    for combo, ctx_args in events:
+        ctx = KeyContext(*ctx_args)
+        start = perf_counter_ns()
+        on_event(combo, ctx)
+        timings.append(perf_counter_ns() - start)
+    return timings
+
+
+def measure_allocations(transform, events) -> Dict[str, float]:
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    replay(transform, events)
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'alloc_peak_kib':           (peak - before) / 1024,
+        'alloc_net_bytes_per_event': (after - before) / max(1, len(events)),
+    }
+
+
+def bench_config(config_path: str, events, work_dir: str, warmup: int) -> Dict[str, float]:
+    api, transform, load_secs = load_config(config_path, work_dir)
+    replay(transform, events[:warmup])
+    events = events[warmup:]
+    ordered = sorted(replay(transform, events))
+    results = {
+        'config':           os.path.relpath(config_path, repo_root),
+        'load_ms':          load_secs * 1000,
+        'modmaps':          len(api._MODMAPS),
+        'multi_modmaps':    len(api._MULTI_MODMAPS),
+        'keymaps':          len(api._KEYMAPS),
+        'events':           len(ordered),
+        'mean_us':          sum(ordered) / max(1, len(ordered)) / 1000,
+        'p50_us':           percentile(ordered, 50) / 1000,
+        'p90_us':           percentile(ordered, 90) / 1000,
+        'p99_us':           percentile(ordered, 99) / 1000,
+        'max_us':           (ordered[-1] if ordered else 0) / 1000,
+    }
+    results.update(measure_allocations(transform, events))
+    return results
+
+
+def print_results(results: Dict[str, float]):
+    print(f"\n=== {results['config']} ===")
+    print(f"  load: {results['load_ms']:.1f} ms | maps: {results['modmaps']} modmaps, "
+            f"{results['multi_modmaps']} multi-modmaps, {results['keymaps']} keymaps")
+    print(f"  {results['events']} events | mean {results['mean_us']:.1f} us | "
+            f"p50 {results['p50_us']:.1f} us | p90 {results['p90_us']:.1f} us | "
+            f"p99 {results['p99_us']:.1f} us | max {results['max_us']:.1f} us")
+    print(f"  allocations: peak {results['alloc_peak_kib']:.1f} KiB | "
+            f"net {results['alloc_net_bytes_per_event']:.1f} bytes/event")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--config', action='append',
+                        help='config file to benchmark (repeatable, default: both default configs)')
+    parser.add_argument('--events', type=int, default=20000, help='events to replay (default: 20000)')
+    parser.add_argument('--warmup', type=int, default=1000, help='events replayed before timing')
+    parser.add_argument('--seed', type=int, default=1, help='random seed for the event stream')
+    parser.add_argument('--desktop', default='xfce', help='XDG_CURRENT_DESKTOP to present (default: xfce)')
+    parser.add_argument('--session', default='x11', help='XDG_SESSION_TYPE to present (default: x11)')
+    parser.add_argument('--json', metavar='PATH', help='also write the results to a JSON file')
+    args = parser.parse_args()
+
+    # headless: present a desktop environment that doesn't need any DE tools queried
+    os.environ['XDG_CURRENT_DESKTOP'] = args.desktop
+    os.environ['XDG_SESSION_TYPE'] = args.session
+
+    events = make_event_stream(args.events + args.warmup, args.seed)
+    all_results = []
+    with tempfile.TemporaryDirectory(prefix='toshy_bench_') as work_dir:
+        for config_path in (args.config or default_configs):
+            results = bench_config(os.path.abspath(config_path), events, work_dir, args.warmup)
+            all_results.append(results)
+    for results in all_results:
+        print_results(results)
+    if args.json:
+        with open(args.json, 'w', encoding='UTF-8') as f:
+            json.dump(all_results, f, indent=4)
+
+
+if __name__ == '__main__':
+    main()
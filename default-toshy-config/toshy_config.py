@@ -5,12 +5,14 @@ import os
 import sys
 import time
 import shutil
+import hashlib
 import inspect
 import subprocess
 
 from subprocess import DEVNULL
 from typing import Callable, List, Dict, Union
 
+import keyszer.lib.logger
 from keyszer.lib.logger import debug, error
 from keyszer.lib.key_context import KeyContext
 from keyszer.config_api import *
@@ -64,8 +66,19 @@ current_folder_path = os.path.dirname(os.path.abspath(config_globals["__config__
 sys.path.insert(0, current_folder_path)
 
 import lib.env
+from lib.logger import trace, dump_trace, set_log_level, LOG_LEVEL_TRACE
 from lib.settings_class import Settings
 from lib.notification_manager import NotificationManager
+from lib.diagnostics import add_diagnostics_dump
+from lib.matching import AppGroup, LRUMemo, MISSING, ContextSnapshot, snapshot, fold
+from lib.matching import window_props_key, note_window_props_use
+from lib.devices import on_device_added, device_ids, DeviceIDs, UNKNOWN_IDS
+from lib.keyboard_db import KeyboardDB
+from lib.window_props import WINDOW_TYPES, use_window_props_provider, get_window_props, get_process_info
+from lib.conditions import use_settings, use_env, all_of, any_of, not_, setting_is, env_is, learn_condition_order
+from lib.conditions import COST_SETTING, COST_GROUP, COST_OPAQUE, as_condition
+from lib.map_dispatch import prune_never_maps, index_map_keys, dynamic, cache_active_maps
+from lib.map_dispatch import use_bypass_mode, gate_maps_on_settings
 
 assets_path         = os.path.join(current_folder_path, 'assets')
 icon_file_active    = os.path.join(assets_path, "toshy_app_icon_rainbow.svg")
@@ -79,8 +92,9 @@ APP_VERSION     = '2024.0307'
 
 # Settings object used to tweak preferences "live" between gui, tray and config.
 cnfg = Settings(current_folder_path)
-cnfg.watch_database()       # activate watchdog observer on the sqlite3 db file
+cnfg.watch_changes()        # get settings changes from the other Toshy processes (D-Bus)
 cnfg.watch_synergy_log()    # activate watchdog observer on the Synergy log file
+use_settings(cnfg)          # settings read by `setting_is()` conditions
 debug("")
 debug(cnfg, ctx="CG")
 
@@ -138,6 +152,13 @@ debug(  f'Toshy config sees this environment:'
         f'\n\t{DESKTOP_ENV      = }'
         f'\n\t{DE_MAJ_VER       = }\n', ctx="CG")
 
+# environment values that `env_is()` conditions can check (once, at config load)
+use_env(DISTRO_NAME=DISTRO_NAME, DISTRO_VER=DISTRO_VER, VARIANT_ID=VARIANT_ID, 
+        SESSION_TYPE=SESSION_TYPE, DESKTOP_ENV=DESKTOP_ENV, DE_MAJ_VER=DE_MAJ_VER)
+
+# window type/transient/modal properties for `matchProps(wtype=...)` and such
+window_props_available = use_window_props_provider(SESSION_TYPE, DESKTOP_ENV)
+
 try:
     # Pylance will complain if function undefined, without 'ignore' comment
     environ_api(session_type = SESSION_TYPE, wl_desktop_env = DESKTOP_ENV) # type: ignore
@@ -160,9 +181,6 @@ except NameError:
 ##################################################
 # Establish important global variables here
 
-# Variable to hold the keyboard type
-KBTYPE = None
-
 # Short names for the `keyszer` string and Unicode processing helper functions
 ST = to_US_keystrokes           # was 'to_keystrokes' originally
 UC = unicode_keystrokes
@@ -182,6 +200,12 @@ not_devn    = 'not_devn'    # key label for matchProps() arg to NEGATIVE match:
 numlk       = 'numlk'       # key label for matchProps() arg to match: numlock_on
 capslk      = 'capslk'      # key label for matchProps() arg to match: capslock_on
 cse         = 'cse'         # key label for matchProps() arg to enable: case sensitivity
+wtype       = 'wtype'       # key label for matchProps() arg to match: window type (like 'dialog')
+transient   = 'transient'   # key label for matchProps() arg to match: window is transient
+modal       = 'modal'       # key label for matchProps() arg to match: window is modal
+fullscreen  = 'fullscreen'  # key label for matchProps() arg to match: window is fullscreen
+exe         = 'exe'         # key label for matchProps() arg to match: executable of window process
+cmd         = 'cmd'         # key label for matchProps() arg to match: command line of window process
 lst         = 'lst'         # key label for matchProps() arg to pass in a [list] of {dicts}
 dbg         = 'dbg'         # key label for matchProps() arg to set debugging info string
 
@@ -195,6 +219,34 @@ last_dt_combo = None
 # when using Apple logo shortcut (Shift+Option+K)
 applelogoalert_enabled = True   # Default: True
 
+# Set this variable to True (or set TOSHY_PROFILE_CONDITIONS=1 in the environment) 
+# to record how long each keymap/modmap condition takes to evaluate. The table is 
+# printed with the keyszer diagnostics key (F15) or `pkill -USR1 -f keyszer`.
+profile_conditions_enabled = os.environ.get('TOSHY_PROFILE_CONDITIONS') == '1'  # Default: False
+
+# Set this variable to True (or set TOSHY_TRACE=1 in the environment) to record the 
+# per-event trace messages (keyboard type, matchProps debugging, Enter/F2 state) in 
+# memory, to be printed with the keyszer diagnostics key (F15) or SIGUSR1. Verbose 
+# mode (`keyszer -v`, as in "toshy-config-verbose") turns this on too.
+trace_enabled = os.environ.get('TOSHY_TRACE') == '1'    # Default: False
+if trace_enabled or keyszer.lib.logger.VERBOSE:
+    set_log_level(LOG_LEVEL_TRACE)
+
+# Set this variable to True (or set TOSHY_LEARN_CONDITION_ORDER=1 in the environment) 
+# to let the compound conditions (`all_of()`/`any_of()`) time their checks now and then 
+# at runtime, and reorder them to put the cheapest and most often decisive checks first.
+learn_condition_order_enabled = os.environ.get('TOSHY_LEARN_CONDITION_ORDER') == '1'  # Default: False
+
+# Set this variable to True to save the evaluation order that the compound conditions 
+# learn (see just above), and start from it again on the next run.
+# The order is kept in "toshy_condition_order.json" next to this config file.
+persist_condition_order = False     # Default: False
+
+# Set this variable to False to keep evaluating every keymap/modmap in remote desktop 
+# and VM apps (`remotes_lod`), in `bypass_lod` apps and in fullscreen games. In "bypass 
+# mode" only the "Diagnostics" keymap is checked, and all other keys pass through.
+bypass_mode_enabled = True      # Default: True
+
 
 
 
@@ -290,6 +342,8 @@ vscodes_lod = [
     {clas: "^code$"},
     {clas: "^vscodium$"},
     {clas: "^code - oss$"},
+    # matched by the executable too, where the session provides the window PID
+    {exe: "^code$|^codium$|^code-oss$"},
 ]
 
 sublimes = [
@@ -301,7 +355,8 @@ sublimeStr = toRgxStr(sublimes)
 
 JDownloader_lod = [
     {clas: "^.*jdownloader.*$"},
-    {clas: "^java-lang-Thread$", name: "^JDownloader.*$"}   # Happens after auto-update of app
+    {clas: "^java-lang-Thread$", name: "^JDownloader.*$"},  # Happens after auto-update of app
+    {exe: "^java$", cmd: "^.*JDownloader.*$"},              # same, where the window PID is known
 ]
 
 # DEPRECATED BY 'remotes_lod' "list of dicts" below
@@ -348,6 +403,17 @@ remotes_lod = [
     {clas: "^Wfica$"                         },
 ]
 
+# Apps that get the keys untouched, like the remotes above, in "bypass mode"
+# (add any app that should never have its keys remapped by Toshy)
+bypass_lod = [
+    # {clas: "^some-app-class$"},
+]
+
+# Games that get bypass mode while they are fullscreen
+fullscreen_games_lod = [
+    {clas: "^steam_app_.*$"},
+]
+
 terminals_and_remotes_lod = [
     {lst: terminals_lod                  },
     {lst: remotes_lod                    },
@@ -443,6 +509,10 @@ filemanagers_lod = [
 
 ### dialogs_Escape_lod = send these windows the Escape key for Cmd+W
 dialogs_Escape_lod = [
+    # Where the session provides window types (X11, or KDE Wayland with the Toshy KWin
+    # script), the dialogs of an app can be matched without a list of their titles:
+    # {clas: "^org.kde.Dolphin$", wtype: "dialog"},
+    # (the title patterns below are also turned into that kind of match, see below)
     {clas: "^Angry.*IP.*Scanner$",
         name: "^IP.*address.*details.*$|^Preferences.*$|^Scan.*Statistics.*$|^Edit.*openers.*$"},
     # TODO: add or change Atoms class to "pm.mirko.Atoms" if the app gets updated
@@ -478,6 +548,23 @@ dialogs_CloseWin_lod = [
     {clas: "^Totem$", not_name: "^Videos$"},
 ]
 
+def add_transient_dialogs(dialogs_lod, other_dialogs_lod):
+    """
+    Where the session provides the transient state of windows (see `lib.window_props`), 
+    also match all transient windows of the apps that have dialog title patterns in the 
+    list, so dialogs with other titles (or translated titles) are found too. The title 
+    patterns stay, for dialogs that are not transient, and for windows the provider 
+    has no answer for. Apps in both lists keep only their title patterns.
+    """
+    other_classes = [dct[clas] for dct in other_dialogs_lod if clas in dct]
+    return [    {clas: dct[clas], transient: True} for dct in dialogs_lod
+                if name in dct and dct[clas] not in other_classes ] + dialogs_lod
+
+if window_props_available:
+    dialogs_Escape_lod, dialogs_CloseWin_lod = (
+        add_transient_dialogs(dialogs_Escape_lod, dialogs_CloseWin_lod),
+        add_transient_dialogs(dialogs_CloseWin_lod, dialogs_Escape_lod) )
+
 
 ###################################################################################################
 ###  SLICE_MARK_START: kbtype_override  ###  EDITS OUTSIDE THESE MARKS WILL BE LOST ON UPGRADE
@@ -550,6 +637,20 @@ all_kbds_rgx        = re.compile(toRgxStr(all_keyboards), re.I)
 
 not_win_type_rgx    = re.compile("IBM|Chromebook|Apple", re.I)
 
+# Keyboard device database shipped with Toshy (lib/keyboard_db.txt), device 
+# IDs and hwdb vendor names indexed at startup, names indexed when first needed
+keyboard_db         = KeyboardDB()
+
+# Version of the checks in `resolve_kbtype()`, bump it when their order or logic 
+# changes, so types saved by older versions of this config are identified again
+KBTYPE_RULES_VERSION = 2
+
+# Fingerprint of the rules above, saved with each cached keyboard type, so the 
+# saved types are identified again after the keyboard lists, custom dict, 
+# keyboard database or the checks themselves change
+kbtype_rules_hash   = hashlib.sha1(repr((KBTYPE_RULES_VERSION, keyboards_UserCustom_dct, kbtype_lists, 
+                                        keyboard_db.fingerprint())).encode()).hexdigest()
+
 
 # Suggested location for customizing lists and variables for use with the "when" conditions.
 ###################################################################################################
@@ -580,26 +681,47 @@ not_win_type_rgx    = re.compile("IBM|Chromebook|Apple", re.I)
 ntfy = NotificationManager(icon_file_active, title='Toshy Alert (Config)')
 
 
+# Shared isKBtype() matchers, one per keyboard type
+isKBtype_interned = {}
+
+
 def isKBtype(kbtype: str, map=None):
     # guard against failure to give valid type arg
     if kbtype not in ['IBM', 'Chromebook', 'Windows', 'Apple']:
         raise ValueError(f"Invalid type given to isKBtype() function: '{kbtype}'"
                 f'\n\t Valid keyboard types (case sensitive): IBM | Chromebook | Windows | Apple')
-    kbtype_cf = kbtype.casefold()
-    KBTYPE_cf = KBTYPE.casefold() if isinstance(KBTYPE, str) else None
+    # `map` is only a label for debugging, so every call for the same type 
+    # gets the same matcher object
+    if kbtype in isKBtype_interned:
+        return isKBtype_interned[kbtype]
 
     def _isKBtype(ctx: KeyContext):
-        # debug(f"KBTYPE: '{KBTYPE}' | isKBtype check from map: '{map}'")
-        return kbtype_cf == KBTYPE_cf
+        # debug(f"KBTYPE: '{kbtype_of(ctx.device_name)}' | isKBtype check from map: '{map}'")
+        # type of the device that sent this key event, so each keyboard keeps its own type
+        return kbtype_of(ctx.device_name) == kbtype
+
+    _isKBtype.cost = COST_SETTING       # a dict lookup, cheap as a setting check
+    isKBtype_interned[kbtype] = _isKBtype
     return _isKBtype
 
 
+# Keyboard type of each device: {device name: (kbtype, how it was identified)}
 kbtype_cache_dct = {}
 
+# Keyboard types saved in the preferences database by earlier runs, still valid 
+# for the current rules: {(device name, vendor, product): (kbtype, how it was identified)}
+kbtype_saved_dct = cnfg.load_kbtype_cache(kbtype_rules_hash)
+
+valid_kbtypes = ['IBM', 'Chromebook', 'Windows', 'Apple']
 
-def getKBtype():
+
+def resolve_kbtype(kbd_dev_name: str, ids: DeviceIDs = UNKNOWN_IDS):
     """
-    ### Get the keyboard type string for the current device
+    ### Work out the keyboard type string for a device
+    
+    Returns a tuple of the type and a message saying how it was identified.
+    The device IDs and udev properties are only known for devices that were 
+    seen being attached (see `register_kbd_device()`).
     
     #### Valid Types
     
@@ -607,76 +729,101 @@ def getKBtype():
     
     #### Hierarchy of validations:
     
-    - Check if a forced override of keyboard type is applied by user preference.
-    - Check cache dictionary for device name stored from previous run of function.
     - Check if the device name is in the keyboards_UserCustom_dct dictionary.
     - Check if the device name matches any keyboard type list.
+    - Check if the device bus/vendor/product IDs are in the keyboard database.
+    - Check if the device hwdb vendor name is in the keyboard database.
+    - Check if the device name is in the keyboard database.
     - Check if any keyboard type string is found in the device name string.
     - Check if the device name indicates a "Windows" keyboard by excluding other types.
     """
+    kbd_dev_name_cf = fold(kbd_dev_name)
+
+    # Check if there is a custom type for the device
+    custom_kbtype = kbds_UserCustom_dct_cf.get(kbd_dev_name_cf, '')
+    if custom_kbtype and custom_kbtype in valid_kbtypes:
+        return custom_kbtype, 'Custom type for dev'
+
+    # Check against the keyboard type lists (edited by the user, like the custom dict)
+    for kbtype, regex_lst in kbtype_lists_rgx.items():
+        for rgx in regex_lst:
+            if rgx.search(kbd_dev_name_cf):
+                return kbtype, 'Rgx matched on dev'
+
+    # Check the known hardware in the keyboard database shipped with Toshy 
+    # (exact lookups, so the name based checks below are only a fallback)
+    kbtype = keyboard_db.lookup_ids(ids.bus, ids.vendor, ids.product)
+    if kbtype:
+        return kbtype, f'IDs {ids.vendor:04x}:{ids.product:04x} in kbd database for dev'
+    kbtype = keyboard_db.lookup_hwdb_vendor(ids.hwdb_vendor)
+    if kbtype:
+        return kbtype, f"hwdb vendor '{ids.hwdb_vendor}' in kbd database for dev"
+
+    # Check the device names in the keyboard database
+    kbtype = keyboard_db.lookup_name(kbd_dev_name_cf)
+    if kbtype:
+        return kbtype, 'Name in kbd database for dev'
+
+    # Check if any keyboard type string is found in the device name
+    for kbtype in valid_kbtypes:
+        if kbtype.casefold() in kbd_dev_name_cf:
+            return kbtype, 'Type in dev name'
+
+    # Check if the device name indicates a "Windows" keyboard
+    if ('windows' not in kbd_dev_name_cf 
+        and not not_win_type_rgx.search(kbd_dev_name_cf) 
+        and not all_kbds_rgx.search(kbd_dev_name_cf) ):
+        return 'Windows', 'Default type for dev'
+
+    # No matching keyboard type found
+    return 'unidentified', 'Dev fell through all checks'
+
+
+def register_kbd_device(kbd_dev_name: str, ids: DeviceIDs = UNKNOWN_IDS) -> str:
+    """
+    Identify the keyboard type of a device and store it in the per-device table.
+    Called when keyszer grabs a device (at startup or when it is plugged in), so 
+    the work (and the log message) happens once per device, not per key event.
+    A type saved by an earlier run is reused, and a newly identified type is saved.
+    Vendor/product IDs are 0 when the device was not seen being attached.
+    """
+    vendor, product = ids.vendor, ids.product
+    if kbd_dev_name in kbtype_cache_dct:
+        return kbtype_cache_dct[kbd_dev_name][0]
+    saved = ( kbtype_saved_dct.get((kbd_dev_name, vendor, product)) or
+                kbtype_saved_dct.get((kbd_dev_name, 0, 0)) )
+    if saved is not None:
+        kbtype_cache_dct[kbd_dev_name] = saved
+        trace("KBTYPE: '%s' | (SAVED) %s: '%s'", saved[0], saved[1], kbd_dev_name)
+        return saved[0]
+    kbtype, msg = resolve_kbtype(kbd_dev_name, ids)
+    kbtype_cache_dct[kbd_dev_name] = (kbtype, msg)
+    if kbtype == 'unidentified':
+        error(f"KBTYPE: '{kbtype}' | {msg}: '{kbd_dev_name}'")
+        return kbtype
+    debug(f"KBTYPE: '{kbtype}' | {msg}: '{kbd_dev_name}'")
+    kbtype_saved_dct[(kbd_dev_name, vendor, product)] = (kbtype, msg)
+    cnfg.save_kbtype_cache_entry(kbd_dev_name, vendor, product, kbtype, msg, kbtype_rules_hash)
+    return kbtype
+
+
+def kbtype_of(kbd_dev_name: str) -> str:
+    """
+    Return the keyboard type of a device, from the per-device table. A device 
+    that was never registered (no attach event seen) is identified on first use.
+    """
+    # If user wants to override, apply override and return.
+    # Breaks per-device adaptatation capability while engaged!
+    if cnfg.override_kbtype in valid_kbtypes:
+        return cnfg.override_kbtype
+    try:
+        return kbtype_cache_dct[kbd_dev_name][0]
+    except KeyError:
+        return register_kbd_device(kbd_dev_name)
 
-    valid_kbtypes = ['IBM', 'Chromebook', 'Windows', 'Apple']
-
-    def _getKBtype(ctx: KeyContext):
-        # debug(f"Entering getKBtype with override value: '{cnfg.override_kbtype}'")
-        global KBTYPE
-        kbd_dev_name = ctx.device_name
-
-        def log_kbtype(msg, cache_dev):
-            debug(f"KBTYPE: '{KBTYPE}' | {msg}: '{kbd_dev_name}'")
-            if cache_dev:
-                kbtype_cache_dct[kbd_dev_name] = (KBTYPE, msg)
-
-        # If user wants to override, apply override and return.
-        # Breaks per-device adaptatation capability while engaged!
-        if cnfg.override_kbtype in valid_kbtypes:
-            KBTYPE = cnfg.override_kbtype
-            log_kbtype(f"WARNING: Override applied! Dev", cache_dev=False)
-            return
-
-        # Check in the kbtype cache dict for the device
-        if kbd_dev_name in kbtype_cache_dct:
-            KBTYPE, cached_msg = kbtype_cache_dct[kbd_dev_name]
-            log_kbtype(f'(CACHED) {cached_msg}', cache_dev=False)
-            return
-
-        kbd_dev_name_cf = ctx.device_name.casefold()
-
-        # Check if there is a custom type for the device
-        custom_kbtype = kbds_UserCustom_dct_cf.get(kbd_dev_name_cf, '')
-        if custom_kbtype and custom_kbtype in valid_kbtypes:
-            KBTYPE = custom_kbtype
-            log_kbtype('Custom type for dev', cache_dev=True)
-            return
-
-        # Check against the keyboard type lists
-        for kbtype, regex_lst in kbtype_lists_rgx.items():
-            for rgx in regex_lst:
-                if rgx.search(kbd_dev_name_cf):
-                    KBTYPE = kbtype
-                    log_kbtype('Rgx matched on dev', cache_dev=True)
-                    return
-
-        # Check if any keyboard type string is found in the device name
-        for kbtype in ['IBM', 'Chromebook', 'Windows', 'Apple']:
-            if kbtype.casefold() in kbd_dev_name_cf:
-                KBTYPE = kbtype
-                log_kbtype('Type in dev name', cache_dev=True)
-                return
-
-        # Check if the device name indicates a "Windows" keyboard
-        if ('windows' not in kbd_dev_name_cf 
-            and not not_win_type_rgx.search(kbd_dev_name_cf) 
-            and not all_kbds_rgx.search(kbd_dev_name_cf) ):
-            KBTYPE = 'Windows'
-            log_kbtype('Default type for dev', cache_dev=True)
-            return
-
-        # Default to None if no matching keyboard type is found
-        KBTYPE = 'unidentified'
-        error(f"KBTYPE: '{KBTYPE}' | Dev fell through all checks: '{kbd_dev_name}'")
 
-    return _getKBtype  # Return the inner function
+# Fill in the table as keyszer grabs each device, at startup and on hot-plug
+on_device_added(lambda device: register_kbd_device(device.name, device_ids(device)))
 
 
 def isDoubleTap(dt_combo):
@@ -750,6 +897,10 @@ def matchProps(*,
     not_clas: str = None, not_name: str = None, not_devn: str = None,
     # bool parameters
     numlk: bool = None, capslk: bool = None, cse: bool = None,
+    # window type parameters (where the session provides them, see `lib.window_props`)
+    wtype: str = None, transient: bool = None, modal: bool = None, fullscreen: bool = None,
+    # window process parameters (where the session provides the window PID)
+    exe: str = None, cmd: str = None,
     # list of dicts of parameters (positive)
     lst: List[Dict[str, Union[str, bool]]] = None,
     # list of dicts of parameters (negative)
@@ -779,6 +930,12 @@ def matchProps(*,
     `numlk`    = Num Lock LED state         (bool)                  \n
     `capslk`   = Caps Lock LED state        (bool)                  \n
     `cse`      = Case Sensitive matching    (bool)                  \n
+    `wtype`    = Window type, like "dialog" (string) [xprop _NET_WM_WINDOW_TYPE]\n
+    `transient`= Window is transient for another window (bool)      \n
+    `modal`    = Window is modal            (bool)                  \n
+    `fullscreen` = Window is fullscreen     (bool)                  \n
+    `exe`      = Executable file name of the window process (regex/string)\n
+    `cmd`      = Command line of the window process (regex/string)  \n
     `lst`      = List of dicts of the above arguments               \n
     `not_lst`  = `lst` but inverted, matches when "not"             \n
     `dbg`      = Debugging info             (string)                \n
@@ -790,8 +947,19 @@ def matchProps(*,
     Negative parameters cannot be used together with the normal     \n
     positive matching equivalent parameter in same instance.        \n
 
+    ### Window type parameters: `wtype`|`transient`|`modal`|`fullscreen`
+    Checked against the focused window, read from the X server on   \n
+    X11, or from the Toshy KWin script on KDE Wayland. The Toshy    \n
+    wlroots service (other Wayland sessions) only gives `transient`.\n
+    In sessions that don't provide them, these never match.         \n
+
+    ### Window process parameters: `exe`|`cmd`
+    Checked against /proc/<pid> of the process that owns the focused\n
+    window (PID from the same providers as the window type). Useful \n
+    for apps with unreliable window classes, like Electron apps.    \n
+
     ### List of Dicts parameter: `lst`|`not_lst`
-    A [list] of {dicts} with each dict containing 1 to 6 of the     \n
+    A [list] of {dicts} with each dict containing 1 to 12 of the    \n
     named parameters above, to be processed recursively as args.    \n
     A dict can also contain a single `lst` or `not_lst` argment.    \n
 
@@ -805,21 +973,36 @@ def matchProps(*,
     # https://stackoverflow.com/questions/406230/\
         # regular-expression-to-match-a-line-that-doesnt-contain-a-word
 
+    # The same arguments always give the same (shared) matcher, with one result cache, 
+    # so the many conditions using `not_lst=remotes_lod` and the like are only checked 
+    # once per key event. The `dbg` label doesn't change the result, so it's left out.
+    intern_key = _matchProps_args_key(
+        clas=clas, name=name, devn=devn, not_clas=not_clas, not_name=not_name, 
+        not_devn=not_devn, numlk=numlk, capslk=capslk, cse=cse, 
+        wtype=wtype, transient=transient, modal=modal, fullscreen=fullscreen, exe=exe, cmd=cmd, 
+        lst=lst, not_lst=not_lst)
+    if intern_key in matchProps_interned:
+        return matchProps_interned[intern_key]
+
     logging_enabled = False
-    allowed_params  = (clas, name, devn, not_clas, not_name, not_devn, 
-                        numlk, capslk, cse, lst, not_lst, dbg)
-    lst_dct_params  = (clas, name, devn, not_clas, not_name, not_devn, 
-                        numlk, capslk, cse)
-    string_params   = (clas, name, devn, not_clas, not_name, not_devn, dbg)
-    dct_param_strs  = list(inspect.signature(matchProps).parameters.keys())
+    allowed_params  = (clas, name, devn, not_clas, not_name, not_devn, numlk, capslk, cse, 
+                        wtype, transient, modal, fullscreen, exe, cmd, lst, not_lst, dbg)
+    lst_dct_params  = (clas, name, devn, not_clas, not_name, not_devn, numlk, capslk, cse, 
+                        wtype, transient, modal, fullscreen, exe, cmd)
+    string_params   = (clas, name, devn, not_clas, not_name, not_devn, wtype, exe, cmd, dbg)
+    dct_param_strs  = matchProps_param_names
 
     if all([x is None for x in allowed_params]): 
         raise ValueError(f"\n\n(EE) matchProps(): Received no valid argument\n")
-    if any([x not in (True, False, None) for x in (numlk, capslk, cse)]): 
-        raise TypeError(f"\n\n(EE) matchProps(): Params 'numlk|capslk|cse' are bools\n")
+    if any([x not in (True, False, None) for x in (numlk, capslk, cse, transient, modal, fullscreen)]): 
+        raise TypeError(f"\n\n(EE) matchProps(): Params "
+                        f"'numlk|capslk|cse|transient|modal|fullscreen' are bools\n")
     if any([x is not None and not isinstance(x, str) for x in string_params]):
         raise TypeError(    f"\n\n(EE) matchProps(): These parameters must be strings:"
-                            f"\n\t'clas|name|devn|not_clas|not_name|not_devn|dbg'\n")
+                            f"\n\t'clas|name|devn|not_clas|not_name|not_devn|wtype|exe|cmd|dbg'\n")
+    if wtype is not None and wtype not in WINDOW_TYPES:
+        raise ValueError(   f"\n\n(EE) matchProps(): Param 'wtype' must be one of:"
+                            f"\n\t{'|'.join(WINDOW_TYPES)}\n")
     if clas and not_clas or name and not_name or devn and not_devn or lst and not_lst:
         raise ValueError(   f"\n\n(EE) matchProps(): Do not mix positive and "
                             f"negative match params for same property\n")
@@ -835,6 +1018,46 @@ def matchProps(*,
         # If screen focus is lost, return False immediately
         return False if cnfg.screen_focus is False else True
 
+    def _memoize(_matcher):
+        # Window class/title and device only change on focus or title change, so keep 
+        # the results in a bounded memo keyed on the context instead of re-running 
+        # the regexes on every key press. Counters are in `.memo.hits|misses`.
+        # Matchers using the window properties (type, fullscreen, process...) add the 
+        # window state serial to the key, so only their results go out of date when 
+        # the window's state changes.
+        uses_window_props = _matcher.uses_window_props
+        # Keyszer makes a new context object for each key event, so the last context 
+        # and result are also kept, and any other map checking this matcher during 
+        # the same event gets the result without even building the memo key.
+        memo = LRUMemo(maxsize=matchProps_memo_size)
+        last_ctx = None
+        last_result = False
+
+        def _matchProps_Memo(ctx: KeyContext):
+            nonlocal last_ctx, last_result
+            if not _isScreenFocusActive():
+                return False
+            if ctx is last_ctx:
+                if uses_window_props: note_window_props_use()
+                return last_result
+            # the matchers get the snapshot of the context, with the properties 
+            # already read and casefolded once for this key event
+            snap = snapshot(ctx)
+            memo_key = window_props_key(snap) if uses_window_props else snap.key
+            result = memo.get(memo_key)
+            if result is MISSING:
+                result = _matcher(snap)
+                memo.put(memo_key, result)
+            last_ctx, last_result = ctx, result
+            return result
+
+        _matchProps_Memo.memo       = memo
+        _matchProps_Memo.uncached   = _matcher
+        # in compound conditions, check the context before asking for window properties
+        _matchProps_Memo.cost       = COST_OPAQUE if uses_window_props else COST_GROUP
+        matchProps_interned[intern_key] = _matchProps_Memo
+        return _matchProps_Memo
+
     # process lists of conditions
     if _lst is not None:
         if any([x is not None for x in lst_dct_params]): 
@@ -855,49 +1078,133 @@ def matchProps(*,
                         f"\n(EE) matchProps(): Invalid parameter found in dict in list. "
                         f"See log output before traceback.\n")
 
-        def _matchProps_Lst(ctx: KeyContext):
+        # Build the matcher for each {dict} once, here, instead of calling matchProps()
+        # on every dict for every key event. Validation and regex compiling happen
+        # now, so the per-event work is reduced to the regex searches themselves.
+        # Dicts that only give a `clas` pattern (most app group lists) are merged into
+        # a single AppGroup, as are the same kind of dicts from nested `lst` lists, so
+        # the whole group is checked with one set lookup plus at most one regex search.
+        # Dicts that only give an `exe` pattern are merged into one AppGroup the same way.
+        _clas_patterns      = []
+        _exe_patterns       = []
+        _other_matchers     = []
+        for dct in _lst:
+            if list(dct.keys()) == ['clas']:
+                matchProps(**dct)       # validate the dict contents only
+                _clas_patterns.append(dct['clas'])
+            elif list(dct.keys()) == ['exe']:
+                matchProps(**dct)       # validate the dict contents only
+                _exe_patterns.append(dct['exe'])
+            elif list(dct.keys()) == ['lst']:
+                _nested_matcher = matchProps(**dct).uncached
+                _clas_patterns.extend(_nested_matcher.clas_patterns)
+                _exe_patterns.extend(_nested_matcher.exe_patterns)
+                _other_matchers.extend(_nested_matcher.other_matchers)
+            else:
+                # the memo of this list covers the child matchers, so skip theirs
+                _other_matchers.append(matchProps(**dct).uncached)
+        _clas_group         = AppGroup(_clas_patterns) if _clas_patterns else None
+        _exe_group          = AppGroup(_exe_patterns) if _exe_patterns else None
+        _other_matchers     = tuple(_other_matchers)
+        nt_err_clas         = 'ERR: matchProps: NoneType in ctx.wm_class'
+
+        def _anyMatch(ctx: ContextSnapshot):
+            if _clas_group is not None and _clas_group.search(
+                    ctx.wm_class or nt_err_clas, ctx.wm_class_cf):
+                return True
+            if _exe_group is not None and _exe_group.search(get_process_info(ctx).exe):
+                return True
+            return any(_matcher(ctx) for _matcher in _other_matchers)
+
+        def _matchProps_Lst(ctx: ContextSnapshot):
             if not _isScreenFocusActive():
                 return False
             if not_lst is not None:
-                if logging_enabled: print(f"## _matchProps_Lst()[not_lst] ## {dbg=}")
-                return not any(matchProps(**dct)(ctx) for dct in not_lst)
+                if logging_enabled: trace("## _matchProps_Lst()[not_lst] ## dbg=%r", dbg)
+                return not _anyMatch(ctx)
             else:
-                if logging_enabled: print(f"## _matchProps_Lst()[lst] ## {dbg=}")
-                return any(matchProps(**dct)(ctx) for dct in lst)
-
-        return _matchProps_Lst      # outer function returning inner function
-
-    # compile case insensitive regex object for given params, unless cse=True
-    if _clas is not None: clas_rgx = re.compile(_clas) if cse else re.compile(_clas, re.I)
-    if _name is not None: name_rgx = re.compile(_name) if cse else re.compile(_name, re.I)
-    if _devn is not None: devn_rgx = re.compile(_devn) if cse else re.compile(_devn, re.I)
-
-    def _matchProps(ctx: KeyContext):
+                if logging_enabled: trace("## _matchProps_Lst()[lst] ## dbg=%r", dbg)
+                return _anyMatch(ctx)
+
+        # expose the pieces, so a list nesting this list can merge them into its own group
+        _matchProps_Lst.clas_patterns   = _clas_patterns
+        _matchProps_Lst.exe_patterns    = _exe_patterns
+        _matchProps_Lst.other_matchers  = _other_matchers
+        _matchProps_Lst.uses_window_props = ( _exe_group is not None or 
+                                                any(_matcher.uses_window_props for _matcher in _other_matchers) )
+
+        return _memoize(_matchProps_Lst)    # outer function returning inner function
+
+    # compile case insensitive matchers for given params, unless cse=True
+    # (an alternation of anchored literals like browsers_allStr becomes a set lookup)
+    if _clas is not None: clas_grp = AppGroup([_clas], cse=cse)
+    if _name is not None: name_grp = AppGroup([_name], cse=cse)
+    if _devn is not None: devn_grp = AppGroup([_devn], cse=cse)
+    if exe is not None: exe_grp = AppGroup([exe], cse=cse)
+    if cmd is not None: cmd_grp = AppGroup([cmd], cse=cse)
+
+    def _matchProps(ctx: ContextSnapshot):
         if not _isScreenFocusActive():
             return False
         cond_list       = []
         nt_err          = 'ERR: matchProps: NoneType in ctx.'
         if _clas is not None:
-            clas_match = re.search(clas_rgx, ctx.wm_class or nt_err + 'wm_class')
+            clas_match = clas_grp.search(ctx.wm_class or nt_err + 'wm_class', ctx.wm_class_cf)
             cond_list.append(not clas_match if not_clas is not None else clas_match)
         if _name is not None:
-            name_match = re.search(name_rgx, ctx.wm_name or nt_err + 'wm_name')
+            name_match = name_grp.search(ctx.wm_name or nt_err + 'wm_name', ctx.wm_name_cf)
             cond_list.append(not name_match if not_name is not None else name_match)
         if _devn is not None:
-            devn_match = re.search(devn_rgx, ctx.device_name or nt_err + 'device_name')
+            devn_match = devn_grp.search(ctx.device_name or nt_err + 'device_name', ctx.device_name_cf)
             cond_list.append(not devn_match if not_devn is not None else devn_match)
         # these two MUST check explicitly for "is not None" because external input is True/False,
         # and we want to be able to match the LED_on state of either "True" or "False"
         if numlk is not None: cond_list.append( numlk is ctx.numlock_on  )
         if capslk is not None: cond_list.append( capslk is ctx.capslock_on )
+        # the window properties may need a provider query (and the process a read from 
+        # /proc), so they are only checked if everything in the context matched
+        if all(cond_list) and (wtype is not None or transient is not None or 
+                                modal is not None or fullscreen is not None):
+            window_props = get_window_props(ctx)
+            if wtype is not None: cond_list.append( wtype == window_props.window_type )
+            # same as for the LEDs above, None (not known) should match neither True nor False
+            if transient is not None: cond_list.append( transient is window_props.transient )
+            if modal is not None: cond_list.append( modal is window_props.modal )
+            if fullscreen is not None: cond_list.append( fullscreen is window_props.fullscreen )
+        if all(cond_list) and (exe is not None or cmd is not None):
+            process_info = get_process_info(ctx)
+            if exe is not None: cond_list.append( exe_grp.search(process_info.exe) )
+            if cmd is not None: cond_list.append( cmd_grp.search(process_info.cmd) )
         if logging_enabled: # and all(cnd_lst): # << add this to show only "True" condition lists
-            print(f'####  CND_LST ({all(cond_list)})  ####  {dbg=}')
-            for elem in cond_list:
-                print('##', re.sub(r'^.*span=.*\), ', '', str(elem)).replace('>',''))
-            print('-------------------------------------------------------------------')
+            trace("####  CND_LST (%s)  ####  dbg=%r  ####  %s", all(cond_list), dbg, cond_list)
         return all(cond_list)
 
-    return _matchProps      # outer function returning inner function
+    _matchProps.uses_window_props = any(x is not None for x in (wtype, transient, modal, fullscreen, exe, cmd))
+
+    return _memoize(_matchProps)    # outer function returning inner function
+
+
+# Maximum number of window contexts remembered by each matchProps() matcher
+matchProps_memo_size = 256
+
+# Shared matchProps() matchers, keyed on their arguments (see `_matchProps_args_key()`)
+matchProps_interned = {}
+
+
+def _matchProps_args_key(**kwargs):
+    """Hashable key for a set of matchProps() arguments (lists of dicts included)."""
+    def _freeze(value):
+        if isinstance(value, dict):
+            return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+        if isinstance(value, list):
+            return tuple(_freeze(item) for item in value)
+        return value
+    return tuple((k, _freeze(v)) for k, v in kwargs.items() if v is not None)
+
+
+# Valid parameter names for the dicts in a `lst`/`not_lst` list, looked up once 
+# here instead of running `inspect.signature()` every time matchProps() is called
+matchProps_param_names = list(inspect.signature(matchProps).parameters.keys())
 
 
 # Boolean variable to toggle Enter key state between F2 and Enter
@@ -962,8 +1269,7 @@ def iEF2(combo_if_true, latch_or_combo_if_false,
             combo_list = [latch_or_combo_if_false]
             if keep_value_if_false is False:
                 _enter_is_F2 = True
-        debug(f"_is_Enter_F2:  {combo_list      = }")
-        debug(f"_is_Enter_F2:  {_enter_is_F2    = }")
+        trace("_is_Enter_F2:  combo_list = %s | _enter_is_F2 = %s", combo_list, _enter_is_F2)
         return combo_list
     return _is_Enter_F2
 
@@ -987,7 +1293,7 @@ def macro_tester():
                     ST(f"Class: '{ctx.wm_class}'"), C("Enter"),
                     ST(f"Title: '{ctx.wm_name}'"), C("Enter"),
                     ST(f"Keybd: '{ctx.device_name}'"), C("Enter"),
-                    ST(f"Keyboard type: '{KBTYPE}'"), C("Enter"),
+                    ST(f"Keyboard type: '{kbtype_of(ctx.device_name)}'"), C("Enter"),
                     ST("Next test should come out on ONE LINE!"), C("Enter"),
                     ST("Unicode and Shift Test: 🌹—€—\u2021—ÿ—\U00002021 12345 !@#$% |\\ !!!!!!"),
                     C("Enter")
@@ -1078,7 +1384,7 @@ def notify_context():
             f"<b>Title =</b> '{escape_markup(ctx_name)}'  {nwln_str}"
             f"<b>Keybd =</b> '{escape_markup(ctx_devn)}'  {nwln_str}"
             f"{nwln_str}"
-            f"<b>Keyboard type ___ =</b> ___ '{KBTYPE}'  {nwln_str}"
+            f"<b>Keyboard type ___ =</b> ___ '{kbtype_of(ctx_devn)}'  {nwln_str}"
             f"{nwln_str}"
             f"<b>DISTRO_NAME _____ =</b> ___ '{DISTRO_NAME}'  {nwln_str}"
             f"<b>DISTRO_VER ______ =</b> ___ '{DISTRO_VER}'  {nwln_str}"
@@ -1130,6 +1436,31 @@ def is_pre_GNOME_45(de_ver):
     return _is_pre_GNOME_45
 
 
+def ifEnv(static_cond, when=None):
+    """
+    Fold a check that can't change during the session (distro, desktop environment, 
+    DE version, etc.) into a keymap/modmap `when` condition, once, at config load. 
+    Same as `all_of(env_is(...), when)`, for checks written as Python expressions.
+
+    `static_cond` can be a bool, or a condition function that doesn't really look at 
+    the context (like `is_pre_GNOME_45(DE_MAJ_VER)`), which will be called only once.
+
+    - If the check passes, the `when` condition is returned as-is (or an always-True 
+      `Const` condition if `when` is not given), so nothing extra is checked per key event.
+    - If the check fails, the map gets a `Const(False)` condition, like a failed 
+      `env_is()`, and is removed from the config by `prune_never_maps()` at the end 
+      of the config file, so keyszer never evaluates it at all.
+
+    Example:    when = ifEnv(DISTRO_NAME == 'pop', matchProps(not_lst=remotes_lod))
+    """
+    if callable(static_cond):
+        static_cond = static_cond(None)
+    env_check = as_condition(bool(static_cond))
+    if env_check.never or when is None:
+        return env_check
+    return when
+
+
 # Suggested location for adding custom functions for personal use.
 ###################################################################################################
 ###  SLICE_MARK_START: user_custom_functions  ###  EDITS OUTSIDE THESE MARKS WILL BE LOST ON UPGRADE
@@ -1156,40 +1487,15 @@ def is_pre_GNOME_45(de_ver):
 ### The modified key can be used in shortcut combos as the new key
 
 
-# DO NOT REMOVE THIS MODMAP AND KEYMAP!
-# Special modmap to trigger the evaluation of the keyboard type when 
-# any modifier key is pressed
-modmap("Keyboard Type Trigger Modmap", {
-    # This modmap must have all modifier keys inside it, so they will 
-    # all trigger the re-evaluation of the keyboard type.
-    # The accompanying keymap can be empty and still accomplish
-    # the same purpose of triggering a re-evaluation of the
-    # keyboard type when any non-modifier key is pressed.
-    Key.LEFT_META: Key.LEFT_META,
-    Key.RIGHT_META: Key.RIGHT_META,
-    Key.LEFT_ALT: Key.LEFT_ALT,
-    Key.RIGHT_ALT: Key.RIGHT_ALT,
-    Key.LEFT_CTRL: Key.LEFT_CTRL,
-    Key.RIGHT_CTRL: Key.RIGHT_CTRL,
-    Key.LEFT_SHIFT: Key.LEFT_SHIFT,
-    Key.RIGHT_SHIFT: Key.RIGHT_SHIFT,
-}, when = lambda ctx: getKBtype()(ctx) )    # THIS CONDITIONAL MUST EVALUATE TO FALSE ALWAYS!
-# Special keymap to trigger the evaluation of the keyboard type when 
-# any non-modifier key is pressed
-keymap("Keyboard Type Trigger Keymap", {
-    # Nothing needed here.
-}, when = lambda ctx: getKBtype()(ctx) )
-
-
 modmap("Cond modmap - Media Arrows Fix",{
     # Fix arrow keys with media functions instead of PgUp/PgDn/Home/End
     Key.PLAYPAUSE:              Key.PAGE_UP,
     Key.STOPCD:                 Key.PAGE_DOWN,
     Key.PREVIOUSSONG:           Key.HOME,
     Key.NEXTSONG:               Key.END,
-}, when = lambda ctx:
-    matchProps(not_lst=remotes_lod)(ctx) and 
-    cnfg.media_arrows_fix is True )
+}, when = all_of(
+    matchProps(not_lst=remotes_lod),
+    setting_is('media_arrows_fix', True) ) )
 
 
 ###################################################################################################
@@ -1231,10 +1537,10 @@ modmap("Cond modmap - Forced Numpad feature",{
     Key.KP0:                    Key.KEY_0,
     Key.KPDOT:                  Key.DOT,  
     Key.KPENTER:                Key.ENTER,
-}, when = lambda ctx: 
-    matchProps(not_lst=exclude_kpad_devs_lod)(ctx) and 
-    matchProps(not_lst=remotes_lod)(ctx) and 
-    cnfg.forced_numpad is True )
+}, when = all_of(
+    matchProps(not_lst=exclude_kpad_devs_lod),
+    matchProps(not_lst=remotes_lod),
+    setting_is('forced_numpad', True) ) )
 
 
 modmap("Cond modmap - GTK3 numpad nav keys fix",{
@@ -1254,11 +1560,11 @@ modmap("Cond modmap - GTK3 numpad nav keys fix",{
     Key.KP0:                    Key.INSERT, 
     Key.KPDOT:                  Key.DELETE, 
     Key.KPENTER:                Key.ENTER,
-}, when = lambda ctx:
-    matchProps(not_lst=exclude_kpad_devs_lod)(ctx) and 
-    matchProps(not_lst=remotes_lod)(ctx) and 
-    matchProps(numlk=False)(ctx) and 
-    cnfg.forced_numpad is False )
+}, when = all_of(
+    matchProps(not_lst=exclude_kpad_devs_lod),
+    matchProps(not_lst=remotes_lod),
+    matchProps(numlk=False),
+    setting_is('forced_numpad', False) ) )
 
 
 # multipurpose_modmap("Optional Tweaks",
@@ -1270,26 +1576,26 @@ modmap("Cond modmap - GTK3 numpad nav keys fix",{
 
 multipurpose_modmap("Enter2Cmd", {
     Key.ENTER:                  [Key.ENTER, Key.RIGHT_CTRL]     # Enter2Cmd
-}, when = lambda ctx:
-    # matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    matchProps(not_lst=remotes_lod)(ctx) and 
-    cnfg.Enter2Ent_Cmd is True )
+}, when = all_of(
+    # matchProps(not_lst=terminals_and_remotes_lod),
+    matchProps(not_lst=remotes_lod),
+    setting_is('Enter2Ent_Cmd', True) ) )
 
 multipurpose_modmap("Caps2Esc - not Chromebook kbd", {
     Key.CAPSLOCK:               [Key.ESC, Key.RIGHT_CTRL]       # Caps2Esc - not Chromebook
-}, when = lambda ctx:
-    # matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    matchProps(not_lst=remotes_lod)(ctx) and 
-    not isKBtype('Chromebook')(ctx) and 
-    cnfg.Caps2Esc_Cmd is True )
+}, when = all_of(
+    # matchProps(not_lst=terminals_and_remotes_lod),
+    matchProps(not_lst=remotes_lod),
+    not_(isKBtype('Chromebook')),
+    setting_is('Caps2Esc_Cmd', True) ) )
 
 multipurpose_modmap("Caps2Esc - Chromebook kbd", {
     Key.LEFT_META:               [Key.ESC, Key.RIGHT_CTRL]       # Caps2Esc - Chromebook
-}, when = lambda ctx:
-    # matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    matchProps(not_lst=remotes_lod)(ctx) and 
-    isKBtype('Chromebook')(ctx) and 
-    cnfg.Caps2Esc_Cmd is True )
+}, when = all_of(
+    # matchProps(not_lst=terminals_and_remotes_lod),
+    matchProps(not_lst=remotes_lod),
+    isKBtype('Chromebook'),
+    setting_is('Caps2Esc_Cmd', True) ) )
 
 
 
@@ -1314,102 +1620,102 @@ multipurpose_modmap("Caps2Esc - Chromebook kbd", {
 # [Global GUI conditional modmaps] Change modifier keys as in xmodmap
 modmap("Cond modmap - GUI - Caps2Cmd - not Cbk kdb", {
     Key.CAPSLOCK:               Key.RIGHT_CTRL,                 # Caps2Cmd
-}, when = lambda ctx:
-    matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    not isKBtype('Chromebook')(ctx) and 
-    cnfg.Caps2Cmd
-)
+}, when = all_of(
+    matchProps(not_lst=terminals_and_remotes_lod),
+    not_(isKBtype('Chromebook')),
+    setting_is('Caps2Cmd', True)
+) )
 modmap("Cond modmap - GUI - Caps2Cmd - Cbk kdb", {
     Key.LEFT_META:              Key.RIGHT_CTRL,                 # Caps2Cmd - Chromebook
-}, when = lambda ctx:
-    matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    isKBtype('Chromebook')(ctx) and 
-    cnfg.Caps2Cmd
-)
+}, when = all_of(
+    matchProps(not_lst=terminals_and_remotes_lod),
+    isKBtype('Chromebook'),
+    setting_is('Caps2Cmd', True)
+) )
 modmap("Cond modmap - GUI - IBM kbd - multi_lang OFF", {
     # - IBM
     Key.RIGHT_ALT:              Key.RIGHT_CTRL,                 # IBM - Multi-language (Remove)
     Key.RIGHT_CTRL:             Key.RIGHT_ALT,                  # IBM - Multi-language (Remove)
-}, when = lambda ctx:
-    matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    isKBtype('IBM', map='mmap GUI IBM ML-OFF')(ctx) and 
-    cnfg.multi_lang is False
-)
+}, when = all_of(
+    matchProps(not_lst=terminals_and_remotes_lod),
+    isKBtype('IBM', map='mmap GUI IBM ML-OFF'),
+    setting_is('multi_lang', False)
+) )
 modmap("Cond modmap - GUI - IBM kbd", {
     # - IBM
     Key.CAPSLOCK:               Key.LEFT_META,                  # IBM
     Key.LEFT_CTRL:              Key.LEFT_ALT,                   # IBM
     Key.LEFT_ALT:               Key.RIGHT_CTRL,                 # IBM
-}, when = lambda ctx:
-    matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    isKBtype('IBM', map='mmap GUI IBM')(ctx)
-)
+}, when = all_of(
+    matchProps(not_lst=terminals_and_remotes_lod),
+    isKBtype('IBM', map='mmap GUI IBM')
+) )
 modmap("Cond modmap - GUI - Cbk kbd - multi_lang OFF", {
     # - Chromebook
     Key.RIGHT_ALT:              Key.RIGHT_CTRL,                 # Chromebook - Multi-language (Remove)
     Key.RIGHT_CTRL:             Key.RIGHT_ALT,                  # Chromebook - Multi-language (Remove)
-}, when = lambda ctx:
-    matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    isKBtype('Chromebook', map='mmap GUI Cbk ML-OFF')(ctx) and 
-    cnfg.multi_lang is False
-)
+}, when = all_of(
+    matchProps(not_lst=terminals_and_remotes_lod),
+    isKBtype('Chromebook', map='mmap GUI Cbk ML-OFF'),
+    setting_is('multi_lang', False)
+) )
 modmap("Cond modmap - GUI - Cbk kbd", {
     # - Chromebook
     Key.LEFT_CTRL:              Key.LEFT_ALT,                   # Chromebook
     Key.LEFT_ALT:               Key.RIGHT_CTRL,                 # Chromebook
-}, when = lambda ctx:
-    matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    isKBtype('Chromebook', map='mmap GUI Cbk')(ctx)
-)
+}, when = all_of(
+    matchProps(not_lst=terminals_and_remotes_lod),
+    isKBtype('Chromebook', map='mmap GUI Cbk')
+) )
 modmap("Cond modmap - GUI - Win kbd - multi_lang OFF", {
     # - Default Mac/Win
     # - Default Win
     Key.RIGHT_ALT:              Key.RIGHT_CTRL,                 # WinMac - Multi-language (Remove)
     Key.RIGHT_META:             Key.RIGHT_ALT,                  # WinMac - Multi-language (Remove)
     Key.RIGHT_CTRL:             Key.RIGHT_META,                 # WinMac - Multi-language (Remove)
-}, when = lambda ctx:
-    matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    isKBtype('Windows', map='mmap GUI Win ML-OFF')(ctx) and 
-    cnfg.multi_lang is False
-)
+}, when = all_of(
+    matchProps(not_lst=terminals_and_remotes_lod),
+    isKBtype('Windows', map='mmap GUI Win ML-OFF'),
+    setting_is('multi_lang', False)
+) )
 modmap("Cond modmap - GUI - Win kbd", {
     # - Default Mac/Win
     # - Default Win
     Key.LEFT_CTRL:              Key.LEFT_META,                  # WinMac
     Key.LEFT_META:              Key.LEFT_ALT,                   # WinMac
     Key.LEFT_ALT:               Key.RIGHT_CTRL,                 # WinMac
-}, when = lambda ctx:
-    matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    isKBtype('Windows', map='mmap GUI Win')(ctx)
-)
+}, when = all_of(
+    matchProps(not_lst=terminals_and_remotes_lod),
+    isKBtype('Windows', map='mmap GUI Win')
+) )
 modmap("Cond modmap - GUI - Mac kbd - multi_lang OFF", {
     # - Mac Only
     Key.RIGHT_META:             Key.RIGHT_CTRL,                 # Mac - Multi-language (Remove)
     Key.RIGHT_CTRL:             Key.RIGHT_META,                 # Mac - Multi-language (Remove)
-}, when = lambda ctx:
-    matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    isKBtype('Apple', map='mmap GUI Apple ML-OFF')(ctx) and 
-    cnfg.multi_lang is False
-)
+}, when = all_of(
+    matchProps(not_lst=terminals_and_remotes_lod),
+    isKBtype('Apple', map='mmap GUI Apple ML-OFF'),
+    setting_is('multi_lang', False)
+) )
 modmap("Cond modmap - GUI - Mac kbd", {
     # - Mac Only
     Key.LEFT_CTRL:              Key.LEFT_META,                  # Mac
     Key.LEFT_META:              Key.RIGHT_CTRL,                 # Mac
-}, when = lambda ctx:
-    matchProps(not_lst=terminals_and_remotes_lod)(ctx) and 
-    isKBtype('Apple', map='mmap GUI Apple')(ctx)
-)
+}, when = all_of(
+    matchProps(not_lst=terminals_and_remotes_lod),
+    isKBtype('Apple', map='mmap GUI Apple')
+) )
 
 
 # [Global Terminals conditional modmaps] Change modifier keys in certain applications
 modmap("Cond modmap - Terms - IBM kbd - multi_lang OFF", {
     # - IBM - Multi-language
     Key.RIGHT_ALT:              Key.RIGHT_CTRL,                 # IBM - Multi-language (Remove)
-}, when = lambda ctx:
-    matchProps(lst=terminals_lod)(ctx) and 
-    isKBtype('IBM', map='mmap terms IBM ML-OFF')(ctx) and 
-    cnfg.multi_lang is False
-)
+}, when = all_of(
+    matchProps(lst=terminals_lod),
+    isKBtype('IBM', map='mmap terms IBM ML-OFF'),
+    setting_is('multi_lang', False)
+) )
 modmap("Cond modmap - Terms - IBM kbd", {
     # - IBM
     Key.CAPSLOCK:               Key.LEFT_ALT,                   # IBM
@@ -1417,18 +1723,18 @@ modmap("Cond modmap - Terms - IBM kbd", {
     Key.LEFT_ALT:               Key.RIGHT_CTRL,                 # IBM
     # Right Meta does not exist on IBM keyboards
     Key.RIGHT_CTRL:             Key.RIGHT_ALT,                  # IBM
-}, when = lambda ctx:
-    matchProps(lst=terminals_lod)(ctx) and 
-    isKBtype('IBM', map='mmap terms IBM')(ctx)
-)
+}, when = all_of(
+    matchProps(lst=terminals_lod),
+    isKBtype('IBM', map='mmap terms IBM')
+) )
 modmap("Cond modmap - Terms - Cbk kbd - multi_lang OFF", {
     # - Chromebook
     Key.RIGHT_ALT:              Key.RIGHT_CTRL,                 # Chromebook - Multi-language (Remove)
-}, when = lambda ctx:
-    matchProps(lst=terminals_lod)(ctx) and 
-    isKBtype('Chromebook', map='mmap terms Cbk ML-OFF')(ctx) and 
-    cnfg.multi_lang is False
-)
+}, when = all_of(
+    matchProps(lst=terminals_lod),
+    isKBtype('Chromebook', map='mmap terms Cbk ML-OFF'),
+    setting_is('multi_lang', False)
+) )
 modmap("Cond modmap - Terms - Cbk kbd", {
     # - Chromebook
     # Left Ctrl Stays Left Ctrl
@@ -1436,41 +1742,41 @@ modmap("Cond modmap - Terms - Cbk kbd", {
     Key.LEFT_ALT:               Key.RIGHT_CTRL,                 # Chromebook
     # Right Meta does not exist on chromebooks
     Key.RIGHT_CTRL:             Key.RIGHT_ALT,                  # Chromebook
-}, when = lambda ctx:
-    matchProps(lst=terminals_lod)(ctx) and 
-    isKBtype('Chromebook', map='mmap terms Cbk')(ctx)
-)
+}, when = all_of(
+    matchProps(lst=terminals_lod),
+    isKBtype('Chromebook', map='mmap terms Cbk')
+) )
 modmap("Cond modmap - Terms - Win kbd - multi_lang OFF", {
     # - Default Mac/Win
     # - Default Win
     Key.RIGHT_ALT:              Key.RIGHT_CTRL,                 # WinMac - Multi-language (Remove)
     Key.RIGHT_META:             Key.RIGHT_ALT,                  # WinMac - Multi-language (Remove)
     Key.RIGHT_CTRL:             Key.LEFT_CTRL,                  # WinMac - Multi-language (Remove)
-}, when = lambda ctx:
-    matchProps(lst=terminals_lod)(ctx) and 
-    isKBtype('Windows', map='mmap terms Win ML-OFF')(ctx) and 
-    cnfg.multi_lang is False
-)
+}, when = all_of(
+    matchProps(lst=terminals_lod),
+    isKBtype('Windows', map='mmap terms Win ML-OFF'),
+    setting_is('multi_lang', False)
+) )
 modmap("Cond modmap - Terms - Win kbd", {
     # - Default Mac/Win
     # - Default Win
     Key.LEFT_CTRL:              Key.LEFT_CTRL,                  # WinMac
     Key.LEFT_META:              Key.LEFT_ALT,                   # WinMac
     Key.LEFT_ALT:               Key.RIGHT_CTRL,                 # WinMac
-}, when = lambda ctx:
-    matchProps(lst=terminals_lod)(ctx) and 
-    isKBtype('Windows', map='mmap terms Win')(ctx)
-)
+}, when = all_of(
+    matchProps(lst=terminals_lod),
+    isKBtype('Windows', map='mmap terms Win')
+) )
 modmap("Cond modmap - Terms - Mac kbd - multi_lang OFF", {
     # - Mac Only
     # Left Ctrl Stays Left Ctrl
     Key.RIGHT_META:             Key.RIGHT_CTRL,                 # Mac - Multi-language (Remove)
     Key.RIGHT_CTRL:             Key.LEFT_CTRL,                  # Mac - Multi-language (Remove)
-}, when = lambda ctx:
-    matchProps(lst=terminals_lod)(ctx) and 
-    isKBtype('Apple', map='mmap terms Apple ML-OFF')(ctx) and 
-    cnfg.multi_lang is False
-)
+}, when = all_of(
+    matchProps(lst=terminals_lod),
+    isKBtype('Apple', map='mmap terms Apple ML-OFF'),
+    setting_is('multi_lang', False)
+) )
 modmap("Cond modmap - Terms - Mac kbd", {
     # - Mac Only
     # Left Ctrl Stays Left Ctrl
@@ -1478,10 +1784,10 @@ modmap("Cond modmap - Terms - Mac kbd", {
     Key.LEFT_ALT:               Key.LEFT_ALT,                   # Mac (self-modmap)
     Key.LEFT_META:              Key.RIGHT_CTRL,                 # Mac
     Key.RIGHT_ALT:              Key.RIGHT_ALT,                  # Mac (self-modmap)
-}, when = lambda ctx:
-    matchProps(lst=terminals_lod)(ctx) and 
-    isKBtype('Apple', map='mmap terms Apple')(ctx)
-)
+}, when = all_of(
+    matchProps(lst=terminals_lod),
+    isKBtype('Apple', map='mmap terms Apple')
+) )
 
 
 
@@ -1516,8 +1822,7 @@ modmap("Cond modmap - Terms - Mac kbd", {
 
 def toggle_forced_numpad():
     """Toggle the Forced Numpad feature on or off."""
-    cnfg.forced_numpad = not cnfg.forced_numpad
-    cnfg.save_settings()
+    cnfg.set('forced_numpad', not cnfg.forced_numpad)
     # forced_numpad_alert()
     ntfy.forced_numpad(cnfg.forced_numpad)
 
@@ -1707,7 +2012,7 @@ keymap("DK-ABC - Grave", {
     C("Shift-V"):               UC(0x01DB),                     # Ǜ Latin Capital Letter U w/Diaeresis and Grave
     C("Shift-W"):               UC(0x1E80),                     # Ẁ Latin Capital Letter W with Grave
     C("Shift-Y"):               UC(0x1EF2),                     # Ỳ Latin Capital Letter Y with Grave
-}, when = lambda _: ac_Chr_main == 0x0060 and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x0060 and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Circumflex", {
     # Option+6                  {U+02C6}
@@ -1744,7 +2049,7 @@ keymap("DK-ABC - Circumflex", {
     C("Shift-W"):               UC(0x0174),                     # Ŵ Latin Capital Letter W with Circumflex
     C("Shift-Y"):               UC(0x0176),                     # Ŷ Latin Capital Letter Y with Circumflex
     C("Shift-Z"):               UC(0x1E90),                     # Ẑ Latin Capital Letter Z with Circumflex
-}, when = lambda _: ac_Chr_main == 0x02C6 and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02C6 and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Dot Above", {
     # Option+W                  {U+02D9}
@@ -1791,7 +2096,7 @@ keymap("DK-ABC - Dot Above", {
     C("Shift-X"):               UC(0x1E8A),                     # Ẋ Latin Capital Letter X with Dot Above
     C("Shift-Y"):               UC(0x1E8E),                     # Ẏ Latin Capital Letter Y with Dot Above
     C("Shift-Z"):               UC(0x017B),                     # Ż Latin Capital Letter Z with Dot Above
-}, when = lambda _: ac_Chr_main == 0x02D9 and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02D9 and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Acute", {
     # Option+E                  {U+00B4}
@@ -1826,7 +2131,7 @@ keymap("DK-ABC - Acute", {
     C("Shift-W"):               UC(0x1E82),                     # Ẃ Latin Capital Letter W with Acute
     C("Shift-Y"):               UC(0x00DD),                     # Ý Latin Capital Letter Y with Acute
     C("Shift-Z"):               UC(0x0179),                     # Ź Latin Capital Letter Z with Acute
-}, when = lambda _: ac_Chr_main == 0x00B4 and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x00B4 and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Double Grave", {
     # Shift+Option+Y            {U+030F} [uses {U+02F5} Modifier Letter Middle Double Grave Accent]
@@ -1845,7 +2150,7 @@ keymap("DK-ABC - Double Grave", {
     C("Shift-O"):               UC(0x020C),                     # Ȍ Latin Capital Letter O with Double Grave
     C("Shift-R"):               UC(0x0210),                     # Ȑ Latin Capital Letter R with Double Grave
     C("Shift-U"):               UC(0x0214),                     # Ȕ Latin Capital Letter U with Double Grave
-}, when=lambda _: ac_Chr_main in [0x030F, 0x02F5] and cnfg.optspec_layout == 'ABC')
+}, when=dynamic(lambda _: ac_Chr_main in [0x030F, 0x02F5] and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Umlaut/Diaeresis", {
     # Option+U                  {U+00A8}
@@ -1872,7 +2177,7 @@ keymap("DK-ABC - Umlaut/Diaeresis", {
     C("Shift-W"):               UC(0x1E84),                     # Ẅ Latin Capital Letter W with Diaeresis
     C("Shift-X"):               UC(0x1E8C),                     # Ẍ Latin Capital Letter X with Diaeresis
     C("Shift-Y"):               UC(0x0178),                     # Ÿ Latin Capital Letter Y with Diaeresis
-}, when = lambda _: ac_Chr_main == 0x00A8 and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x00A8 and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Apostrophe/Horn", {
     # Option+I                  {U+02BC}
@@ -1883,7 +2188,7 @@ keymap("DK-ABC - Apostrophe/Horn", {
     C("U"):                     UC(0x01B0),                     # ư Latin Small Letter U with Horn
     C("Shift-O"):               UC(0x01A0),                     # Ơ Latin Capital Letter O with Horn
     C("Shift-U"):               UC(0x01AF),                     # Ư Latin Capital Letter U with Horn
-}, when = lambda _: ac_Chr_main == 0x02BC and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02BC and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Comma Below", {
     # Option+P                  {U+002C}
@@ -1894,7 +2199,7 @@ keymap("DK-ABC - Comma Below", {
     C("T"):                     UC(0x021B),                     # ț Latin Small Letter T with Comma Below
     C("Shift-S"):               UC(0x0218),                     # Ș Latin Capital Letter S with Comma Below
     C("Shift-T"):               UC(0x021A),                     # Ț Latin Capital Letter T with Comma Below
-}, when = lambda _: ac_Chr_main == 0x002C and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x002C and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Macron/Line Above", {
     # Option+A                  {U+00AF}
@@ -1923,7 +2228,7 @@ keymap("DK-ABC - Macron/Line Above", {
     C("Shift-V"):               UC(0x01D5),                     # Ǖ Latin Capital Letter U with Diaeresis and Macron
     C("Shift-Y"):               UC(0x0232),                     # Ȳ Latin Capital Letter Y with Macron
     C("Shift-Z"):              [UC(0x005A),UC(0x0304)],         # Z̄ Latin Capital Letter Z with Macron
-}, when = lambda _: ac_Chr_main == 0x00AF and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x00AF and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Inverted Breve", {
     # Shift+Option+S            {U+0311}    [uses {U+1D16} as a substitute]
@@ -1942,7 +2247,7 @@ keymap("DK-ABC - Inverted Breve", {
     C("Shift-O"):               UC(0x020E),                     # Ȏ Latin Capital Letter O with Inverted Breve
     C("Shift-R"):               UC(0x0212),                     # Ȓ Latin Capital Letter R with Inverted Breve
     C("Shift-U"):               UC(0x0216),                     # Ȗ Latin Capital Letter U with Inverted Breve
-}, when = lambda _: ac_Chr_main in [0x0311, 0x1D16] and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main in [0x0311, 0x1D16] and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Tilde Below", {
     # Shift+Option+F            {U+0330}    [uses {U+02F7} as a substitute]
@@ -1955,7 +2260,7 @@ keymap("DK-ABC - Tilde Below", {
     C("Shift-E"):               UC(0x1E1A),                     # Ḛ Latin Capital Letter E with Tilde Below
     C("Shift-I"):               UC(0x1E2C),                     # Ḭ Latin Capital Letter I with Tilde Below
     C("Shift-U"):               UC(0x1E74),                     # Ṵ Latin Capital Letter U with Tilde Below
-}, when = lambda _: ac_Chr_main in [0x0330, 0x02F7] and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main in [0x0330, 0x02F7] and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Caret/Circumflex Below", {
     # Shift+Option+G            {U+2038}
@@ -1974,7 +2279,7 @@ keymap("DK-ABC - Caret/Circumflex Below", {
     C("Shift-N"):               UC(0x1E4A),                     # Ṋ Latin Capital Letter N with Circumflex Below
     C("Shift-T"):               UC(0x1E70),                     # Ṱ Latin Capital Letter T with Circumflex Below
     C("Shift-U"):               UC(0x1E76),                     # Ṷ Latin Capital Letter U with Circumflex Below
-}, when = lambda _: ac_Chr_main == 0x2038 and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x2038 and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Low Macron/Line Below", {
     # Option+H                  {U+02CD}
@@ -1999,7 +2304,7 @@ keymap("DK-ABC - Low Macron/Line Below", {
     C("Shift-R"):               UC(0x1E5E),                     # Ṟ Latin Capital Letter R with Line Below 
     C("Shift-T"):               UC(0x1E6E),                     # Ṯ Latin Capital Letter T with Line Below 
     C("Shift-Z"):               UC(0x1E94),                     # Ẕ Latin Capital Letter Z with Line Below 
-}, when = lambda _: ac_Chr_main == 0x02CD and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02CD and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Double Acute", {
     # Option+J                  {U+02DD}
@@ -2010,7 +2315,7 @@ keymap("DK-ABC - Double Acute", {
     C("U"):                     UC(0x0171),                     # ű Latin Small Letter U with Double Acute
     C("Shift-O"):               UC(0x0150),                     # Ő Latin Capital Letter O with Double Acute
     C("Shift-U"):               UC(0x0170),                     # Ű Latin Capital Letter U with Double Acute
-}, when = lambda _: ac_Chr_main == 0x02DD and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02DD and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Ring Above", {
     # Option+K                  {U+02DA}
@@ -2029,7 +2334,7 @@ keymap("DK-ABC - Ring Above", {
     C("Shift-U"):               UC(0x016E),                     # Ů Latin Capital Letter U with Ring Above
     C("Shift-W"):              [UC(0x0057),UC(0x030A)],         # W̊ Latin Capital Letter W with Ring Above
     C("Shift-Y"):              [UC(0x0059),UC(0x030A)],         # Y̊ Latin Capital Letter Y with Ring Above
-}, when = lambda _: ac_Chr_main == 0x02DA and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02DA and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Stroke/Hyphen-Minus", {
     # Option+L                  {U+002D}
@@ -2054,7 +2359,7 @@ keymap("DK-ABC - Stroke/Hyphen-Minus", {
     C("Shift-O"):               UC(0x019F),                     # Ɵ Latin Capital Letter O with Middle Tilde
     C("Shift-T"):               UC(0x0166),                     # Ŧ Latin Capital Letter T with Stroke
     C("Shift-Z"):               UC(0x01B5),                     # Ƶ Latin Capital Letter Z with Stroke
-}, when = lambda _: ac_Chr_main == 0x002D and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x002D and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Numero Sign", {
     # Shift+Option+Semicolon    {U+2116}
@@ -2106,7 +2411,7 @@ keymap("DK-ABC - Numero Sign", {
     C("Shift-W"):               UC(0x01F7),                     # Ƿ  Latin Capital Letter Wynn
     C("Shift-Y"):               UC(0x021C),                     # Ȝ  Latin Capital Letter Yogh
     C("Shift-Z"):               UC(0x01B7),                     # Ʒ  Latin Capital Letter Ezh
-}, when = lambda _: ac_Chr_main == 0x2116 and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x2116 and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Hook Above/Glottal Stop", {
     # Option+Z                  {U+02C0}
@@ -2125,7 +2430,7 @@ keymap("DK-ABC - Hook Above/Glottal Stop", {
     C("Shift-O"):               UC(0x1ECE),                     # Ỏ  Latin Small Letter O with Hook Above
     C("Shift-U"):               UC(0x1EE6),                     # Ủ  Latin Small Letter U with Hook Above
     C("Shift-Y"):               UC(0x1EF6),                     # Ỷ  Latin Small Letter Y with Hook Above
-}, when = lambda _: ac_Chr_main == 0x02C0 and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02C0 and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Dot Below", {
     # Option+X                  {U+002E}
@@ -2170,7 +2475,7 @@ keymap("DK-ABC - Dot Below", {
     C("Shift-W"):               UC(0x1E88),                     # Ẉ Latin Capital Letter W with Dot Below
     C("Shift-Y"):               UC(0x1EF4),                     # Ỵ Latin Capital Letter Y with Dot Below
     C("Shift-Z"):               UC(0x1E92),                     # Ẓ Latin Capital Letter Z with Dot Below
-}, when = lambda _: ac_Chr_main == 0x002E and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x002E and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Cedilla/Cedille", {
     # Option+C                  {U+00B8}
@@ -2201,7 +2506,7 @@ keymap("DK-ABC - Cedilla/Cedille", {
     C("Shift-S"):               UC(0x015E),                     # Ş Latin Capital Letter S with Cedilla
     C("Shift-T"):               UC(0x0162),                     # Ţ Latin Capital Letter T with Cedilla
     C("Shift-Z"):              [UC(0x005A),UC(0x0327)],         # Z̧ Latin Capital Letter Z with Cedilla
-}, when = lambda _: ac_Chr_main == 0x00B8 and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x00B8 and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Caron/hacek", {
     # Option+V                  {U+02C7}
@@ -2246,7 +2551,7 @@ keymap("DK-ABC - Caron/hacek", {
     C("Shift-V"):               UC(0x01D9),                     # Ǚ Latin Capital Letter U w/Diaeresis and Caron
     C("Shift-X"):              [UC(0x01B7),UC(0x030C)],         # Ǯ Latin Capital Letter Ezh with Caron
     C("Shift-Z"):               UC(0x017D),                     # Ž Latin Capital Letter Z with Caron
-}, when = lambda _: ac_Chr_main == 0x02C7 and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02C7 and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Breve", {
     # Option+B                  {U+02D8}
@@ -2267,7 +2572,7 @@ keymap("DK-ABC - Breve", {
     C("Shift-I"):               UC(0x012C),                     # Ĭ Latin Capital Letter I with Breve
     C("Shift-O"):               UC(0x014E),                     # Ŏ Latin Capital Letter O with Breve
     C("Shift-U"):               UC(0x016C),                     # Ŭ Latin Capital Letter U with Breve
-}, when = lambda _: ac_Chr_main == 0x02D8 and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02D8 and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Tilde", {
     # Option+N                  {U+02DC}
@@ -2290,7 +2595,7 @@ keymap("DK-ABC - Tilde", {
     C("Shift-U"):               UC(0x0168),                     # Ũ Latin Capital Letter U with Tilde
     C("Shift-V"):               UC(0x1E7C),                     # Ṽ Latin Capital Letter V with Tilde
     C("Shift-Y"):               UC(0x1EF8),                     # Ỹ Latin Capital Letter Y with Tilde
-}, when = lambda _: ac_Chr_main == 0x02DC and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02DC and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Ogonek", {
     # Option+M                  {U+02DB}
@@ -2307,7 +2612,7 @@ keymap("DK-ABC - Ogonek", {
     C("Shift-I"):               UC(0x012E),                     # Į Latin Capital Letter I with Ogonek
     C("Shift-O"):               UC(0x01EA),                     # Ǫ Latin Capital Letter O with Ogonek
     C("Shift-U"):               UC(0x0172),                     # Ų Latin Capital Letter U with Ogonek
-}, when = lambda _: ac_Chr_main == 0x02DB and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02DB and cnfg.optspec_layout == 'ABC'))
 
 keymap("DK-ABC - Hook", {
     # Shift+Option+Dot          {U+0294}
@@ -2348,7 +2653,7 @@ keymap("DK-ABC - Hook", {
     C("Shift-X"):               UC(0x0189),                     # Ɖ Latin Capital Letter African D
     C("Shift-Y"):               UC(0x01B3),                     # Ƴ Latin Capital Letter Y with Hook
     C("Shift-Z"):               UC(0x0224),                     # Ȥ Latin Capital Letter Z with Hook
-}, when = lambda _: ac_Chr_main == 0x0294 and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main == 0x0294 and cnfg.optspec_layout == 'ABC'))
 
 
 #######################################
@@ -2368,7 +2673,7 @@ keymap("DK-US - Grave", {
     C("Shift-I"):               UC(0x00CC),                     # Ì Latin Capital I with Grave
     C("Shift-O"):               UC(0x00D2),                     # Ò Latin Capital O with Grave
     C("Shift-U"):               UC(0x00D9),                     # Ù Latin Capital U with Grave
-}, when = lambda _: ac_Chr_main == 0x0060 and cnfg.optspec_layout == 'US')
+}, when = dynamic(lambda _: ac_Chr_main == 0x0060 and cnfg.optspec_layout == 'US'))
 
 keymap("DK-US - Acute", {
     # Valid keys:
@@ -2384,7 +2689,7 @@ keymap("DK-US - Acute", {
     C("Shift-I"):               UC(0x00CD),                     # Í Latin Capital I with Acute
     C("Shift-O"):               UC(0x00D3),                     # Ó Latin Capital O with Acute
     C("Shift-U"):               UC(0x00DA),                     # Ú Latin Capital U with Acute
-}, when = lambda _: ac_Chr_main == 0x00B4 and cnfg.optspec_layout == 'US')
+}, when = dynamic(lambda _: ac_Chr_main == 0x00B4 and cnfg.optspec_layout == 'US'))
 
 keymap("DK-US - Umlaut", {
     # Valid keys:
@@ -2402,7 +2707,7 @@ keymap("DK-US - Umlaut", {
     C("Shift-O"):               UC(0x00D6),                     # Ö Latin Capital O with Umlaut
     C("Shift-U"):               UC(0x00DC),                     # Ü Latin Capital U with Umlaut
     C("Shift-Y"):               UC(0x0178),                     # Ÿ Latin Capital Y with Umlaut
-}, when = lambda _: ac_Chr_main == 0x00A8 and cnfg.optspec_layout == 'US')
+}, when = dynamic(lambda _: ac_Chr_main == 0x00A8 and cnfg.optspec_layout == 'US'))
 
 keymap("DK-US - Circumflex", {
     # Valid keys:
@@ -2418,7 +2723,7 @@ keymap("DK-US - Circumflex", {
     C("Shift-I"):               UC(0x00CE),                     # Î Latin Capital I with Circumflex
     C("Shift-O"):               UC(0x00D4),                     # Ô Latin Capital O with Circumflex
     C("Shift-U"):               UC(0x00DB),                     # Û Latin Capital U with Circumflex
-}, when = lambda _: ac_Chr_main == 0x02C6 and cnfg.optspec_layout == 'US')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02C6 and cnfg.optspec_layout == 'US'))
 
 keymap("DK-US - Tilde", {
     # Valid keys:
@@ -2430,7 +2735,7 @@ keymap("DK-US - Tilde", {
     C("Shift-A"):               UC(0x00C3),                     # Ã Latin Capital A with Tilde
     C("Shift-N"):               UC(0x00D1),                     # Ñ Latin Capital N with Tilde
     C("Shift-O"):               UC(0x00D5),                     # Õ Latin Capital O with Tilde
-}, when = lambda _: ac_Chr_main == 0x02DC and cnfg.optspec_layout == 'US')
+}, when = dynamic(lambda _: ac_Chr_main == 0x02DC and cnfg.optspec_layout == 'US'))
 
 
 
@@ -2493,7 +2798,7 @@ keymap("Escape actions for dead keys - Overrides for ABC Extended", {
 
     C("Shift-Alt-Dot"): [getDK(),UC(0x0294),C("Shift-Left"),setDK(0x0294)], # Dead Key Accent: Hook
 
-}, when = lambda _: ac_Chr_main in deadkeys_list and cnfg.optspec_layout == 'ABC')
+}, when = dynamic(lambda _: ac_Chr_main in deadkeys_list and cnfg.optspec_layout == 'ABC'))
 
 keymap("Escape actions for dead keys", {
     # special case shortcuts that should cancel dead keys
@@ -2631,11 +2936,11 @@ keymap("Escape actions for dead keys", {
     C("Shift-Dot"):             [getDK(),C("Shift-Dot"),setDK(None)],
     C("Shift-Slash"):           [getDK(),C("Shift-Slash"),setDK(None)],
 
-}, when = lambda _: ac_Chr_main in deadkeys_list)
+}, when = dynamic(lambda _: ac_Chr_main in deadkeys_list))
 
 keymap("Disable Dead Keys Tripwire",{
     # Nothing needs to be here. Tripwire keymap to disable active dead keys keymap(s)
-}, when = lambda _: setDK(None)())
+}, when = dynamic(lambda _: setDK(None)()) )
 
 
 
@@ -2805,7 +3110,9 @@ keymap("OptSpecialChars - ABC", {
 
     C("Shift-Alt-Slash"):       UC(0x00BF),                     # ¿ Inverted Question mark
 
-}, when = lambda ctx: matchProps(not_lst=terminals_and_remotes_lod)(ctx) and cnfg.optspec_layout == 'ABC')
+}, when = all_of(
+    matchProps(not_lst=terminals_and_remotes_lod),
+    setting_is('optspec_layout', 'ABC') ) )
 
 
 
@@ -2952,7 +3259,9 @@ keymap("OptSpecialChars - US", {
     C("Shift-Alt-Dot"):         UC(0x02D8),                     # ˘ Breve diacritic (non-combining)
     C("Shift-Alt-Slash"):       UC(0x00BF),                     # ¿ Inverted Question mark
 
-}, when = lambda ctx: matchProps(not_lst=terminals_and_remotes_lod)(ctx) and cnfg.optspec_layout == 'US')
+}, when = all_of(
+    matchProps(not_lst=terminals_and_remotes_lod),
+    setting_is('optspec_layout', 'US') ) )
 
 
 
@@ -3096,10 +3405,9 @@ keymap("Overrides for Dolphin - Finder Mods pre-KF6", {
     # KDE Frameworks 6 assigns F10 to "Open Main Manu" so this is only valid for KF5 now
     # (Reference https://planet.kde.org/felix-ernst-2023-10-13-f10-for-accessibility-in-kf6/)
     C("Shift-RC-n"):            iEF2(C("F10"), False),          # Create new folder (F10), toggle Enter to be Enter (pre-KF6!)
-}, when = lambda ctx: 
-    matchProps(clas="^dolphin$|^org.kde.dolphin$")(ctx) and 
-    DESKTOP_ENV == 'kde' and 
-    DE_MAJ_VER == '5' )
+}, when = all_of(
+    env_is(DESKTOP_ENV='kde', DE_MAJ_VER='5'),
+    matchProps(clas="^dolphin$|^org.kde.dolphin$") ) )
 keymap("Overrides for Dolphin - Finder Mods", {
     C("RC-KEY_2"):              C("C-KEY_3"),                   # View as List (Detailed)
     C("RC-KEY_3"):              C("C-KEY_2"),                   # View as List (Compact)
@@ -3499,31 +3807,32 @@ keymap("Wordwise - not vscode", {
 # Keybindings for VS Code and variants
 keymap("VSCodes overrides for Chromebook/IBM - Sublime", {
     C("C-Alt-g"):               C("C-f2"),                      # Chromebook/IBM - Sublime - find_all_under
-}, when = lambda ctx:
-    matchProps(lst=vscodes_lod)(ctx) and 
-    (   isKBtype('Chromebook', map="vscodes ovr cbook - sublime")(ctx) or 
-        isKBtype('IBM', map="vscodes ovr ibm - sublime")(ctx) ) and 
-    cnfg.ST3_in_VSCode)
+}, when = all_of(
+    matchProps(lst=vscodes_lod),
+    any_of( isKBtype('Chromebook', map="vscodes ovr cbook - sublime"),
+            isKBtype('IBM', map="vscodes ovr ibm - sublime") ),
+    setting_is('ST3_in_VSCode', True) ) )
 keymap("VSCodes overrides for not Chromebook/IBM - Sublime", {
     C("Super-C-g"):             C("C-f2"),                      # Default - Sublime - find_all_under
-}, when = lambda ctx:
-    matchProps(lst=vscodes_lod)(ctx) and 
-    not ( isKBtype('Chromebook', map="vscodes ovr not cbook - sublime")(ctx) or 
-    isKBtype('IBM', map="vscodes ovr not ibm - sublime")(ctx) ) and cnfg.ST3_in_VSCode)
+}, when = all_of(
+    matchProps(lst=vscodes_lod),
+    not_(any_of( isKBtype('Chromebook', map="vscodes ovr not cbook - sublime"),
+            isKBtype('IBM', map="vscodes ovr not ibm - sublime") )),
+    setting_is('ST3_in_VSCode', True) ) )
 keymap("VSCodes overrides for Chromebook/IBM", {
     C("Alt-c"):                 C("C-c"),                       #  Chromebook/IBM - Terminal - Sigint
     C("Alt-x"):                 C("C-x"),                       #  Chromebook/IBM - Terminal - Exit nano
-}, when = lambda ctx:
-    matchProps(lst=vscodes_lod)(ctx) and 
-    (   isKBtype('Chromebook', map="vscodes ovr cbook")(ctx) or 
-        isKBtype('IBM', map="vscodes ovr ibm")(ctx) ) )
+}, when = all_of(
+    matchProps(lst=vscodes_lod),
+    any_of( isKBtype('Chromebook', map="vscodes ovr cbook"),
+            isKBtype('IBM', map="vscodes ovr ibm") ) ) )
 keymap("VSCodes overrides for not Chromebook/IBM", {
     C("Super-c"):               C("C-c"),                       # Default - Terminal - Sigint
     C("Super-x"):               C("C-x"),                       # Default - Terminal - Exit nano
-}, when = lambda ctx:
-    matchProps(lst=vscodes_lod)(ctx) and 
-    not (   isKBtype('Chromebook', map="vscodes ovr not cbook")(ctx) or 
-            isKBtype('IBM', map="vscodes ovr not ibm")(ctx) ) )
+}, when = all_of(
+    matchProps(lst=vscodes_lod),
+    not_(any_of( isKBtype('Chromebook', map="vscodes ovr not cbook"),
+            isKBtype('IBM', map="vscodes ovr not ibm") )) ) )
 keymap("VSCodes", {
 
     # C("Super-Space"):           C("C-Space"),                  # Basic code completion (conflicts with input switching)
@@ -3590,19 +3899,19 @@ keymap("Sublime Text overrides for Chromebook/IBM", {
     C("Alt-x"):                 C("C-x"),                       #  Chromebook/IBM - Terminal - Exit nano
     C("Alt-Refresh"):           ignore_combo,                   # Chromebook/IBM - cancel find_all_under
     C("Alt-C-g"):               C("Alt-Refresh"),               # Chromebook/IBM - find_all_under
-}, when = lambda ctx:
-    matchProps(clas=sublimeStr)(ctx) and 
-    (   isKBtype('Chromebook', map="sublime ovr cbook")(ctx) or 
-        isKBtype('IBM', map="sublime ovr ibm")(ctx) ) )
+}, when = all_of(
+    matchProps(clas=sublimeStr),
+    any_of( isKBtype('Chromebook', map="sublime ovr cbook"),
+            isKBtype('IBM', map="sublime ovr ibm") ) ) )
 keymap("Sublime Text overrides for not Chromebook/IBM", {
     # C("Super-c"):               C("C-c"),                       # Default - Terminal - Sigint
     # C("Super-x"):               C("C-x"),                       # Default - Terminal - Exit nano
     C("Alt-f3"):                ignore_combo,                   # Default - cancel find_all_under
     C("Super-C-g"):             C("Alt-f3"),                    # Default - find_all_under
-}, when = lambda ctx:
-    matchProps(clas=sublimeStr)(ctx) and 
-    not (   isKBtype('Chromebook', map="sublime ovr not cbook")(ctx) or 
-            isKBtype('IBM', map="sublime ovr not ibm")(ctx) ) )
+}, when = all_of(
+    matchProps(clas=sublimeStr),
+    not_(any_of( isKBtype('Chromebook', map="sublime ovr not cbook"),
+            isKBtype('IBM', map="sublime ovr not ibm") )) ) )
 keymap("Sublime Text", {
     # C("Super-c"):               C("C-c"),                       # Default - Terminal - Sigint
     # C("Super-x"):               C("C-x"),                       # Default - Terminal - Exit nano
@@ -3722,14 +4031,13 @@ keymap("Cmd+W dialog fix - send Escape", {
 # sending Super+Q to close the dialogs in the matchProps list, instead of sending Alt+F4.
 keymap("Cmd+W dialog fix - Super+Q Manjaro GNOME", {
     C("RC-W"):                  iEF2(C("Super-Q"), True),
-}, when = lambda ctx:
-    matchProps(lst=dialogs_CloseWin_lod)(ctx) and
-    ( DISTRO_NAME == 'manjaro' and DESKTOP_ENV == 'gnome' ) )
+}, when = ifEnv(
+    DISTRO_NAME == 'manjaro' and DESKTOP_ENV == 'gnome',
+    matchProps(lst=dialogs_CloseWin_lod) ) )
 
 keymap("Cmd+W dialog fix - Alt+F4", {
     C("RC-W"):                  iEF2(C("Alt-F4"), True),
-}, when = lambda ctx:
-    matchProps(lst=dialogs_CloseWin_lod)(ctx) )
+}, when = matchProps(lst=dialogs_CloseWin_lod) )
 
 
 
@@ -3851,45 +4159,45 @@ keymap("Xfce4 terminal", {
 keymap("GenTerms overrides: elementary OS", {
     C("LC-Right"):              [bind,C("Super-Right")],        # SL - Change workspace (elementary)
     C("LC-Left"):               [bind,C("Super-Left")],         # SL - Change workspace (elementary)
-}, when = lambda ctx: matchProps(lst=terminals_lod)(ctx) and DISTRO_NAME == 'elementary')
+}, when = ifEnv(DISTRO_NAME == 'elementary', matchProps(lst=terminals_lod)) )
 keymap("GenTerms overrides: Fedora GNOME", {
     C("RC-H"):                  C("Super-h"),                   # Hide Window/Minimize app (gnome/fedora)
-}, when = lambda ctx: matchProps(lst=terminals_lod)(ctx) and DISTRO_NAME in ['fedora', 'almalinux'] and DESKTOP_ENV in ['gnome'] )
+}, when = ifEnv(DISTRO_NAME in ['fedora', 'almalinux'] and DESKTOP_ENV in ['gnome'], matchProps(lst=terminals_lod)) )
 keymap("GenTerms overrides: Pop!_OS", {
     C("LC-Right"):              [bind,C("Super-C-Up")],         # SL - Change workspace (pop)
     C("LC-Left"):               [bind,C("Super-C-Down")],       # SL - Change workspace (pop)
-}, when = lambda ctx: matchProps(lst=terminals_lod)(ctx) and DISTRO_NAME == 'pop')
+}, when = ifEnv(DISTRO_NAME == 'pop', matchProps(lst=terminals_lod)) )
 keymap("GenTerms overrides: Ubuntu/Fedora", {
     C("LC-RC-Q"):               C("Super-L"),                   # Lock screen (ubuntu/fedora)
     C("LC-Right"):              [bind,C("Super-Page_Up")],      # SL - Change workspace (ubuntu/fedora)
     C("LC-Left"):               [bind,C("Super-Page_Down")],    # SL - Change workspace (ubuntu/fedora)
-}, when = lambda ctx: matchProps(lst=terminals_lod)(ctx) and DISTRO_NAME in ['ubuntu', 'fedora'] )
+}, when = ifEnv(DISTRO_NAME in ['ubuntu', 'fedora'], matchProps(lst=terminals_lod)) )
 
 
 # Overrides to General Terminals shortcuts for specific desktop environments
 keymap("GenTerms overrides: Budgie", {
     C("LC-Right"):              [bind,C("C-Alt-Right")],        # Default SL - Change workspace (budgie)
     C("LC-Left"):               [bind,C("C-Alt-Left")],         # Default SL - Change workspace (budgie)
-}, when = lambda ctx: matchProps(lst=terminals_lod)(ctx) and DESKTOP_ENV == 'budgie' )
+}, when = ifEnv(DESKTOP_ENV == 'budgie', matchProps(lst=terminals_lod)) )
 keymap("GenTerms overrides: GNOME", {
     ### Keyboard input source (language/layout) switching in GNOME
     # C("LC-Space"):              update_kb_layout,             # keyboard input source (language) switching (gnome)
     # C("Shift-LC-Space"):        update_kb_layout,             # keyboard input source (language) switching (reverse) (gnome)
     C("LC-Space"):             [bind,C("Super-Space")],         # keyboard input source (language) switching (gnome)
     C("Shift-LC-Space"):       [bind,C("Super-Shift-Space")],   # keyboard input source (language) switching (reverse) (gnome)
-}, when = lambda ctx: matchProps(lst=terminals_lod)(ctx) and DESKTOP_ENV == 'gnome' )
+}, when = ifEnv(DESKTOP_ENV == 'gnome', matchProps(lst=terminals_lod)) )
 keymap("GenTerms overrides: KDE", {
     C("RC-H"):                  C("Super-Page_Down"),           # Hide Window/Minimize app (KDE Plasma)
-}, when = lambda ctx: matchProps(lst=terminals_lod)(ctx) and DESKTOP_ENV in ['kde', 'plasma'] )
+}, when = ifEnv(DESKTOP_ENV in ['kde', 'plasma'], matchProps(lst=terminals_lod)) )
 keymap("GenTerms overrides: swaywm", {
     C("RC-Q"):                  C("Shift-C-Q"),                 # Override sway GenGUI Cmd+Q
-}, when = lambda ctx: matchProps(lst=terminals_lod)(ctx) and DESKTOP_ENV == 'sway' )
+}, when = ifEnv(DESKTOP_ENV == 'sway', matchProps(lst=terminals_lod)) )
 keymap("GenTerms overrides: Xfce4", {
     C("RC-Grave"):             [bind,C("Super-Tab")],           # xfce4 Switch within app group
     C("Shift-RC-Grave"):       [bind,C("Super-Shift-Tab")],     # xfce4 Switch within app group
     C("LC-Right"):             [bind,C("C-Alt-Home")],          # SL - Change workspace xfce4
     C("LC-Left"):              [bind,C("C-Alt-End")],           # SL - Change workspace xfce4
-}, when = lambda ctx: matchProps(lst=terminals_lod)(ctx) and DESKTOP_ENV == 'xfce' )
+}, when = ifEnv(DESKTOP_ENV == 'xfce', matchProps(lst=terminals_lod)) )
 
 
 # Active in all apps in the terminals list
@@ -3982,66 +4290,66 @@ keymap("GenGUI overrides: Chromebook/IBM", {
     C("Alt-Grave") :           [iEF2NT(),bind,C("C-Shift-Tab")],    # Chromebook/IBM - In-App Tab switching
     C("RAlt-Backspace"):        C("Delete"),                        # Chromebook/IBM - Delete
     C("LAlt-Backspace"):        C("C-Backspace"),                   # Chromebook/IBM - Delete Left Word of Cursor
-}, when = lambda ctx:
-    matchProps(not_lst=remotes_lod)(ctx) and 
-    (   isKBtype('Chromebook', map="gengui ovr cbook")(ctx) or 
-        isKBtype('IBM', map="gengui ovr ibm")(ctx) ) )
+}, when = all_of(
+    matchProps(not_lst=remotes_lod),
+    any_of( isKBtype('Chromebook', map="gengui ovr cbook"),
+            isKBtype('IBM', map="gengui ovr ibm") ) ) )
 keymap("GenGUI overrides: not Chromebook", {
     # In-App Tab switching
     C("Super-Tab"):            [iEF2NT(),bind,C("C-Tab")],          # Default not-chromebook
     C("Super-Shift-Tab"):      [iEF2NT(),bind,C("Shift-C-Tab")],    # Default not-chromebook
     C("Alt-Backspace"):         C("C-Backspace"),                   # Default not-chromebook
-}, when = lambda ctx:
-    matchProps(not_lst=remotes_lod)(ctx) and 
-    not isKBtype('Chromebook', map="gengui ovr not cbook")(ctx) )
+}, when = all_of(
+    matchProps(not_lst=remotes_lod),
+    not_(isKBtype('Chromebook', map="gengui ovr not cbook")) ) )
 
 
 # Overrides to General GUI shortcuts for specific distros
 keymap("GenGUI overrides: Debian Xfce4", {
     C("RC-Space"):             [iEF2NT(),C("Alt-F1")],     # Launch Application Menu xfce4 (Debian)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DISTRO_NAME == 'debian' and DESKTOP_ENV == 'xfce' )
+}, when = ifEnv(DISTRO_NAME == 'debian' and DESKTOP_ENV == 'xfce', matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: elementary OS", {
     C("RC-F3"):                 C("Super-d"),                   # Default SL - Show Desktop (gnome/kde,elementary)
     C("RC-Space"):             [iEF2NT(),C("Super-Space")],     # SL - Launch Application Menu (elementary)
     C("RC-LC-f"):               C("Super-Up"),                  # SL- Maximize app elementary
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DISTRO_NAME == 'elementary' )
+}, when = ifEnv(DISTRO_NAME == 'elementary', matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: Fedora GNOME", {
     C("Super-RC-Q"):            C("Super-L"),                   # Lock screen (fedora)
     C("RC-H"):                  C("Super-h"),                   # Default SL - Minimize app (gnome/budgie/popos/fedora) not-deepin
     C("Super-Right"):          [bind,C("Super-Page_Up")],       # SL - Change workspace (ubuntu/fedora)
     C("Super-Left"):           [bind,C("Super-Page_Down")],     # SL - Change workspace (ubuntu/fedora)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DISTRO_NAME in ['fedora', 'almalinux'] and DESKTOP_ENV in ['gnome'] )
+}, when = ifEnv(DISTRO_NAME in ['fedora', 'almalinux'] and DESKTOP_ENV in ['gnome'], matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: Manjaro GNOME", {
     C("RC-Q"):              C("Super-Q"),                       # Close window
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DISTRO_NAME == 'manjaro' and DESKTOP_ENV == 'gnome' )
+}, when = ifEnv(DISTRO_NAME == 'manjaro' and DESKTOP_ENV == 'gnome', matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: Manjaro Xfce", {
     C("RC-Space"):             [iEF2NT(),C("Alt-F1")],          # Open Whisker Menu with Cmd+Space
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DISTRO_NAME == 'manjaro' and DESKTOP_ENV == 'xfce' )
+}, when = ifEnv(DISTRO_NAME == 'manjaro' and DESKTOP_ENV == 'xfce', matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: Manjaro", {
     # TODO: figure out why these two are the same!
     C("RC-LC-f"):               C("Super-PAGE_UP"),             # SL- Maximize app manjaro
     C("RC-LC-f"):               C("Super-PAGE_DOWN"),           # SL - Minimize app manjaro
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DISTRO_NAME == 'manjaro' )
+}, when = ifEnv(DISTRO_NAME == 'manjaro', matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: Mint Xfce4", {
     C("RC-Space"):             [iEF2NT(),C("Super-Space")],     # Launch Application Menu xfce4 (Linux Mint)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DISTRO_NAME == 'mint' and DESKTOP_ENV == 'xfce' )
+}, when = ifEnv(DISTRO_NAME == 'mint' and DESKTOP_ENV == 'xfce', matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: KDE Neon", {
     C("RC-Super-f"):            C("Super-Page_Up"),             # SL - Toggle maximized window state (kde_neon)
     C("RC-H"):                  C("Super-Page_Down"),           # SL - Minimize app (kde_neon)
                                                                 # SL - Default SL - Change workspace (kde_neon)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DISTRO_NAME == 'neon' )
+}, when = ifEnv(DISTRO_NAME == 'neon', matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: Pop!_OS", {
     C("RC-Space"):             [iEF2NT(),C("Super-slash")],     # "Launch and switch applications" (pop)
     C("RC-H"):                  C("Super-h"),                   # Default SL - Minimize app (gnome/budgie/popos/fedora) not-deepin
     C("Super-Right"):          [bind,C("Super-C-Up")],          # SL - Change workspace (pop)
     C("Super-Left"):           [bind,C("Super-C-Down")],        # SL - Change workspace (pop)
     C("RC-Q"):                  C("Super-q"),                   # SL - Close Apps (pop)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DISTRO_NAME == 'pop' )
+}, when = ifEnv(DISTRO_NAME == 'pop', matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: Ubuntu", {
     C("Super-RC-Q"):            C("Super-L"),                   # Lock screen (ubuntu)
     C("Super-Right"):          [bind,C("Super-Page_Up")],       # SL - Change workspace (ubuntu)
     C("Super-Left"):           [bind,C("Super-Page_Down")],     # SL - Change workspace (ubuntu)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DISTRO_NAME == 'ubuntu' )
+}, when = ifEnv(DISTRO_NAME == 'ubuntu', matchProps(not_lst=remotes_lod)) )
 
 
 # Overrides to General GUI shortcuts for specific desktop environments
@@ -4050,26 +4358,25 @@ keymap("GenGUI overrides: Budgie", {
     C("Super-Right"):           C("C-Alt-Right"),               # Change workspace (budgie)
     C("Super-Left"):            C("C-Alt-Left"),                # Change workspace (budgie)
     C("RC-H"):                  C("Super-h"),                   # Minimize app (gnome/budgie/popos/fedora) not-deepin
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'budgie' )
+}, when = ifEnv(DESKTOP_ENV == 'budgie', matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: Cinnamon", {
     C("RC-Space"):             [iEF2NT(),C("C-Esc")],           # Right click, configure Mint menu shortcut to Ctrl+Esc
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'cinnamon' )
+}, when = ifEnv(DESKTOP_ENV == 'cinnamon', matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: DDE", {
     C("RC-Space"):             [iEF2NT(),Key.LEFT_META],        # Open Launcher menu (Deeping Desktop Environment)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'dde' )
+}, when = ifEnv(DESKTOP_ENV == 'dde', matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: Deepin", {
     C("RC-H"):                  C("Super-n"),                   # Minimize app (deepin)
     C("Alt-RC-Space"):          C("Super-e"),                   # Open Finder - (deepin)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'deepin' )
+}, when = ifEnv(DESKTOP_ENV == 'deepin', matchProps(not_lst=remotes_lod)) )
 keymap("GenGUI overrides: KDE", {
     C("RC-H"):                  C("Super-Page_Down"),           # Minimize app (KDE Plasma)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV in ['kde', 'plasma'] )
+}, when = ifEnv(DESKTOP_ENV in ['kde', 'plasma'], matchProps(not_lst=remotes_lod)) )
 
 
 keymap("GenGUI overrides: pre-GNOME 45 fix", {
     C("RC-Space"):             [iEF2NT(),C("Super-s")],         # Override GNOME 45+ Key.LEFT_META remap
-}, when = lambda ctx: 
-        matchProps(not_lst=remotes_lod)(ctx) and is_pre_GNOME_45(DE_MAJ_VER)(ctx) )
+}, when = ifEnv(is_pre_GNOME_45(DE_MAJ_VER), matchProps(not_lst=remotes_lod)) )
 
 keymap("GenGUI overrides: GNOME", {
     C("RC-Space"):             [iEF2NT(),Key.LEFT_META],        # Show GNOME overview/app launcher
@@ -4080,21 +4387,21 @@ keymap("GenGUI overrides: GNOME", {
     C("RC-Shift-Key_3"):        C("Shift-Print"),               # Take a screenshot immediately (gnome)
     C("RC-Shift-Key_4"):        C("Alt-Print"),                 # Take a screenshot of a window (gnome)
     C("RC-Shift-Key_5"):        C("Print"),                     # Take a screenshot interactively (gnome)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'gnome' )
+}, when = ifEnv(DESKTOP_ENV == 'gnome', matchProps(not_lst=remotes_lod)) )
 
 keymap("GenGUI overrides: Enlightenment", {
     C("RC-q"):                  C("C-Alt-x"),                   # Close window (Cmd+Q)
     # C("RC-Space"):             [iEF2NT(),C("C-Alt-m")],         # enlightenment main menu (override in "User Apps" slice if necessary)
     C("RC-Space"):             [iEF2NT(),C("C-Alt-Space")],     # enlightenment main menu (override in "User Apps" slice if necessary)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'enlightenment' )
+}, when = ifEnv(DESKTOP_ENV == 'enlightenment', matchProps(not_lst=remotes_lod)) )
 
 keymap("GenGUI overrides: Hyprland", {
     C("RC-Space"):             [iEF2NT(),Key.LEFT_META],        # Hyprland (override in "User Apps" slice if necessary)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'hyprland' )
+}, when = ifEnv(DESKTOP_ENV == 'hyprland', matchProps(not_lst=remotes_lod)) )
 
 keymap("GenGUI overrides: IceWM", {
     C("RC-Space"):             [iEF2NT(),Key.LEFT_META],        # IceWM: Win95Keys=1 (Meta shows menu)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'icewm' )
+}, when = ifEnv(DESKTOP_ENV == 'icewm', matchProps(not_lst=remotes_lod)) )
 
 keymap("GenGUI overrides: KDE", {
     C("RC-Space"):             [iEF2NT(),C("Alt-F1")],          # Default SL - Launch Application Menu (gnome/kde)
@@ -4104,24 +4411,24 @@ keymap("GenGUI overrides: KDE", {
     C("RC-Shift-Key_3"):        C("Shift-Print"),               # Take a screenshot immediately (kde)
     C("RC-Shift-Key_4"):        C("Alt-Print"),                 # Take a screenshot of a window (kde)
     C("RC-Shift-Key_5"):        C("Print"),                     # Take a screenshot interactively (kde)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'kde' )
+}, when = ifEnv(DESKTOP_ENV == 'kde', matchProps(not_lst=remotes_lod)) )
 
 keymap("GenGUI overrides: MATE", {
     C("RC-Space"):             [iEF2NT(),C("Alt-Space")],       # Right click, configure Mint menu shortcut to match
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'mate' )
+}, when = ifEnv(DESKTOP_ENV == 'mate', matchProps(not_lst=remotes_lod)) )
 
 keymap("GenGUI overrides: swaywm", {
     C("RC-Space"):             [iEF2NT(),C("Super-d")],         # Open sway launcher
     C("RC-Q"):                  C("C-Q"),                       # Override General GUI Alt+F4 remap
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'sway' )
+}, when = ifEnv(DESKTOP_ENV == 'sway', matchProps(not_lst=remotes_lod)) )
 
 keymap("GenGUI overrides: Trinity desktop", {
     C("RC-Space"):             [iEF2NT(),Key.LEFT_META],        # Trinity desktop (Q4OS)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'trinity' )
+}, when = ifEnv(DESKTOP_ENV == 'trinity', matchProps(not_lst=remotes_lod)) )
 
 keymap("GenGUI overrides: Unity desktop", {
     C("RC-Space"):             [iEF2NT(),Key.LEFT_META],        # Trinity desktop (Q4OS)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'unity' )
+}, when = ifEnv(DESKTOP_ENV == 'unity', matchProps(not_lst=remotes_lod)) )
 
 keymap("GenGUI overrides: Xfce4", {
     C("RC-Grave"):             [bind,C("Super-Tab")],           # xfce4 Switch within app group
@@ -4133,7 +4440,7 @@ keymap("GenGUI overrides: Xfce4", {
     C("RC-Shift-Key_3"):        C("Print"),                     # Take a screenshot immediately (xfce4)
     C("RC-Shift-Key_4"):        C("Alt-Print"),                 # Take a screenshot of a window (xfce4)
     C("RC-Shift-Key_5"):        C("Shift-Print"),               # Take a screenshot interactively (xfce4)
-}, when = lambda ctx: matchProps(not_lst=remotes_lod)(ctx) and DESKTOP_ENV == 'xfce' )
+}, when = ifEnv(DESKTOP_ENV == 'xfce', matchProps(not_lst=remotes_lod)) )
 
 
 # None referenced here originally
@@ -4204,3 +4511,36 @@ keymap("Diagnostics", {
     C("Shift-Alt-RC-i"):        isDoubleTap(notify_context),
     C("Shift-Alt-RC-t"):        isDoubleTap(macro_tester),
 }, when = lambda ctx: ctx is ctx )
+
+
+
+###############################################################################
+# KEEP THIS AT THE VERY END OF THE CONFIG FILE!
+# Remove any maps that can never match in this session (conditions folded 
+# to `Const(False)` by `env_is()`/`ifEnv()`), so keyszer never evaluates them.
+prune_never_maps()
+# Take maps out of the map lists while a setting they need (`setting_is()`) is off
+gate_maps_on_settings(cnfg)
+# Opt-in: let compound conditions reorder their checks from measured cost and selectivity
+if learn_condition_order_enabled:
+    learn_condition_order(
+        os.path.join(current_folder_path, 'toshy_condition_order.json')
+        if persist_condition_order else None)
+# Print the recent per-event trace messages with the diagnostics key (F15) or SIGUSR1
+add_diagnostics_dump(dump_trace)
+# Opt-in cost profile of the conditions (see `profile_conditions_enabled`)
+if profile_conditions_enabled:
+    from lib.cond_profiler import profile_conditions
+    profile_conditions()
+# Remember which maps are active for each window/device context, so most conditions 
+# are only evaluated again after a focus, title, device or settings change.
+cache_active_maps(cnfg)
+# Index the keys/combos bound in each map, so only the conditions of maps 
+# that can act on the key being pressed get evaluated.
+index_map_keys()
+# Skip the conditions of all maps but "Diagnostics" in remotes, VMs and fullscreen games
+if bypass_mode_enabled:
+    use_bypass_mode(any_of(
+        matchProps(lst=remotes_lod),
+        matchProps(lst=bypass_lod),
+        all_of(matchProps(fullscreen=True), matchProps(lst=fullscreen_games_lod)) ))
@@ -79,7 +79,7 @@ APP_VERSION     = '2024.0202'
 
 # Settings object used to tweak preferences "live" between gui, tray and config.
 cnfg = Settings(current_folder_path)
-cnfg.watch_database()       # activate watchdog observer on the sqlite3 db file
+cnfg.watch_changes()        # get settings changes from the other Toshy processes (D-Bus)
 cnfg.watch_synergy_log()    # activate watchdog observer on the Synergy log file
 debug("")
 debug(cnfg, ctx="CG")
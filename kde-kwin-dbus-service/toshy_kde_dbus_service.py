@@ -110,25 +110,63 @@ class DBUS_Object(dbus.service.Object):
         self.caption            = "NO_DATA"
         self.resource_class     = "NO_DATA"
         self.resource_name      = "NO_DATA"
+        self.window_type        = ""        # empty if the KWin script doesn't send it
+        self.transient          = False
+        self.modal              = False
+        self.pid                = 0         # zero if not known
+        self.fullscreen         = False
 
     @dbus.service.method(TOSHY_KDE_DBUS_SVC_IFACE, in_signature='sss')
     def NotifyActiveWindow(self, caption, resource_class, resource_name):
+        # called by older versions of the KWin script, without the window type
         debug(f'{LOG_PFX}: NotifyActiveWindow() called...')
+        self.NotifyActiveWindowProps(caption, resource_class, resource_name, "", False, False, 0, False)
+
+    @dbus.service.method(TOSHY_KDE_DBUS_SVC_IFACE, in_signature='ssssbbib')
+    def NotifyActiveWindowProps(self, caption, resource_class, resource_name, 
+                                window_type, transient, modal, pid, fullscreen):
+        # The KWin script also calls this when the state of the active window changes.
+        # The Toshy config only asks again on its own when the class or title changes.
+        same_title              = ( (self.caption, self.resource_class, self.resource_name) ==
+                                    (str(caption), str(resource_class), str(resource_name)) )
+        old_state               = (self.window_type, self.transient, self.modal, self.pid, self.fullscreen)
         self.caption            = str(caption)
         self.resource_class     = str(resource_class)
         self.resource_name      = str(resource_name)
+        self.window_type        = str(window_type)
+        self.transient          = bool(transient)
+        self.modal              = bool(modal)
+        self.pid                = int(pid)
+        self.fullscreen         = bool(fullscreen)
         debug(f'{LOG_PFX}: Active window attributes:'
                 f"\n\t caption        = '{self.caption}'"
                 f"\n\t resource_class = '{self.resource_class}'"
                 f"\n\t resource_name  = '{self.resource_name}'"
+                f"\n\t window_type    = '{self.window_type}'"
+                f"\n\t transient      = {self.transient}"
+                f"\n\t modal          = {self.modal}"
+                f"\n\t pid            = {self.pid}"
+                f"\n\t fullscreen     = {self.fullscreen}"
         )
+        if same_title and old_state != (self.window_type, self.transient, self.modal, self.pid, self.fullscreen):
+            self.WindowStateChanged()
+
+    @dbus.service.signal(TOSHY_KDE_DBUS_SVC_IFACE, signature='')
+    def WindowStateChanged(self):
+        # tells the Toshy config to ask for the window properties again
+        debug(f'{LOG_PFX}: Active window state changed')
 
     @dbus.service.method(TOSHY_KDE_DBUS_SVC_IFACE, out_signature='a{sv}')
     def GetActiveWindow(self):
         debug(f'{LOG_PFX}: GetActiveWindow() called...')
         return {    'caption':          self.caption,
                     'resource_class':   self.resource_class,
-                    'resource_name':    self.resource_name }
+                    'resource_name':    self.resource_name,
+                    'window_type':      self.window_type,
+                    'transient':        dbus.Boolean(self.transient),
+                    'modal':            dbus.Boolean(self.modal),
+                    'pid':              dbus.Int32(self.pid),
+                    'fullscreen':       dbus.Boolean(self.fullscreen) }
 
 
 def main():
@@ -1,3 +1,12 @@
+// Window type, transient and modal state, for matching dialogs in the Toshy config
+function windowTypeOf(client) {
+    if (client.dialog)          { return "dialog"; }
+    if (client.utility)         { return "utility"; }
+    if (client.splash)          { return "splash"; }
+    if (client.normalWindow)    { return "normal"; }
+    return "other";
+}
+
 function notifyActiveWindow(client){
     // Check if the client is null (might be null when task switcher dialog has focus)
     if (!client) {
@@ -8,18 +17,50 @@ function notifyActiveWindow(client){
     var caption = client.hasOwnProperty('caption') ? client.caption : "UNDEF";
     var resourceClass = client.hasOwnProperty('resourceClass') ? client.resourceClass : "UNDEF";
     var resourceName = client.hasOwnProperty('resourceName') ? client.resourceName : "UNDEF";
+    var windowType = windowTypeOf(client);
+    var transient = client.transient === true;
+    var modal = client.modal === true;
+    var pid = client.hasOwnProperty('pid') ? client.pid : 0;
+    var fullScreen = client.fullScreen === true;
 
     callDBus(
         "org.toshy.Toshy",
         "/org/toshy/Toshy",
         "org.toshy.Toshy",
-        "NotifyActiveWindow",
+        "NotifyActiveWindowProps",
         caption,
         resourceClass,
-        resourceName
+        resourceName,
+        windowType,
+        transient,
+        modal,
+        pid,
+        fullScreen
     );
 }
 
-workspace.clientActivated.connect(function(client){
+// Send the window properties again when the active window goes in or out of fullscreen
+var activeClient = null;
+
+function notifyActiveWindowState() {
+    notifyActiveWindow(activeClient);
+}
+
+function watchActiveWindow(client) {
+    if (activeClient) {
+        try {
+            activeClient.fullScreenChanged.disconnect(notifyActiveWindowState);
+        } catch (error) {
+            // the window was closed already
+        }
+    }
+    activeClient = client;
+    if (client) {
+        client.fullScreenChanged.connect(notifyActiveWindowState);
+    }
     notifyActiveWindow(client);
+}
+
+workspace.clientActivated.connect(function(client){
+    watchActiveWindow(client);
 });
@@ -1,3 +1,12 @@
+// Window type, transient and modal state, for matching dialogs in the Toshy config
+function windowTypeOf(window) {
+    if (window.dialog)          { return "dialog"; }
+    if (window.utility)         { return "utility"; }
+    if (window.splash)          { return "splash"; }
+    if (window.normalWindow)    { return "normal"; }
+    return "other";
+}
+
 function notifyActiveWindow(window){
     // Check if the client is null (might be null when task switcher dialog has focus)
     if (!window) {
@@ -8,17 +17,49 @@ function notifyActiveWindow(window){
     var caption = window.hasOwnProperty('caption') ? window.caption : "UNDEF";
     var resourceClass = window.hasOwnProperty('resourceClass') ? window.resourceClass : "UNDEF";
     var resourceName = window.hasOwnProperty('resourceName') ? window.resourceName : "UNDEF";
+    var windowType = windowTypeOf(window);
+    var transient = window.transient === true;
+    var modal = window.modal === true;
+    var pid = window.hasOwnProperty('pid') ? window.pid : 0;
+    var fullScreen = window.fullScreen === true;
 
     callDBus(
         "org.toshy.Toshy",
         "/org/toshy/Toshy",
         "org.toshy.Toshy",
-        "NotifyActiveWindow",
+        "NotifyActiveWindowProps",
         caption,
         resourceClass,
-        resourceName
+        resourceName,
+        windowType,
+        transient,
+        modal,
+        pid,
+        fullScreen
     );
 }
 
+// Send the window properties again when the active window goes in or out of fullscreen
+var activeWindow = null;
+
+function notifyActiveWindowState() {
+    notifyActiveWindow(activeWindow);
+}
+
+function watchActiveWindow(window) {
+    if (activeWindow) {
+        try {
+            activeWindow.fullScreenChanged.disconnect(notifyActiveWindowState);
+        } catch (error) {
+            // the window was closed already
+        }
+    }
+    activeWindow = window;
+    if (window) {
+        window.fullScreenChanged.connect(notifyActiveWindowState);
+    }
+    notifyActiveWindow(window);
+}
+
 // Set up the function link to the event
-workspace.windowActivated.connect(notifyActiveWindow);
+workspace.windowActivated.connect(watchActiveWindow);
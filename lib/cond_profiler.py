@@ -0,0 +1,114 @@
+import time
+
+from collections import deque
+from typing import List
+from keyszer.lib.logger import debug
+
+from lib.diagnostics import add_diagnostics_dump
+from lib.map_dispatch import get_map_lists
+
+
+
+# How many of the most recent evaluation times to keep per condition, for p99
+samples_per_condition       = 1024
+
+PROFILED_CONDITIONS: List['CondStats']      = []
+
+
+class CondStats:
+    """Evaluation statistics for the condition of one modmap/keymap."""
+    __slots__ = ('map_name', 'map_kind', 'calls', 'true_count', 'total_ns', 'samples')
+
+    def __init__(self, map_name: str, map_kind: str):
+        self.map_name       = map_name
+        self.map_kind       = map_kind
+        self.calls          = 0
+        self.true_count     = 0
+        self.total_ns       = 0
+        self.samples        = deque(maxlen=samples_per_condition)
+
+    def p99_ns(self) -> int:
+        if not self.samples:
+            return 0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+
+    def true_ratio(self) -> float:
+        return self.true_count / self.calls if self.calls else 0.0
+
+
+def _profiled(stats: CondStats, when):
+    perf_counter_ns = time.perf_counter_ns
+
+    def _when_profiled(ctx):
+        start = perf_counter_ns()
+        result = when(ctx)
+        elapsed = perf_counter_ns() - start
+        stats.calls += 1
+        stats.total_ns += elapsed
+        stats.samples.append(elapsed)
+        if result:
+            stats.true_count += 1
+        return result
+
+    # keep the "dynamic" marking visible on the wrapper
+    if getattr(when, 'toshy_dynamic', False):
+        _when_profiled.toshy_dynamic = True
+    return _when_profiled
+
+
+def format_condition_stats() -> str:
+    """Return the condition statistics as a table, most expensive conditions first."""
+    rows = sorted(PROFILED_CONDITIONS, key=lambda stats: stats.total_ns, reverse=True)
+    lines = [
+        f"{'total ms':>10} {'calls':>9} {'mean us':>9} {'p99 us':>9} {'true %':>7}  kind    map",
+        '-' * 100,
+    ]
+    for stats in rows:
+        if not stats.calls:
+            continue
+        lines.append(
+            f"{stats.total_ns / 1e6:>10.2f} {stats.calls:>9} "
+            f"{stats.total_ns / stats.calls / 1e3:>9.1f} {stats.p99_ns() / 1e3:>9.1f} "
+            f"{stats.true_ratio() * 100:>6.1f}%  {stats.map_kind:<7} '{stats.map_name}'")
+    unused = sum(1 for stats in rows if not stats.calls)
+    lines.append(f"({unused} profiled conditions not evaluated yet)")
+    return '\n'.join(lines)
+
+
+def dump_condition_stats():
+    """Print the condition statistics table."""
+    print("*** TOSHY CONDITION PROFILE ***", flush=True)
+    print(format_condition_stats(), flush=True)
+    print("", flush=True)
+
+
+def profile_conditions() -> int:
+    """
+    Wrap the condition of every registered modmap/keymap to record its call count,
+    cumulative and p99 evaluation time, and how often it was True.
+
+    The table is printed when the keyszer diagnostics key is pressed (F15 by default,
+    see `dump_diagnostics_key()`), or when the keyszer process gets SIGUSR1:
+
+        pkill -USR1 -f 'keyszer'
+
+    Call this after all maps are defined. To measure what the conditions really
+    cost, call it before `cache_active_maps()` and `index_map_keys()`, so only real
+    evaluations are counted (not the ones answered from the cache or key index).
+    Returns the number of profiled conditions.
+    """
+    kinds = ('modmap', 'multi', 'keymap')
+    for kind, map_list in zip(kinds, get_map_lists()):
+        for _map in map_list:
+            if _map.conditional is None:
+                continue
+            stats = CondStats(_map.name, kind)
+            PROFILED_CONDITIONS.append(stats)
+            _map.conditional = _profiled(stats, _map.conditional)
+
+    add_diagnostics_dump(dump_condition_stats)
+
+    debug(f"Condition profiler enabled for {len(PROFILED_CONDITIONS)} conditions. "
+            f"Dump with the diagnostics key or SIGUSR1.")
+    return len(PROFILED_CONDITIONS)
@@ -0,0 +1,575 @@
+import json
+import time
+import atexit
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+from keyszer.lib.logger import debug, error
+
+from lib.matching import AppGroup, snapshot
+
+
+
+# Settings object read by `setting_is()` conditions (see `use_settings()`)
+SETTINGS = None
+
+# Session-constant environment values read by `env_is()` conditions (see `use_env()`)
+ENV: Dict[str, Any] = {}
+
+# Relative cost estimates, used to put cheap checks first in compound conditions
+COST_CONST          = 0
+COST_SETTING        = 1
+COST_GROUP          = 5
+COST_OPAQUE         = 20
+
+# Conditions with the same structure are shared, keyed on `Condition.key`
+_INTERNED: Dict[Hashable, 'Condition'] = {}
+
+# Learning the evaluation order of compound conditions (see `learn_condition_order()`):
+# the children are timed on one of every `learn_sample_every` calls, and the compound 
+# is reordered each time it has `learn_reorder_after` more samples.
+learn_sample_every  = 16
+learn_reorder_after = 64
+_NEVER_SAMPLE       = float('inf')
+
+# Compounds that are learning their order, by stable ID ("map kind: map name/child path",
+# with "#2", "#3"... added to the map name for maps with the same name)
+LEARNING_COMPOUNDS: Dict[str, '_Compound'] = {}
+
+
+def use_settings(settings):
+    """Set the Settings object that `setting_is()` conditions read from."""
+    global SETTINGS
+    SETTINGS = settings
+
+
+def use_env(**env_values):
+    """Register session-constant environment values for `env_is()` conditions."""
+    ENV.update(env_values)
+
+
+def _intern(cond: 'Condition') -> 'Condition':
+    return _INTERNED.setdefault(cond.key, cond)
+
+
+class Condition(ABC):
+    """
+    Base class of the composable condition objects. A condition is called with
+    the keyszer context like any other `when=` function, but its structure can
+    also be inspected (`key`, `children`, `describe()`), so compound conditions
+    can be folded, deduplicated, reordered and cached.
+
+    Conditions can be combined with `&`, `|` and `~`, same as with
+    `all_of()`, `any_of()` and `not_()`.
+
+    Conditions are expected to have no side effects, so they can be reordered.
+    Wrap anything else with `dynamic()` (from lib.map_dispatch), which keeps
+    it (and any compound condition holding it) in its original order and out
+    of the per-context caches.
+    """
+    cost                = COST_OPAQUE
+    children: Tuple['Condition', ...] = ()
+
+    @property
+    @abstractmethod
+    def key(self) -> Hashable:
+        ...
+
+    @property
+    def toshy_dynamic(self) -> bool:
+        return any(child.toshy_dynamic for child in self.children)
+
+    @property
+    def never(self) -> bool:
+        """True if the condition can never be True in this session."""
+        return False
+
+    def required_settings(self) -> Tuple['SettingIs', ...]:
+        """Setting checks that must all be True for this condition to be True."""
+        return ()
+
+    @abstractmethod
+    def __call__(self, ctx) -> bool:
+        ...
+
+    @abstractmethod
+    def describe(self) -> str:
+        ...
+
+    def __and__(self, other):
+        return all_of(self, other)
+
+    def __or__(self, other):
+        return any_of(self, other)
+
+    def __invert__(self):
+        return not_(self)
+
+    def __repr__(self):
+        return self.describe()
+
+
+class Const(Condition):
+    """A condition already decided at config load (like an environment check)."""
+    cost                = COST_CONST
+
+    def __init__(self, value: bool):
+        self.value          = bool(value)
+
+    @property
+    def key(self):
+        return ('const', self.value)
+
+    @property
+    def never(self):
+        return not self.value
+
+    def __call__(self, ctx):
+        return self.value
+
+    def describe(self):
+        return 'always' if self.value else 'never'
+
+
+class Predicate(Condition):
+    """
+    Any plain condition function (a `matchProps()` matcher, a lambda...) used inside
+    a compound condition. It can't be looked into, so it is assumed to be expensive.
+    """
+    def __init__(self, func: Callable, label: str = None):
+        self.func           = func
+        self.label          = label or getattr(func, '__qualname__', repr(func))
+        self.cost           = getattr(func, 'cost', COST_OPAQUE)
+
+    @property
+    def key(self):
+        return ('pred', id(self.func))
+
+    @property
+    def toshy_dynamic(self):
+        return getattr(self.func, 'toshy_dynamic', False)
+
+    def __call__(self, ctx):
+        return self.func(ctx)
+
+    def describe(self):
+        return f"<{self.label}>"
+
+
+class Dynamic(Condition):
+    """
+    A condition object marked with `dynamic()`. Conditions are shared between maps,
+    so the mark goes on a wrapper instead of on the (possibly shared) condition.
+    """
+    toshy_dynamic       = True
+
+    def __init__(self, child: Condition):
+        self.children       = (child,)
+        self.cost           = child.cost
+
+    @property
+    def key(self):
+        return ('dynamic', self.children[0].key)
+
+    @property
+    def never(self):
+        return self.children[0].never
+
+    def required_settings(self):
+        return self.children[0].required_settings()
+
+    def __call__(self, ctx):
+        return self.children[0](ctx)
+
+    def describe(self):
+        return f"dynamic({self.children[0].describe()})"
+
+
+class PropInGroup(Condition):
+    """Match a window/device property against a group of patterns (an `AppGroup`)."""
+    cost                = COST_GROUP
+
+    def __init__(self, prop: str, patterns: Iterable[str], cse: bool = False):
+        self.prop           = prop
+        self.patterns       = tuple(patterns)
+        self.cse            = cse
+        self.group          = AppGroup(self.patterns, cse=cse)
+        self.prop_cf        = prop + '_cf'
+
+    @property
+    def key(self):
+        return ('group', self.prop, self.patterns, self.cse)
+
+    def __call__(self, ctx):
+        snap = snapshot(ctx)
+        return self.group.search(getattr(snap, self.prop) or '', getattr(snap, self.prop_cf))
+
+    def describe(self):
+        return f"{self.prop} in {list(self.patterns)}"
+
+
+class SettingIs(Condition):
+    """Check a user preference from the Settings object, on every call."""
+    cost                = COST_SETTING
+
+    def __init__(self, name: str, value: Any):
+        if SETTINGS is None:
+            raise RuntimeError("setting_is(): call use_settings() with the Settings object first")
+        if not hasattr(SETTINGS, name):
+            raise AttributeError(f"setting_is(): there is no setting named '{name}'")
+        self.name           = name
+        self.value          = value
+
+    @property
+    def key(self):
+        return ('setting', self.name, self.value)
+
+    def required_settings(self):
+        return (self,)
+
+    def __call__(self, ctx):
+        return getattr(SETTINGS, self.name) == self.value
+
+    def describe(self):
+        return f"setting {self.name} == {self.value!r}"
+
+
+class Not(Condition):
+    def __init__(self, child: Condition):
+        self.children       = (child,)
+        self.cost           = child.cost
+
+    @property
+    def key(self):
+        return ('not', self.children[0].key)
+
+    def __call__(self, ctx):
+        return not self.children[0](ctx)
+
+    def describe(self):
+        return f"not {self.children[0].describe()}"
+
+
+class ChildStats:
+    """Sampled cost and selectivity of one child of a compound condition."""
+    __slots__ = ('samples', 'total_ns', 'decisive')
+
+    def __init__(self):
+        self.samples        = 0
+        self.total_ns       = 0
+        self.decisive       = 0     # times the child alone decided the compound
+
+    def rank(self) -> float:
+        """Expected cost per decision (lower goes first): mean cost / P(decisive)."""
+        mean_ns = self.total_ns / self.samples if self.samples else 0.0
+        p_decisive = (self.decisive + 1) / (self.samples + 2)
+        return mean_ns / p_decisive
+
+
+class _Compound(Condition):
+    # the child value that decides the whole compound (False for all_of)
+    decisive_value      = None
+
+    def __init__(self, children: List[Condition]):
+        self.children       = tuple(children)
+        self.original       = self.children     # order as written in the config
+        self.cost           = sum(child.cost for child in children)
+        self.child_stats    = None
+        self._countdown     = _NEVER_SAMPLE
+        self._samples       = 0
+
+    def reorder(self, ordered_children: Iterable[Condition]):
+        """Change the evaluation order (the same children, in a new order)."""
+        ordered_children = tuple(ordered_children)
+        if sorted(map(id, ordered_children)) != sorted(map(id, self.children)):
+            raise ValueError("reorder(): must be the same children")
+        self.children = ordered_children
+
+    def start_learning(self):
+        """Start sampling the cost and selectivity of the children."""
+        if self.toshy_dynamic:
+            return
+        self.child_stats    = {id(child): ChildStats() for child in self.children}
+        self._countdown     = learn_sample_every
+
+    def _sampled_call(self, ctx):
+        # Time the children one by one, stopping at the first one that decides the 
+        # compound, like a normal call. Each sample starts at the next child in turn, 
+        # so every child gets measured now and then without running all of them 
+        # (like a list of remote desktop app regexes) on every sample.
+        self._countdown = learn_sample_every
+        perf_counter_ns = time.perf_counter_ns
+        result = not self.decisive_value
+        first = self._samples % len(self.children)
+        for child in self.children[first:] + self.children[:first]:
+            start = perf_counter_ns()
+            value = bool(child(ctx))
+            stats = self.child_stats[id(child)]
+            stats.total_ns += perf_counter_ns() - start
+            stats.samples += 1
+            if value is self.decisive_value:
+                stats.decisive += 1
+                result = self.decisive_value
+                break
+        self._samples += 1
+        if self._samples % learn_reorder_after == 0:
+            self.reorder(sorted(self.children, 
+                                key=lambda child: self.child_stats[id(child)].rank()))
+        return result
+
+    def describe_stats(self) -> str:
+        lines = [self.describe()]
+        for child in self.children:
+            stats = self.child_stats[id(child)] if self.child_stats else ChildStats()
+            mean_us = stats.total_ns / stats.samples / 1e3 if stats.samples else 0.0
+            lines.append(f"    {mean_us:>8.2f} us  decisive {stats.decisive:>6}/{stats.samples:<6} "
+                            f"{child.describe()}")
+        return '\n'.join(lines)
+
+
+class AllOf(_Compound):
+    decisive_value      = False
+
+    @property
+    def key(self):
+        return ('all', tuple(child.key for child in self.original))
+
+    def required_settings(self):
+        return tuple(setting for child in self.original for setting in child.required_settings())
+
+    def __call__(self, ctx):
+        self._countdown -= 1
+        if self._countdown <= 0:
+            return self._sampled_call(ctx)
+        for child in self.children:
+            if not child(ctx):
+                return False
+        return True
+
+    def describe(self):
+        return f"all_of({', '.join(child.describe() for child in self.children)})"
+
+
+class AnyOf(_Compound):
+    decisive_value      = True
+
+    @property
+    def key(self):
+        return ('any', tuple(child.key for child in self.original))
+
+    def __call__(self, ctx):
+        self._countdown -= 1
+        if self._countdown <= 0:
+            return self._sampled_call(ctx)
+        for child in self.children:
+            if child(ctx):
+                return True
+        return False
+
+    def describe(self):
+        return f"any_of({', '.join(child.describe() for child in self.children)})"
+
+
+def as_condition(cond) -> Condition:
+    """Turn a condition function (or bool) into a Condition object, if needed."""
+    if isinstance(cond, Condition):
+        return cond
+    if isinstance(cond, bool):
+        return _intern(Const(cond))
+    if callable(cond):
+        return _intern(Predicate(cond))
+    raise TypeError(f"Not a condition: {cond!r}")
+
+
+def _combine(compound_cls, conds, absorbing: bool):
+    """
+    Flatten nested compounds of the same kind, fold constants, drop duplicates,
+    and put cheaper checks first (unless a dynamic condition needs its place).
+    `absorbing` is the constant that decides the whole compound (False for all_of).
+    """
+    children = []
+    seen_keys = set()
+    for cond in map(as_condition, conds):
+        parts = cond.children if isinstance(cond, compound_cls) else (cond,)
+        for part in parts:
+            if isinstance(part, Const):
+                if part.value is absorbing:
+                    return _intern(Const(absorbing))
+                continue
+            if part.key in seen_keys:
+                continue
+            seen_keys.add(part.key)
+            children.append(part)
+    if not children:
+        return _intern(Const(not absorbing))
+    if len(children) == 1:
+        return children[0]
+    if not any(child.toshy_dynamic for child in children):
+        children.sort(key=lambda child: child.cost)     # stable, keeps order of equal costs
+    return _intern(compound_cls(children))
+
+
+def all_of(*conds) -> Condition:
+    """True if all of the conditions are True (checked cheapest first)."""
+    return _combine(AllOf, conds, absorbing=False)
+
+
+def any_of(*conds) -> Condition:
+    """True if any of the conditions is True (checked cheapest first)."""
+    return _combine(AnyOf, conds, absorbing=True)
+
+
+def not_(cond) -> Condition:
+    """True if the condition is False."""
+    cond = as_condition(cond)
+    if isinstance(cond, Const):
+        return _intern(Const(not cond.value))
+    if isinstance(cond, Not):
+        return cond.children[0]
+    return _intern(Not(cond))
+
+
+def mark_dynamic(cond: Condition) -> Condition:
+    """Mark a condition object as dynamic (use `dynamic()` from lib.map_dispatch)."""
+    if cond.toshy_dynamic:
+        return cond
+    return _intern(Dynamic(cond))
+
+
+def app_group(*patterns: str, cse: bool = False) -> Condition:
+    """True if the window class matches any of the patterns (like `matchProps(clas=...)`)."""
+    return _intern(PropInGroup('wm_class', patterns, cse=cse))
+
+
+def device_group(*patterns: str, cse: bool = False) -> Condition:
+    """True if the keyboard device name matches any of the patterns."""
+    return _intern(PropInGroup('device_name', patterns, cse=cse))
+
+
+def setting_is(name: str, value: Any) -> Condition:
+    """True if the user preference `name` currently has the given value."""
+    return _intern(SettingIs(name, value))
+
+
+def env_is(**expected) -> Condition:
+    """
+    Check session-constant environment values registered with `use_env()`, once,
+    at config load. Values can be a single value or a list of allowed values:
+
+        env_is(DESKTOP_ENV='kde', DE_MAJ_VER=['5', '6'])
+
+    A failed check gives a condition that can never be True, so a map using it
+    gets removed by `prune_never_maps()`.
+    """
+    for env_name, allowed in expected.items():
+        if env_name not in ENV:
+            raise KeyError(f"env_is(): '{env_name}' not registered with use_env()")
+        allowed = allowed if isinstance(allowed, (list, tuple, set)) else [allowed]
+        if ENV[env_name] not in allowed:
+            return _intern(Const(False))
+    return _intern(Const(True))
+
+
+###############################################################################
+# Learned evaluation order of compound conditions
+
+def _find_compounds(cond, path: str, found: Dict[str, _Compound]):
+    if isinstance(cond, _Compound):
+        # interned compounds can be shared by several maps, keep the first ID
+        if cond not in found.values():
+            found[path] = cond
+        for index, child in enumerate(cond.original):
+            _find_compounds(child, f"{path}/{index}", found)
+    elif isinstance(cond, Not):
+        _find_compounds(cond.children[0], f"{path}/not", found)
+
+
+def apply_condition_order(order_file: str) -> int:
+    """Reorder compounds with the order saved by `save_condition_order()`."""
+    try:
+        with open(order_file, 'r', encoding='UTF-8') as f:
+            saved_orders: Dict[str, dict] = json.load(f)
+    except FileNotFoundError:
+        return 0
+    except (OSError, ValueError) as e:
+        error(f"Unable to read saved condition order from '{order_file}':\n\t{e}")
+        return 0
+    applied = 0
+    for stable_id, saved in saved_orders.items():
+        compound = LEARNING_COMPOUNDS.get(stable_id)
+        if compound is None:
+            continue
+        # only if the compound is still made of the same checks as when saved
+        if saved.get('children') != [child.describe() for child in compound.original]:
+            continue
+        order = saved.get('order', [])
+        if sorted(order) != list(range(len(compound.original))):
+            continue
+        compound.reorder(compound.original[index] for index in order)
+        applied += 1
+    return applied
+
+
+def save_condition_order(order_file: str):
+    """Save the current order of the learning compounds, to reuse on the next run."""
+    saved_orders = {}
+    for stable_id, compound in LEARNING_COMPOUNDS.items():
+        saved_orders[stable_id] = {
+            'children': [child.describe() for child in compound.original],
+            'order':    [compound.original.index(child) for child in compound.children],
+        }
+    try:
+        with open(order_file, 'w', encoding='UTF-8') as f:
+            json.dump(saved_orders, f, indent=4)
+    except OSError as e:
+        error(f"Unable to save condition order to '{order_file}':\n\t{e}")
+
+
+def dump_condition_order():
+    """Print the current order and sampled stats of the learning compounds."""
+    print("*** TOSHY COMPOUND CONDITION ORDER ***", flush=True)
+    for stable_id, compound in LEARNING_COMPOUNDS.items():
+        print(f"[{stable_id}]\n{compound.describe_stats()}")
+    print("", flush=True)
+
+
+def learn_condition_order(order_file: Optional[str] = None) -> int:
+    """
+    Let the compound conditions (`all_of()`/`any_of()`) used by the given maps learn 
+    the cost and selectivity of their children at runtime, and reorder themselves 
+    so the cheapest and most often decisive checks come first. Meant to be opt-in 
+    (like the condition profiler), since the sampled calls cost a little extra.
+
+    If `order_file` is given, a previously learned order is applied right away, 
+    and the order is saved to the file again when keyszer exits.
+
+    The current order and the sampled stats are printed with the keyszer diagnostics 
+    key (F15 by default) or SIGUSR1, like the other diagnostics dumps.
+
+    Call this after all maps are defined, before anything wraps the map conditions 
+    (like `cache_active_maps()`). Returns the number of learning compounds.
+    """
+    # imported here, so the conditions can be used without the keyszer transform hooks
+    from lib.diagnostics import add_diagnostics_dump
+    from lib.map_dispatch import get_map_lists
+
+    for map_kind, map_list in zip(('modmap', 'multipurpose_modmap', 'keymap'), get_map_lists()):
+        name_counts = {}
+        for _map in map_list:
+            # maps can share a name, but each needs its own ID
+            name_counts[_map.name] = name_counts.get(_map.name, 0) + 1
+            map_id = _map.name if name_counts[_map.name] == 1 else f"{_map.name} #{name_counts[_map.name]}"
+            found = {}
+            _find_compounds(_map.conditional, f"{map_kind}: {map_id}", found)
+            for stable_id, compound in found.items():
+                if compound in LEARNING_COMPOUNDS.values() or compound.toshy_dynamic:
+                    continue
+                compound.start_learning()
+                LEARNING_COMPOUNDS[stable_id] = compound
+    if order_file:
+        applied = apply_condition_order(order_file)
+        debug(f"Applied saved order to {applied} compound conditions from '{order_file}'")
+        atexit.register(save_condition_order, order_file)
+    add_diagnostics_dump(dump_condition_order)
+    debug(f"Learning the evaluation order of {len(LEARNING_COMPOUNDS)} compound conditions")
+    return len(LEARNING_COMPOUNDS)
@@ -0,0 +1,102 @@
+import os
+
+from typing import Callable, Dict, List
+from keyszer.lib.logger import debug, error
+
+
+
+# Functions to call with each input device keyszer grabs (see `on_device_added()`)
+DEVICE_ADDED_CALLBACKS: List[Callable] = []
+
+_hook_installed = False
+
+# Bus type of Bluetooth devices (from linux/input.h). Their vendor IDs are Bluetooth 
+# SIG company IDs, not USB vendor IDs (Apple is 0x004c over Bluetooth, 0x05ac over USB).
+BUS_BLUETOOTH       = 0x05
+
+# Where udev keeps the properties of each device node, including the ones from hwdb
+UDEV_DATA_DIR       = '/run/udev/data'
+
+
+class DeviceIDs:
+    """
+    Bus type, vendor and product IDs of an input device, with its udev properties
+    (which include the vendor/model names looked up in the systemd hwdb, like
+    `ID_VENDOR_FROM_DATABASE`). IDs are 0 and properties are empty if not known.
+    """
+    __slots__ = ('bus', 'vendor', 'product', 'udev_props')
+
+    def __init__(self, bus: int = 0, vendor: int = 0, product: int = 0,
+                    udev_props: Dict[str, str] = None):
+        self.bus            = bus
+        self.vendor         = vendor
+        self.product        = product
+        self.udev_props     = udev_props or {}
+
+    @property
+    def hwdb_vendor(self) -> str:
+        return self.udev_props.get('ID_VENDOR_FROM_DATABASE', '')
+
+    def __repr__(self):
+        return (f"DeviceIDs(bus={self.bus:#04x}, vendor={self.vendor:04x}, "
+                f"product={self.product:04x}, hwdb_vendor={self.hwdb_vendor!r})")
+
+
+# Used for devices that were not seen being attached (only the name is known)
+UNKNOWN_IDS = DeviceIDs()
+
+
+def read_udev_properties(dev_path: str) -> Dict[str, str]:
+    """Return the udev properties of a device node, or an empty dict if udev has none."""
+    try:
+        rdev = os.stat(dev_path).st_rdev
+        data_path = os.path.join(UDEV_DATA_DIR, f'c{os.major(rdev)}:{os.minor(rdev)}')
+        with open(data_path, 'r', encoding='utf-8', errors='replace') as data_file:
+            lines = data_file.read().splitlines()
+    except OSError as e:
+        debug(f"No udev properties for '{dev_path}': {e}")
+        return {}
+    # property lines look like "E:ID_VENDOR_FROM_DATABASE=Apple, Inc."
+    return dict( line[2:].split('=', 1) for line in lines
+                    if line.startswith('E:') and '=' in line )
+
+
+def device_ids(device) -> DeviceIDs:
+    """Return the IDs and udev properties of an evdev device."""
+    return DeviceIDs(   device.info.bustype, device.info.vendor, device.info.product,
+                        read_udev_properties(device.path) )
+
+
+def _run_callbacks_after(add_device_func):
+    def _add_device(*args, **kwargs):
+        result = add_device_func(*args, **kwargs)
+        # keyszer calls this as `add_device(devices, device)`
+        device = kwargs.get('device', args[-1] if args else None)
+        for callback in DEVICE_ADDED_CALLBACKS:
+            try:
+                callback(device)
+            except Exception as e:
+                error(f"Error in device added callback '{callback.__name__}':\n\t{e}")
+        return result
+    return _add_device
+
+
+def on_device_added(callback: Callable) -> bool:
+    """
+    Call `callback(device)` with the evdev device, each time keyszer grabs an input
+    device: for the devices at startup, and for devices plugged in later (with the
+    `--watch` option). Returns True if the keyszer hook is in place.
+    """
+    global _hook_installed
+    DEVICE_ADDED_CALLBACKS.append(callback)
+    if _hook_installed:
+        return True
+    try:
+        import keyszer.input
+        # keyszer looks up `add_device` as a module global, so replacing it is enough
+        keyszer.input.add_device = _run_callbacks_after(keyszer.input.add_device)
+    except (ImportError, AttributeError) as e:
+        error(f"Unable to watch for added devices, keyszer internals not as expected:\n\t{e}")
+        return False
+    _hook_installed = True
+    return True
@@ -0,0 +1,54 @@
+import sys
+import signal
+
+from typing import Callable, List
+from keyszer.lib.logger import error
+
+
+
+# Functions (no arguments) to run after keyszer's own diagnostics dump
+DIAGNOSTICS_DUMPS: List[Callable] = []
+
+_hooks_installed = False
+
+
+def run_diagnostics_dumps(*_):
+    """Run every registered diagnostics dump (also usable as a signal handler)."""
+    for dump_func in DIAGNOSTICS_DUMPS:
+        try:
+            dump_func()
+        except Exception as e:
+            error(f"Error in diagnostics dump '{dump_func.__name__}':\n\t{e}")
+
+
+def _run_dumps_after(dump_diagnostics_func):
+    def _dump_diagnostics():
+        dump_diagnostics_func()
+        run_diagnostics_dumps()
+    return _dump_diagnostics
+
+
+def add_diagnostics_dump(dump_func: Callable):
+    """
+    Run `dump_func` when the keyszer diagnostics key is pressed (F15 by default,
+    see `dump_diagnostics_key()`), and when the keyszer process gets SIGUSR1:
+
+        pkill -USR1 -f 'keyszer'
+    """
+    global _hooks_installed
+    DIAGNOSTICS_DUMPS.append(dump_func)
+    if _hooks_installed:
+        return
+    _hooks_installed = True
+
+    # keyszer's input loop imports `dump_diagnostics` by name, so patch it in both places
+    for module_name in ('keyszer.transform', 'keyszer.input'):
+        module = sys.modules.get(module_name)
+        if module is not None and hasattr(module, 'dump_diagnostics'):
+            module.dump_diagnostics = _run_dumps_after(module.dump_diagnostics)
+
+    try:
+        signal.signal(signal.SIGUSR1, run_diagnostics_dumps)
+    except ValueError as e:
+        # only possible from the main thread
+        error(f"Unable to set SIGUSR1 handler for diagnostics:\n\t{e}")
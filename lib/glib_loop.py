@@ -0,0 +1,26 @@
+import threading
+
+from keyszer.lib.logger import debug
+
+
+
+_main_loop_thread   = None
+_main_loop_lock     = threading.Lock()
+
+
+def start_glib_main_loop():
+    """
+    Run a GLib main loop in a background thread, for D-Bus signal receivers
+    (settings changes, window state changes) in a process that has no main loop
+    of its own. Only one loop thread is started per process, however many
+    receivers ask for it. Raises ImportError if GLib is not available.
+    """
+    global _main_loop_thread
+    from gi.repository import GLib
+    with _main_loop_lock:
+        if _main_loop_thread is not None:
+            return
+        _main_loop_thread = threading.Thread(target=GLib.MainLoop().run, name='toshy-glib-main-loop')
+        _main_loop_thread.daemon = True
+        _main_loop_thread.start()
+        debug("Started GLib main loop thread for D-Bus signals")
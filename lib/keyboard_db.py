@@ -0,0 +1,155 @@
+import os
+import hashlib
+
+from typing import Dict, Iterable, List, Optional, Tuple
+from keyszer.lib.logger import debug, error
+
+from lib.devices import BUS_BLUETOOTH
+
+
+
+KEYBOARD_DB_FILE_PATH       = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'keyboard_db.txt')
+
+VALID_KBTYPES               = ('IBM', 'Chromebook', 'Windows', 'Apple')
+
+
+class NameIndex:
+    """
+    Aho-Corasick automaton over (already casefolded) name fragments. Finds every
+    fragment inside a name in one pass over the name, so a lookup costs about the
+    same whether the index holds 10 fragments or 10,000.
+    """
+    __slots__ = ('goto', 'fail', 'out')
+
+    def __init__(self, fragments: Iterable[Tuple[str, str]]):
+        # state 0 is the root, `out` holds the best (longest, then first) fragment
+        # that ends in each state, following the fail links
+        self.goto: List[Dict[str, int]]         = [{}]
+        self.fail: List[int]                    = [0]
+        self.out: List[Optional[Tuple]]         = [None]
+        for order, (fragment, value) in enumerate(fragments):
+            state = 0
+            for char in fragment:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto[state][char] = next_state
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(None)
+                state = next_state
+            match = (len(fragment), -order, value)
+            if self.out[state] is None or match > self.out[state]:
+                self.out[state] = match
+        # breadth first, so the fail state of each state is done before it
+        queue = list(self.goto[0].values())
+        for state in queue:
+            for char, next_state in self.goto[state].items():
+                fail_state = self.fail[state]
+                while fail_state and char not in self.goto[fail_state]:
+                    fail_state = self.fail[fail_state]
+                self.fail[next_state] = self.goto[fail_state].get(char, 0)
+                inherited = self.out[self.fail[next_state]]
+                if inherited is not None and (self.out[next_state] is None or inherited > self.out[next_state]):
+                    self.out[next_state] = inherited
+                queue.append(next_state)
+
+    def __len__(self):
+        return len(self.goto)
+
+    def search(self, name_cf: str):
+        """Return the value of the longest fragment found in the name, or None."""
+        goto, fail, out = self.goto, self.fail, self.out
+        best = None
+        state = 0
+        for char in name_cf:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            match = out[state]
+            if match is not None and (best is None or match > best):
+                best = match
+        return best[2] if best is not None else None
+
+
+class KeyboardDB:
+    """
+    The keyboard device database shipped with Toshy (`keyboard_db.txt`).
+
+    The file is read when this is created, and the bus/vendor/product IDs and 
+    hwdb vendor names go straight into dicts, so known hardware is identified 
+    with a hash lookup. The name index is only built when the first device that 
+    needs a name lookup shows up (devices with a saved keyboard type never do).
+    """
+    def __init__(self, db_file_path: str = KEYBOARD_DB_FILE_PATH):
+        self.db_file_path       = db_file_path
+        self.name_fragments     = []
+        self.name_index         = None
+        self.device_ids         = {}    # {(bus kind, vendor, product or None): kbtype}
+        self.hwdb_vendors       = {}    # {casefolded hwdb vendor name: kbtype}
+        self.file_hash          = ''
+        self._load()
+
+    def fingerprint(self) -> str:
+        """Hash of the database file, to tell when saved keyboard types are out of date."""
+        return self.file_hash
+
+    def _load(self):
+        try:
+            with open(self.db_file_path, 'rb') as db_file:
+                contents = db_file.read()
+        except OSError as e:
+            error(f"Unable to read the keyboard database:\n\t{e}")
+            return
+        self.file_hash = hashlib.sha1(contents).hexdigest()
+        lines = contents.decode('utf-8', errors='replace').splitlines()
+        for line_nbr, line in enumerate(lines, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = [field.strip() for field in line.split('|', 2)]
+            if len(fields) != 3 or fields[0] not in VALID_KBTYPES or not fields[2]:
+                error(f"Keyboard database line {line_nbr} not valid, skipped: '{line}'")
+                continue
+            kbtype, kind, value = fields
+            if kind == 'name':
+                self.name_fragments.append((value.casefold(), kbtype))
+            elif kind in ('usb', 'bt'):
+                vendor, _, product = value.partition(':')
+                try:
+                    ids = (kind, int(vendor, 16), None if product in ('', '*') else int(product, 16))
+                except ValueError:
+                    error(f"Keyboard database line {line_nbr} has bad IDs, skipped: '{line}'")
+                    continue
+                self.device_ids.setdefault(ids, kbtype)
+            elif kind == 'vendor':
+                self.hwdb_vendors.setdefault(value.casefold(), kbtype)
+            else:
+                error(f"Keyboard database line {line_nbr} has unknown kind '{kind}', skipped")
+        debug(f"Keyboard database loaded: {len(self.device_ids)} device IDs, "
+                f"{len(self.hwdb_vendors)} vendors, {len(self.name_fragments)} names")
+
+    def lookup_name(self, name_cf: str) -> Optional[str]:
+        """Return the keyboard type for a casefolded device name, or None if not in the database."""
+        if self.name_index is None:
+            self.name_index = NameIndex(self.name_fragments)
+            debug(f"Keyboard database name index built: {len(self.name_index)} states")
+        return self.name_index.search(name_cf)
+
+    def lookup_ids(self, bus: int, vendor: int, product: int) -> Optional[str]:
+        """
+        Return the keyboard type for the bus type and vendor/product IDs of a device,
+        or None if not in the database. Bluetooth devices are looked up in the `bt`
+        entries, devices on any other bus (USB, SPI, I2C) in the `usb` entries.
+        """
+        if not vendor:
+            return None
+        bus_kind = 'bt' if bus == BUS_BLUETOOTH else 'usb'
+        return ( self.device_ids.get((bus_kind, vendor, product)) or 
+                    self.device_ids.get((bus_kind, vendor, None)) )
+
+    def lookup_hwdb_vendor(self, hwdb_vendor: str) -> Optional[str]:
+        """Return the keyboard type for a vendor name from the systemd hwdb, or None."""
+        if not hwdb_vendor:
+            return None
+        return self.hwdb_vendors.get(hwdb_vendor.casefold())
@@ -1,6 +1,32 @@
+import time
+
+from collections import deque
+
 VERBOSE = True
 FLUSH = True
 
+# Log levels, for `set_log_level()`. Per-event diagnostics ("trace" messages) are 
+# only recorded at LOG_LEVEL_TRACE, for verbose or diagnostic runs (off by default).
+LOG_LEVEL_INFO = 20
+LOG_LEVEL_DEBUG = 10
+LOG_LEVEL_TRACE = 5
+LOG_LEVEL = LOG_LEVEL_INFO
+# True if LOG_LEVEL lets trace messages through (kept in sync by `set_log_level()`)
+TRACE = False
+
+# Trace messages go into an in-memory ring buffer instead of being printed. 
+# Nothing is formatted until the buffer is dumped.
+TRACE_BUFFER_SIZE = 2000
+_trace_buffer = deque(maxlen=TRACE_BUFFER_SIZE)
+
+
+def set_log_level(level):
+    """Set the log level (`trace()` only records at LOG_LEVEL_TRACE or lower)."""
+    global LOG_LEVEL, TRACE
+    LOG_LEVEL = level
+    TRACE = level <= LOG_LEVEL_TRACE
+
+
 def debug(*args, ctx="DD"):
     if not VERBOSE:
         return
@@ -26,3 +52,53 @@ def log(*args, ctx="--"):
 
 def info(*args, ctx="--"):
     log(*args, ctx=ctx)
+
+
+def trace(msg, *args, ctx="TT"):
+    """
+    Record a per-event diagnostic message in the trace ring buffer.
+    Use %-style placeholders in `msg` and pass the values as `args`, so the 
+    message is only formatted if the buffer is ever dumped:
+
+        trace("Class: %r | dev: %r", ctx.wm_class, ctx.device_name)
+
+    Unless the log level is LOG_LEVEL_TRACE (not the default), this returns right 
+    away, after checking only the module-level TRACE flag.
+    """
+    if not TRACE:
+        return
+    _trace_buffer.append((time.time(), ctx, msg, args))
+
+
+def set_trace_buffer_size(size):
+    """Change how many trace messages are kept (keeps the most recent ones)."""
+    global _trace_buffer, TRACE_BUFFER_SIZE
+    TRACE_BUFFER_SIZE = size
+    _trace_buffer = deque(_trace_buffer, maxlen=size)
+
+
+def clear_trace():
+    _trace_buffer.clear()
+
+
+def format_trace():
+    """Return the trace messages in the ring buffer as formatted lines, oldest first."""
+    lines = []
+    for timestamp, ctx, msg, args in list(_trace_buffer):
+        try:
+            text = msg % args if args else msg
+        except (TypeError, ValueError):
+            text = f"{msg} {args}"
+        clock = time.strftime('%H:%M:%S', time.localtime(timestamp))
+        lines.append(f"({ctx}) {clock}.{int(timestamp % 1 * 1000):03d} {text}")
+    return lines
+
+
+def dump_trace():
+    """Print the trace ring buffer."""
+    if not TRACE:
+        print("*** TRACE (off, set the log level to LOG_LEVEL_TRACE to record) ***", flush=True)
+        return
+    print(f"*** TRACE (last {len(_trace_buffer)} messages) ***", flush=True)
+    print('\n'.join(format_trace()), flush=True)
+    print("", flush=True)
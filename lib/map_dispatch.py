@@ -0,0 +1,525 @@
+import sys
+import itertools
+import keyszer.config_api
+import lib.matching
+
+from typing import Any, Dict, FrozenSet, List, Optional
+from keyszer.models.combo import Combo
+from keyszer.lib.logger import debug, error
+from lib.matching import LRUMemo, MISSING, snapshot
+from lib.conditions import Condition, mark_dynamic
+
+
+
+def get_map_lists():
+    """Return the live modmap, multipurpose modmap and keymap lists from keyszer."""
+    return (    keyszer.config_api._MODMAPS,
+                keyszer.config_api._MULTI_MODMAPS,
+                keyszer.config_api._KEYMAPS     )
+
+
+def is_never(when) -> bool:
+    """
+    Check if a condition can never be True in this session: a condition object 
+    folded to `Const(False)` at config load, by a failed `env_is()`/`ifEnv()` check.
+    """
+    return isinstance(when, Condition) and when.never
+
+
+def prune_never_maps() -> List[str]:
+    """
+    Remove every registered map whose condition can never be True (folded to 
+    `Const(False)` by `env_is()` or `ifEnv()`), so keyszer never evaluates it. 
+    Call this once, after all maps are defined.
+    Returns the names of the removed maps.
+    """
+    pruned_names = []
+    for map_list in get_map_lists():
+        keep = [_map for _map in map_list if not is_never(_map.conditional)]
+        pruned_names.extend(_map.name for _map in map_list if is_never(_map.conditional))
+        # modify the lists in place, keyszer holds references to these same objects
+        map_list[:] = keep
+    if pruned_names:
+        debug(f"Pruned {len(pruned_names)} maps that can't match in this environment:")
+        for name in pruned_names:
+            debug(f"\t'{name}'")
+    return pruned_names
+
+
+###############################################################################
+# Inverted key index: only evaluate the conditions of maps that bind the key
+
+# Maps that bind a key/combo, by key/combo (filled by `index_map_keys()`)
+MULTI_MODMAP_KEY_INDEX: Dict[Any, FrozenSet[int]]   = {}
+KEYMAP_COMBO_INDEX: Dict[Any, FrozenSet[int]]       = {}
+
+# IDs of the maps that can act on the key being processed right now, by map kind.
+# None means "unknown", in which case gated conditions are evaluated normally.
+# For modmaps this only comes from bypass mode (see `index_map_keys()`).
+_modmap_candidates: Optional[FrozenSet[int]]        = None
+_multi_modmap_candidates: Optional[FrozenSet[int]]  = None
+_keymap_candidates: Optional[FrozenSet[int]]        = None
+
+_NO_MAPS                    = frozenset()
+_key_index_installed        = False
+_combo_index_verified       = False
+
+# Combos with generic (not left/right) modifiers, for `combo_index_matches_keyszer()`
+COMBO_INDEX_PROBES          = ('C-a', 'Shift-C-Tab', 'Alt-F4', 'Super-Space', 'Shift-Alt-RC-i')
+
+
+def build_key_index(map_list) -> Dict[Any, FrozenSet[int]]:
+    """
+    Build an inverted index of which maps (by ID) bind each key or combo.
+    Maps without a condition (the default maps) are left out.
+    """
+    index = {}
+    for _map in map_list:
+        if _map.conditional is None:
+            continue
+        for key in _map.mappings:
+            index.setdefault(key, set()).add(id(_map))
+    return {key: frozenset(map_ids) for key, map_ids in index.items()}
+
+
+def _track_modmap_key(apply_modmap_func):
+    def _apply_modmap(keystate, context):
+        global _modmap_candidates
+        # first stage of each key event, so the map lists can change here safely
+        if _settings_gate_pending:
+            update_settings_gated_maps()
+        if _bypass_when is not None and in_bypass_mode(context):
+            _modmap_candidates = _bypass_keep
+        try:
+            return apply_modmap_func(keystate, context)
+        finally:
+            _modmap_candidates = None
+    return _apply_modmap
+
+
+def _track_multi_modmap_key(apply_multi_modmap_func):
+    def _apply_multi_modmap(keystate, context):
+        global _multi_modmap_candidates
+        # multipurpose modmaps act on the key as it is after the regular modmap
+        _multi_modmap_candidates = MULTI_MODMAP_KEY_INDEX.get(keystate.key, _NO_MAPS)
+        if _bypass_when is not None and in_bypass_mode(context):
+            _multi_modmap_candidates = _multi_modmap_candidates & _bypass_keep
+        try:
+            return apply_multi_modmap_func(keystate, context)
+        finally:
+            _multi_modmap_candidates = None
+    return _apply_multi_modmap
+
+
+def _track_keymap_combo(transform_key_func, get_pressed_mods_func):
+    def _transform_key(key, action, ctx):
+        global _keymap_candidates
+        if _combo_index_verified:
+            _keymap_candidates = KEYMAP_COMBO_INDEX.get(Combo(get_pressed_mods_func(), key), _NO_MAPS)
+        if _bypass_when is not None and in_bypass_mode(ctx):
+            _keymap_candidates = (_bypass_keep if _keymap_candidates is None 
+                                    else _keymap_candidates & _bypass_keep)
+        try:
+            return transform_key_func(key, action, ctx)
+        finally:
+            _keymap_candidates = None
+    return _transform_key
+
+
+def _gate_modmap(map_id, when):
+    def _when_modmap_binds_key(ctx):
+        if _modmap_candidates is not None and map_id not in _modmap_candidates:
+            return False
+        return when(ctx)
+    return _when_modmap_binds_key
+
+
+def _gate_multi_modmap(map_id, when):
+    def _when_multi_modmap_binds_key(ctx):
+        if _multi_modmap_candidates is not None and map_id not in _multi_modmap_candidates:
+            return False
+        return when(ctx)
+    return _when_multi_modmap_binds_key
+
+
+def _gate_keymap(map_id, when):
+    def _when_keymap_binds_combo(ctx):
+        if _keymap_candidates is not None and map_id not in _keymap_candidates:
+            return False
+        return when(ctx)
+    return _when_keymap_binds_combo
+
+
+def _pressed_combos(combo) -> list:
+    """
+    Return the combos keyszer builds for `combo` from the pressed modifier keys, 
+    with one left/right-specific modifier per key (`Modifier.from_key()`), the 
+    same as `get_pressed_mods()` does.
+    """
+    try:
+        from keyszer.models.modifier import Modifier
+    except ImportError:
+        return [combo]
+    modifier_choices = []
+    for modifier in combo.modifiers:
+        keys = modifier.get_keys() if isinstance(modifier, Modifier) else None
+        modifier_choices.append([Modifier.from_key(key) for key in keys] if keys else [modifier])
+    return [Combo(list(modifiers), combo.key) for modifiers in itertools.product(*modifier_choices)]
+
+
+def combo_index_matches_keyszer() -> bool:
+    """
+    Check that the keymap combo index finds the same keymaps as keyszer does. 
+    The index is a dict keyed by the combos in the keymaps, looked up with combos 
+    made from the pressed (left/right-specific) modifiers, so it relies on keyszer 
+    expanding generic modifiers like `C-` in `keymap()`, and on the hash/equality 
+    of its Combo class.
+
+    This registers a throwaway keymap with generic-modifier combos through keyszer's 
+    own `keymap()`, then looks up each pressed variant both with keyszer's `combo in 
+    keymap` and in an index built from it. Returns True if they always agree.
+    """
+    config_api = keyszer.config_api
+    try:
+        probe_keymap = config_api.keymap("Toshy combo index check", 
+                                            {config_api.C(probe): None for probe in COMBO_INDEX_PROBES}, 
+                                            when=lambda ctx: False)
+    except Exception as e:
+        error(f"Unable to check the keymap combo index with keyszer:\n\t{e}")
+        return False
+    finally:
+        # never leave the throwaway keymap registered
+        config_api._KEYMAPS[:] = [km for km in config_api._KEYMAPS 
+                                    if km.name != "Toshy combo index check"]
+    probe_index = build_key_index([probe_keymap])
+    for probe in COMBO_INDEX_PROBES:
+        for pressed_combo in _pressed_combos(config_api.C(probe)):
+            found_by_keyszer = pressed_combo in probe_keymap
+            found_in_index = id(probe_keymap) in probe_index.get(pressed_combo, _NO_MAPS)
+            if not (found_by_keyszer and found_in_index):
+                error(f"Keymap combo index check failed for '{probe}' pressed as '{pressed_combo}': "
+                        f"keyszer {'finds' if found_by_keyszer else 'misses'} it, "
+                        f"index {'finds' if found_in_index else 'misses'} it")
+                return False
+    return True
+
+
+def index_map_keys() -> bool:
+    """
+    Index which keys (multipurpose modmaps) and combos (keymaps) each registered map 
+    binds, and make each map's condition skip evaluation when the map can't act on 
+    the key being processed. Call this once, after all maps are defined (and pruned).
+
+    - A keymap that doesn't bind the current combo would never be used for it, 
+      so skipping its condition doesn't change which keymap handles the combo. 
+      The combo index is only used if `combo_index_matches_keyszer()` passes.
+    - A multipurpose modmap that can't remap the current key is treated as not 
+      matching, like the (cascading) modmaps in keyszer.
+    - Regular modmaps are not indexed: keyszer itself only uses a modmap that holds 
+      the key. Their conditions are still gated, but only for bypass mode.
+    - Maps with no mappings are left alone, because their conditions are only 
+      there for side effects (dead keys tripwire).
+
+    This wraps keyszer's `apply_modmap`, `apply_multi_modmap` and `transform_key` 
+    to keep track of the current key. If those can't be found in the installed 
+    keyszer, the config keeps working as before, without the index.
+    Returns True if the index is in use.
+    """
+    global MULTI_MODMAP_KEY_INDEX, KEYMAP_COMBO_INDEX, _key_index_installed, _combo_index_verified
+
+    try:
+        import keyszer.transform as transform
+        apply_modmap_func       = transform.apply_modmap
+        apply_multi_modmap_func = transform.apply_multi_modmap
+        transform_key_func      = transform.transform_key
+        get_pressed_mods_func   = transform.get_pressed_mods
+    except (ImportError, AttributeError) as e:
+        error(f"Unable to install key index, keyszer internals not as expected:\n\t{e}")
+        return False
+
+    modmaps, multi_modmaps, keymaps = get_map_lists()
+    MULTI_MODMAP_KEY_INDEX  = build_key_index(multi_modmaps)
+    _combo_index_verified   = combo_index_matches_keyszer()
+    if _combo_index_verified:
+        KEYMAP_COMBO_INDEX  = build_key_index(keymaps)
+    else:
+        error("Keymap combo index not used, all keymap conditions are evaluated as usual")
+
+    gated_count = 0
+    for map_list, gate in ((modmaps, _gate_modmap), 
+                            (multi_modmaps, _gate_multi_modmap), 
+                            (keymaps, _gate_keymap)):
+        for _map in map_list:
+            if _map.conditional is None or not _map.mappings:
+                continue
+            _map.conditional = gate(id(_map), _map.conditional)
+            gated_count += 1
+
+    transform.apply_modmap          = _track_modmap_key(apply_modmap_func)
+    transform.apply_multi_modmap    = _track_multi_modmap_key(apply_multi_modmap_func)
+    transform.transform_key         = _track_keymap_combo(transform_key_func, get_pressed_mods_func)
+    _key_index_installed            = True
+
+    debug(f"Key index installed: {gated_count} map conditions now only evaluate for "
+            f"{len(MULTI_MODMAP_KEY_INDEX)} keys and {len(KEYMAP_COMBO_INDEX)} combos "
+            f"bound in their maps.")
+    return True
+
+
+###############################################################################
+# Settings-gated maps: maps drop out of the map lists while a setting they need is off
+
+# Setting checks (`setting_is()` conditions) each gated map needs, by map ID
+SETTINGS_GATED_MAPS: Dict[int, tuple]   = {}
+# Position of each map in its list as defined in the config, by map ID
+_map_order: Dict[int, int]              = {}
+# Gated maps taken out of each list (modmaps, multipurpose modmaps, keymaps)
+_dropped_maps: tuple                    = ([], [], [])
+_settings_gate_pending                  = False
+
+
+def _live_map_lists():
+    # once keyszer is running, the lists it really uses are the ones in keyszer.transform
+    transform = sys.modules.get('keyszer.transform')
+    live_lists = tuple(getattr(transform, list_name, None) 
+                        for list_name in ('_MODMAPS', '_MULTI_MODMAPS', '_KEYMAPS'))
+    return live_lists if None not in live_lists else get_map_lists()
+
+
+def _settings_allow(_map) -> bool:
+    return all(setting_check(None) for setting_check in SETTINGS_GATED_MAPS.get(id(_map), ()))
+
+
+def update_settings_gated_maps():
+    """Take out the gated maps whose settings are off, and put back the ones turned on."""
+    global _settings_gate_pending
+    _settings_gate_pending = False
+    for map_list, dropped in zip(_live_map_lists(), _dropped_maps):
+        # maps keyszer added itself (the default maps) are not in `_map_order`, and go first
+        all_maps = sorted(list(map_list) + dropped, key=lambda _map: _map_order.get(id(_map), -1))
+        keep = [_map for _map in all_maps if _settings_allow(_map)]
+        if len(keep) == len(map_list) and all(a is b for a, b in zip(keep, map_list)):
+            continue
+        dropped[:] = [_map for _map in all_maps if not _settings_allow(_map)]
+        # modify the lists in place, keyszer holds references to these same objects
+        map_list[:] = keep
+        debug(f"Settings-gated maps now out of the map list: {[_map.name for _map in dropped]}")
+
+
+def _settings_changed():
+    global _settings_gate_pending
+    # called from the settings watcher thread, the lists are updated on the next key event
+    _settings_gate_pending = True
+
+
+def gate_maps_on_settings(settings) -> int:
+    """
+    Take maps out of keyszer's map lists while a setting their condition requires 
+    (a `setting_is()` check in the condition, or in an `all_of()` condition) is off, 
+    and put them back in their original place when `load_settings()` sees it turn on. 
+    Maps for features that are turned off then cost nothing on each key event.
+
+    The condition still checks the setting too, so the result is the same either way.
+    Needs the key index (see `index_map_keys()`): the lists are changed at the start 
+    of a key event, the first one and the next one after each settings change.
+
+    Call this once, after all maps are defined (and pruned), before anything wraps 
+    the map conditions (like `cache_active_maps()`). Returns the number of gated maps.
+    """
+    global _settings_gate_pending
+    for map_list in get_map_lists():
+        for position, _map in enumerate(map_list):
+            _map_order[id(_map)] = position
+            required_settings = getattr(_map.conditional, 'required_settings', None)
+            if required_settings is not None and required_settings():
+                SETTINGS_GATED_MAPS[id(_map)] = required_settings()
+    settings.add_change_listener(_settings_changed)
+    # Applied on the first key event, so the maps still get their place in the 
+    # active map sets and key index (set up later in the config) while all are listed.
+    _settings_gate_pending = True
+    debug(f"Settings-gated maps: {len(SETTINGS_GATED_MAPS)} maps follow their settings.")
+    return len(SETTINGS_GATED_MAPS)
+
+
+###############################################################################
+# Bypass mode: let keys through untouched in remote desktops, VMs and games
+
+# Condition that turns on bypass mode for the context (see `use_bypass_mode()`)
+_bypass_when                = None
+# IDs of the maps still used in bypass mode
+_bypass_keep: FrozenSet[int]    = _NO_MAPS
+_bypass_last_ctx            = None
+_bypass_active              = False
+
+
+def in_bypass_mode(ctx) -> bool:
+    """Check (once per key event) if bypass mode is on for the context."""
+    global _bypass_last_ctx, _bypass_active
+    if ctx is _bypass_last_ctx:
+        return _bypass_active
+    active = bool(_bypass_when(ctx))
+    if active is not _bypass_active:
+        debug(f"Bypass mode {'ON' if active else 'OFF'} for window: '{snapshot(ctx).wm_class}'")
+    _bypass_last_ctx, _bypass_active = ctx, active
+    return active
+
+
+def use_bypass_mode(when, keep_maps=('Diagnostics',)) -> bool:
+    """
+    Turn on "bypass mode" whenever the `when` condition is True: the conditions of 
+    all maps are skipped (treated as not matching), except for the maps named in 
+    `keep_maps`, so keys go to the app with as little work as possible. Meant for 
+    remote desktop and VM apps, which get the keys to remap them on the other side, 
+    and for fullscreen games.
+
+    Maps with no mappings still run, because their conditions keep state up to 
+    date (dead keys).
+
+    Works through the key index, so call this after `index_map_keys()`. 
+    Returns True if bypass mode is in use.
+    """
+    global _bypass_when, _bypass_keep
+    if not _key_index_installed:
+        error("Bypass mode needs the key index, call index_map_keys() first")
+        return False
+    _bypass_keep = frozenset(id(_map) for map_list in get_map_lists() 
+                                for _map in map_list if _map.name in keep_maps)
+    _bypass_when = when
+    debug(f"Bypass mode enabled, keeping {len(_bypass_keep)} maps: {list(keep_maps)}")
+    return True
+
+
+###############################################################################
+# Active map set: remember which map conditions are True for each context
+
+# How many recent contexts (window/device/lock state) to keep active map sets for
+active_sets_memo_size       = 64
+
+_active_sets_memo           = LRUMemo(maxsize=active_sets_memo_size)
+_last_ctx                   = None
+_last_active_set            = None
+# Set by `clear_active_sets()` from any thread, the sets are forgotten on the key thread
+_active_sets_clear_pending  = False
+# Bits of the maps whose conditions used the window properties (found when evaluated)
+_window_props_bits          = 0
+
+
+def dynamic(when):
+    """
+    Mark a condition as "dynamic", meaning it depends on something besides the 
+    window/device context and settings (like the active dead key), or has a side 
+    effect. Dynamic conditions are evaluated on every key event, as usual, instead 
+    of being remembered in the active map set for the context.
+    """
+    if isinstance(when, Condition):
+        return mark_dynamic(when)
+    when.toshy_dynamic = True
+    return when
+
+
+def is_dynamic(_map) -> bool:
+    """
+    Check if a map's condition has to be evaluated on every event. Maps with no 
+    mappings only exist for the side effects of their conditions, so they count.
+    """
+    return getattr(_map.conditional, 'toshy_dynamic', False) or not _map.mappings
+
+
+class ActiveMapSet:
+    """
+    Bitsets of the map conditions already evaluated in one context (`known`), and 
+    of the ones that were True (`active`). Bit positions are assigned to the maps 
+    by `cache_active_maps()`. `window_state` is the window state serial the results 
+    of the conditions that used the window properties belong to.
+    """
+    __slots__ = ('known', 'active', 'window_state')
+
+    def __init__(self, window_state: int):
+        self.known          = 0
+        self.active         = 0
+        self.window_state   = window_state
+
+    def __repr__(self):
+        return f"ActiveMapSet(known={bin(self.known)}, active={bin(self.active)})"
+
+
+def get_active_set(ctx) -> ActiveMapSet:
+    """Return the active map set for the context, starting a new one if needed."""
+    global _last_ctx, _last_active_set, _active_sets_clear_pending
+    # keyszer makes a new context object for each event, so this only builds 
+    # the context key once per event
+    if ctx is _last_ctx:
+        return _last_active_set
+    # first use in this key event, so no result of the event is stored yet
+    if _active_sets_clear_pending:
+        _active_sets_clear_pending = False
+        _active_sets_memo.clear()
+    snap = snapshot(ctx)
+    active_set = _active_sets_memo.get(snap.key)
+    if active_set is MISSING:
+        active_set = ActiveMapSet(snap.window_state)
+        _active_sets_memo.put(snap.key, active_set)
+    elif active_set.window_state != snap.window_state:
+        # only the results that used the window properties are out of date
+        active_set.known &= ~_window_props_bits
+        active_set.active &= ~_window_props_bits
+        active_set.window_state = snap.window_state
+    _last_ctx, _last_active_set = ctx, active_set
+    return active_set
+
+
+def clear_active_sets():
+    """
+    Forget all active map sets (after settings change, for example). Safe to call 
+    from any thread: the sets are forgotten at the start of the next key event.
+    """
+    global _active_sets_clear_pending
+    _active_sets_clear_pending = True
+
+
+def _remember_in_active_set(bit, when):
+    def _when_active_set(ctx):
+        global _window_props_bits
+        active_set = get_active_set(ctx)
+        if active_set.known & bit:
+            return bool(active_set.active & bit)
+        props_uses = lib.matching.window_props_uses
+        result = when(ctx)
+        if lib.matching.window_props_uses != props_uses:
+            _window_props_bits |= bit
+        active_set.known |= bit
+        if result:
+            active_set.active |= bit
+        return result
+    return _when_active_set
+
+
+def cache_active_maps(settings=None) -> int:
+    """
+    Remember the result of each map's condition per context (window class and 
+    title, device, lock keys), as bits in an `ActiveMapSet`. 
+    Each condition is evaluated the first time it is needed in a context, in the 
+    same order as without the cache, and after that only a bit is checked on each 
+    key event until the window focus, title, device or lock state changes. The 
+    results of conditions that used the window properties are also evaluated again 
+    after the window state changes (see `window_state_changed()` in lib.matching).
+
+    Maps marked with `dynamic()` or with no mappings are not cached.
+    If `settings` (a Settings object) is given, the sets are forgotten whenever 
+    the settings or the screen focus change.
+
+    Call this once, after all maps are defined, before `index_map_keys()`.
+    Returns the number of maps whose condition results are cached.
+    """
+    bit = 1
+    for map_list in get_map_lists():
+        for _map in map_list:
+            if _map.conditional is None or is_dynamic(_map):
+                continue
+            _map.conditional = _remember_in_active_set(bit, _map.conditional)
+            bit <<= 1
+    cached_count = bit.bit_length() - 1
+    if settings is not None:
+        settings.add_change_listener(clear_active_sets)
+    debug(f"Active map sets enabled: {cached_count} map conditions are remembered per context.")
+    return cached_count
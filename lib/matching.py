@@ -0,0 +1,232 @@
+import re
+import sys
+import itertools
+
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Hashable, Iterable, List, Optional
+
+
+
+# Regex characters that make a pattern "really" a regex. The dot is left out on
+# purpose: app class lists use it to mean a literal dot ("org.kde.konsole").
+_RGX_META_CHARS     = set('\\^$*+?{}[]()|')
+
+
+def split_alternatives(pattern: str) -> List[str]:
+    """
+    Split a pattern like "^kitty$|^xterm$" into its top level alternatives.
+    Patterns with groups, classes or escapes are returned whole, since a bar
+    inside of those can't safely be split on.
+    """
+    if any(char in pattern for char in '()[]\\'):
+        return [pattern]
+    return pattern.split('|')
+
+
+def literal_of(pattern: str) -> Optional[str]:
+    """
+    Return the literal string inside an anchored pattern like "^kitty$", or None
+    if the pattern is not a plain anchored literal.
+    """
+    if len(pattern) < 3 or not pattern.startswith('^') or not pattern.endswith('$'):
+        return None
+    inner = pattern[1:-1]
+    if any(char in _RGX_META_CHARS for char in inner):
+        return None
+    return inner
+
+
+class AppGroup:
+    """
+    Match a window property (usually WM_CLASS) against a whole group of app patterns.
+
+    Anchored literal patterns like "^kitty$" are casefolded into a set, and are
+    checked with a single hash lookup of the casefolded property value. Only the
+    patterns that are really regex-shaped ("^Vivaldi.*$", "^qemu-system-.*$") are
+    joined into one combined pattern, compiled once and searched once.
+
+    Checking a group costs about the same whether it holds 5 apps or 500.
+    """
+    def __init__(self, patterns: Iterable[str], cse: bool = False):
+        self.cse            = bool(cse)
+        self.literals       = set()
+        self.rgx_strs       = []
+        for pattern in patterns:
+            for alt in split_alternatives(pattern):
+                literal = literal_of(alt)
+                if literal is None:
+                    self.rgx_strs.append(alt)
+                else:
+                    self.literals.add(literal if self.cse else literal.casefold())
+        self.literals       = frozenset(self.literals)
+        self.rgx            = None
+        self.rgx_lst        = ()
+        if self.rgx_strs:
+            flags = 0 if self.cse else re.I
+            try:
+                self.rgx = re.compile('|'.join(f'(?:{rgx_str})' for rgx_str in self.rgx_strs), flags)
+            except re.error:
+                # Some patterns (e.g., inline global flags) can't be joined together,
+                # so fall back to searching each compiled pattern in turn.
+                self.rgx_lst = tuple(re.compile(rgx_str, flags) for rgx_str in self.rgx_strs)
+
+    def search(self, value: str, folded: str = None) -> bool:
+        """
+        Return True if the value matches any pattern in the group. Give the already
+        casefolded value as `folded` (see `ContextSnapshot`) to skip casefolding it here.
+        """
+        if self.cse:
+            folded = value
+        elif folded is None:
+            folded = value.casefold()
+        if folded in self.literals:
+            return True
+        if self.rgx is not None:
+            return self.rgx.search(value) is not None
+        return any(rgx.search(value) for rgx in self.rgx_lst)
+
+    def __len__(self):
+        return len(self.literals) + len(self.rgx_strs)
+
+    def __repr__(self):
+        return (f"AppGroup(literals={len(self.literals)}, regexes={len(self.rgx_strs)}, "
+                f"cse={self.cse})")
+
+
+@lru_cache(maxsize=1024)
+def fold(value: str) -> str:
+    """Casefold and intern a context string (window class/title, device name)."""
+    return sys.intern(value.casefold())
+
+
+# Serial number of the focused window's state (type, transient, modal, fullscreen). 
+# The window property providers (see lib.window_props) bump it when that state changes 
+# without a focus or title change, like a game going fullscreen.
+window_state_serial = 0
+_window_state_counter = itertools.count(1)
+
+# Count of condition results looked up or worked out with the window properties, so 
+# a caller can tell if a condition used them (see `window_props_key()`)
+window_props_uses = 0
+
+
+def window_state_changed():
+    """
+    Tell the memos of condition results that the focused window's state changed. 
+    Safe to call from any thread (`next()` on the counter is atomic).
+    """
+    global window_state_serial
+    window_state_serial = next(_window_state_counter)
+
+
+def window_props_key(snap: 'ContextSnapshot') -> tuple:
+    """
+    Return the memo key for a condition result that depends on the window properties: 
+    the context key plus the window state serial. Results of other conditions use 
+    the context key alone, so they are still reused after a window state change.
+    Also counts the use in `window_props_uses`.
+    """
+    note_window_props_use()
+    return snap.key + (snap.window_state,)
+
+
+def note_window_props_use():
+    """Count a condition result that depends on the window properties (see above)."""
+    global window_props_uses
+    window_props_uses += 1
+
+
+class ContextSnapshot:
+    """
+    The properties of a keyszer context, read once per key event, with casefolded 
+    (and interned) copies of the strings for case insensitive matching.
+
+    `key` identifies the window/device context, for memos of condition results. 
+    `window_state` is the window state serial at the time of the key event, for 
+    the results that used the window properties (see `window_props_key()`).
+    `window_props` (window type, transient, modal) is only read if a matcher asks.
+    """
+    __slots__ = ('wm_class', 'wm_name', 'device_name', 'numlock_on', 'capslock_on',
+                    'wm_class_cf', 'wm_name_cf', 'device_name_cf', 'window_state', 'key', 
+                    'window_props')
+
+    def __init__(self, ctx):
+        self.wm_class       = ctx.wm_class
+        self.wm_name        = ctx.wm_name
+        self.device_name    = ctx.device_name
+        self.numlock_on     = ctx.numlock_on
+        self.capslock_on    = ctx.capslock_on
+        self.wm_class_cf    = fold(self.wm_class or '')
+        self.wm_name_cf     = fold(self.wm_name or '')
+        self.device_name_cf = fold(self.device_name or '')
+        self.window_state   = window_state_serial
+        self.key            = ( self.wm_class or '', self.wm_name or '', self.device_name or '',
+                                self.numlock_on, self.capslock_on )
+        self.window_props   = None      # filled in when needed (see lib.window_props)
+
+
+_last_ctx           = None
+_last_snapshot      = None
+
+
+def snapshot(ctx) -> ContextSnapshot:
+    """
+    Return the snapshot of a keyszer context. Keyszer makes a new context object for 
+    each key event, so the snapshot is only built once per event, by the first 
+    condition that asks for it. A snapshot given instead of a context is returned as is.
+    """
+    global _last_ctx, _last_snapshot
+    if ctx is _last_ctx:
+        return _last_snapshot
+    if isinstance(ctx, ContextSnapshot):
+        return ctx
+    _last_ctx, _last_snapshot = ctx, ContextSnapshot(ctx)
+    return _last_snapshot
+
+
+# Sentinel for a memo miss, since None/False are valid cached condition results
+MISSING = object()
+
+
+class LRUMemo:
+    """
+    Bounded, least-recently-used memo of condition results, with hit/miss counters.
+
+    Used to remember what a matcher returned for a given window context, so typing 
+    in the same window costs one evaluation per condition instead of one per key.
+    """
+    def __init__(self, maxsize: int = 256):
+        self.maxsize        = maxsize
+        self.hits           = 0
+        self.misses         = 0
+        self._data          = OrderedDict()
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        """Return the stored result for the key (marking it as recently used), or default."""
+        try:
+            value = self._data[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store a result, dropping the least recently used one if the memo is full."""
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        """Forget all stored results (counters are kept)."""
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return (f"LRUMemo(size={len(self._data)}/{self.maxsize}, "
+                f"hits={self.hits}, misses={self.misses})")
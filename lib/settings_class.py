@@ -1,8 +1,9 @@
 import os
 import inspect
 import sqlite3
+import threading
 
-from typing import List, Dict, Optional, Tuple, Union
+from typing import Callable, Iterable, List, Dict, Optional, Tuple, Union
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEvent, FileSystemEventHandler
 
@@ -11,39 +12,177 @@ from keyszer.lib.logger import debug, error
 
 
 
+class Preference:
+    """One user preference: its name (also its row in the database), type and default."""
+    __slots__ = ('name', 'type', 'default', 'choices')
+
+    def __init__(self, name: str, pref_type: type, default: Union[str, bool], choices: Tuple[str, ...] = ()):
+        self.name       = name
+        self.type       = pref_type
+        self.default    = default
+        self.choices    = choices
+
+    def from_db_value(self, value: str) -> Union[str, bool]:
+        """Convert the text stored in the database. Raises ValueError if not valid."""
+        if self.type is bool:
+            if value.lower() not in ('true', 'false'):
+                raise ValueError(f"'{value}' is not True or False")
+            return value.lower() == 'true'
+        if self.choices and value not in self.choices:
+            raise ValueError(f"'{value}' is not one of: {', '.join(self.choices)}")
+        return value
+
+
+# The user preferences stored in the `config_preferences` table. Everything else 
+# (loading, saving, printing, listing) works from this, so a new preference only 
+# needs to be added here.
+PREFERENCES_SCHEMA = (
+    Preference('autostart_tray_icon',   bool,   True                                    ),
+    Preference('gui_dark_theme',        bool,   True                                    ),
+    Preference('override_kbtype',       str,    'Auto-Adapt',
+                choices=('Auto-Adapt', 'IBM', 'Chromebook', 'Windows', 'Apple')          ),
+    Preference('optspec_layout',        str,    'US',
+                choices=('US', 'ABC', 'Disabled')                                       ),
+    Preference('forced_numpad',         bool,   True                                    ),
+    Preference('media_arrows_fix',      bool,   False                                   ),
+    Preference('multi_lang',            bool,   False                                   ),
+    Preference('Caps2Cmd',              bool,   False                                   ),
+    Preference('Caps2Esc_Cmd',          bool,   False                                   ),
+    Preference('Enter2Ent_Cmd',         bool,   False                                   ),
+    Preference('ST3_in_VSCode',         bool,   False                                   ),
+)
+
+PREFERENCES         = {pref.name: pref for pref in PREFERENCES_SCHEMA}
+PREFERENCE_NAMES    = tuple(PREFERENCES)
+
+
+class Preferences:
+    """Values of the user preferences, one slot each, starting at the defaults."""
+    __slots__ = PREFERENCE_NAMES
+
+    def __init__(self):
+        for pref in PREFERENCES_SCHEMA:
+            setattr(self, pref.name, pref.default)
+
+    def copy(self) -> 'Preferences':
+        prefs_copy = Preferences()
+        for name in PREFERENCE_NAMES:
+            setattr(prefs_copy, name, getattr(self, name))
+        return prefs_copy
+
+    def changed_from(self, other: 'Preferences') -> List[str]:
+        """Return the names of the preferences with a different value in `other`."""
+        return [name for name in PREFERENCE_NAMES if getattr(self, name) != getattr(other, name)]
+
+
 class Settings:
     def __init__(self, config_dir_path: str = '..') -> None:
         self.config_dir_path        = config_dir_path
         self.prefs_db_file_name     = 'toshy_user_preferences.sqlite'
         self.prefs_db_file_path     = os.path.join(self.config_dir_path, self.prefs_db_file_name)
         self.first_run              = True
-        self.last_settings          = None
-        self.current_settings       = None
+        # Names of the settings that changed in the latest change notification
+        self.changed_keys           = ()
+        # Values of the settings as of the latest load/save, to tell which ones changed
+        self.loaded_prefs           = Preferences()
+        # Version counter of the preferences, bumped by every write (from any process).
+        # The changes of all versions up to this one are in `prefs`.
+        self.version                = 0
+        # True if this process wrote since it last read all preferences from the database
+        self.written_since_load     = False
+        # SQLite `data_version` of the database when settings were last loaded
+        self.data_version           = None
+        # One connection (WAL mode) kept open for all reads and writes, shared by threads
+        self.db_conn                = None
+        self.db_lock                = threading.RLock()
+        # Sends/receives settings changes over D-Bus (see `watch_changes()`)
+        self.broadcast              = None
+        # Wait for a burst of file events to end before checking the database
+        self.reload_delay           = 0.1       # seconds
+        self.reload_timer           = None
+        self.reload_lock            = threading.Lock()
         # Get the name of the module that instantiated the class
         calling_frame               = inspect.stack()[1]
         calling_file_path           = calling_frame.filename
         calling_module              = os.path.split(calling_file_path)[1]
         self.calling_module         = calling_module
-        # settings defaults
-        self.autostart_tray_icon    = True              # Default: True
-        self.gui_dark_theme         = True              # Default: True
-        self.override_kbtype        = 'Auto-Adapt'      # Default: 'Auto-Adapt'
-        self.optspec_layout         = 'US'              # Default: 'US'
-        self.forced_numpad          = True              # Default: True
-        self.media_arrows_fix       = False             # Default: False
-        self.multi_lang             = False             # Default: False
-        self.Caps2Cmd               = False             # Default: False
-        self.Caps2Esc_Cmd           = False             # Default: False
-        self.Enter2Ent_Cmd          = False             # Default: False
-        self.ST3_in_VSCode          = False             # Default: False
+        # User preferences, starting at the defaults from PREFERENCES_SCHEMA. Each one 
+        # is also a property of this object (`cnfg.forced_numpad`), see the end of the file.
+        self.prefs                  = Preferences()
         # Synergy
         self.screen_focus           = True  # True if focus is on the screen, False otherwise
         self.synergy_log_path       = os.path.expanduser("~/.local/state/Synergy/synergy.log")
         self.synergy_log_last_pos   = 0  # Keep track of the last read position in the log file
         self.initial_log_read_done  = False
+        # Functions to call (with no arguments) when settings or screen focus change, 
+        # with the setting names they are interested in (None for any)
+        self.change_listeners: List[Tuple[Callable, Optional[frozenset]]] = []
         # Load user's custom settings from database (defaults will be saved if no DB)
         self.load_settings()
 
+    def add_change_listener(self, listener: Callable, keys: Iterable[str] = None):
+        """
+        Register a function to be called (with no arguments) after settings change.
+        With `keys`, it is only called when one of the named settings changed.
+        The names of the changed settings are in `changed_keys` during the call.
+        """
+        self.change_listeners.append((listener, frozenset(keys) if keys is not None else None))
+
+    def notify_change_listeners(self, changed_keys: Iterable[str] = None):
+        """Call the change listeners for the changed settings (all listeners if not given)."""
+        self.changed_keys = tuple(changed_keys) if changed_keys is not None else ()
+        for listener, keys in self.change_listeners:
+            if keys is not None and changed_keys is not None and keys.isdisjoint(self.changed_keys):
+                continue
+            try:
+                listener()
+            except Exception as e:
+                error(f"Error in settings change listener '{listener.__name__}':\n\t{e}")
+
+    def watch_changes(self, run_main_loop: bool = True) -> bool:
+        """
+        Keep the settings up to date with changes made by the other Toshy processes. 
+        Changes come in as a D-Bus signal with only the changed settings, and this 
+        process' own changes are sent out the same way. If the session bus can't 
+        be used, fall back to watching the database file. Give `run_main_loop=False` 
+        if the process already runs a GLib main loop. Returns True if D-Bus is used.
+
+        With D-Bus, the database file is not watched, so changes written to it by 
+        anything else than `Settings` (like the sqlite3 command) are not seen until 
+        the next change from a Toshy process, or a restart.
+        """
+        try:
+            from lib.settings_dbus import SettingsBroadcast
+            self.broadcast = SettingsBroadcast(self.apply_broadcast_changes, run_main_loop)
+            return True
+        except Exception as e:
+            error(f"Settings changes not available over D-Bus, watching the database file:\n\t{e}")
+            self.watch_database()
+            return False
+
+    def apply_broadcast_changes(self, changes: Dict[str, str], version: int):
+        """
+        Apply the settings changed by another process, as sent in the D-Bus signal 
+        (the signals this process sent are not passed in, see `SettingsBroadcast`). 
+        Only the change right after the current version is applied from the signal. 
+        Any other version means the signals and writes of the processes crossed, 
+        so the settings are read again from the database.
+        """
+        with self.db_lock:
+            out_of_order = version != self.version + 1
+            if not out_of_order:
+                for name, value in changes.items():
+                    self.set_from_db_value(name, value)
+                self.version = version
+                changed_keys = self.prefs.changed_from(self.loaded_prefs)
+                self.loaded_prefs = self.prefs.copy()
+        if out_of_order:
+            debug(f"Settings version {version} received at version {self.version}, reloading")
+            self.load_settings(force=True)
+        elif changed_keys:
+            debug(f'User preferences changed by another process: {", ".join(changed_keys)}')
+            self.notify_change_listeners(changed_keys)
+
     def watch_database(self):
         # initialize observer to watch for database changes
         event_handler = FileSystemEventHandler()
@@ -53,83 +192,249 @@ class Settings:
         observer.start()
 
     def on_database_modified(self, event: Optional[FileSystemEvent]):
-        if event.src_path == self.prefs_db_file_path:
-            self.load_settings()
+        # in WAL mode, commits go to the "-wal" file until a checkpoint
+        if event.src_path in (self.prefs_db_file_path, self.prefs_db_file_path + '-wal'):
+            self.schedule_reload()
+
+    def schedule_reload(self):
+        """
+        Check the database for changes once the current burst of file events is over 
+        (one SQLite write fires several events). Each new event restarts the wait.
+        """
+        with self.reload_lock:
+            if self.reload_timer is not None:
+                self.reload_timer.cancel()
+            self.reload_timer = threading.Timer(self.reload_delay, self.reload_if_changed)
+            self.reload_timer.daemon = True
+            self.reload_timer.start()
+
+    def get_db_connection(self) -> sqlite3.Connection:
+        """
+        Return the connection to the preferences database, opening it (in WAL mode, 
+        so a write is one short append and readers in other processes don't block it) 
+        and creating the tables the first time. Use it while holding `db_lock`.
+        """
+        if self.db_conn is None:
+            db_conn = sqlite3.connect(self.prefs_db_file_path, check_same_thread=False)
+            db_conn.execute("PRAGMA journal_mode=WAL")
+            with db_conn:
+                db_conn.execute('''CREATE TABLE IF NOT EXISTS config_preferences
+                                    (name TEXT PRIMARY KEY, value TEXT)''')
+                db_conn.execute('''CREATE TABLE IF NOT EXISTS config_version
+                                    (id INTEGER PRIMARY KEY CHECK (id = 0), version INTEGER)''')
+                db_conn.execute("INSERT OR IGNORE INTO config_version (id, version) VALUES (0, 0)")
+            self.db_conn = db_conn
+        return self.db_conn
+
+    def get_data_version(self) -> Optional[int]:
+        """
+        Return SQLite's `data_version` for the database, which changes whenever another 
+        connection (another process) commits a change, but not for this process' writes.
+        """
+        try:
+            with self.db_lock:
+                return self.get_db_connection().execute("PRAGMA data_version").fetchone()[0]
+        except sqlite3.Error as e:
+            error(f"Unable to check the user preferences database version:\n\t{e}")
+            return None
+
+    def set(self, name: str, value: Union[str, bool]):
+        """
+        Change one preference. Only its row is written, in one short transaction 
+        that also bumps the version counter. Change listeners in this process are 
+        called right away, other processes see the change through the database.
+        """
+        pref = PREFERENCES.get(name)
+        if pref is None:
+            raise ValueError(f"Unknown preference name given to Settings.set(): '{name}'")
+        if not isinstance(value, pref.type):
+            raise TypeError(f"Preference '{name}' must be {pref.type.__name__}, not {type(value).__name__}")
+        if pref.choices and value not in pref.choices:
+            raise ValueError(f"Preference '{name}' must be one of: {', '.join(pref.choices)}")
+        if getattr(self.prefs, name) == value and getattr(self.loaded_prefs, name) == value:
+            return      # nothing to write
+        # set before the write, so a write by another process read in meanwhile 
+        # (see `_bump_version()`) doesn't overwrite it, and put back if the write fails
+        old_value, old_version = getattr(self.prefs, name), self.version
+        setattr(self.prefs, name, value)
+        try:
+            with self.db_lock:
+                db_conn = self.get_db_connection()
+                with db_conn:
+                    db_conn.execute("INSERT OR REPLACE INTO config_preferences (name, value) VALUES (?, ?)",
+                                    (name, str(value)))
+                    self._bump_version(db_conn)
+        except sqlite3.Error as e:
+            setattr(self.prefs, name, old_value)
+            self.version = old_version
+            error(f"Unable to save preference '{name}':\n\t{e}")
+            return
+        self.notify_local_changes()
+
+    def _bump_version(self, db_conn: sqlite3.Connection):
+        # Call inside the write transaction. If another process wrote since this one last 
+        # loaded or wrote, its changes are read in now, before taking the new version 
+        # (its signal can arrive later, or never, and is then out of date).
+        db_conn.execute("UPDATE config_version SET version = version + 1 WHERE id = 0")
+        version = db_conn.execute("SELECT version FROM config_version WHERE id = 0").fetchone()[0]
+        if version != self.version + 1:
+            debug(f"Settings version {version - 1} written by another process, reading it in")
+            own_values = {name: getattr(self.prefs, name) for name in self.prefs.changed_from(self.loaded_prefs)}
+            for name, value in db_conn.execute("SELECT name, value FROM config_preferences").fetchall():
+                if name not in own_values:
+                    self.set_from_db_value(name, value)
+        self.version = version
+        self.written_since_load = True
+
+    def notify_local_changes(self):
+        """
+        Report the preferences changed (and saved) by this process since the latest load, 
+        to the listeners in this process and to the other processes.
+        """
+        if self.first_run:
+            return
+        changed_keys = self.prefs.changed_from(self.loaded_prefs)
+        if not changed_keys:
+            return
+        self.loaded_prefs = self.prefs.copy()
+        if self.broadcast is not None:
+            self.broadcast.send({name: str(getattr(self.prefs, name)) for name in changed_keys}, self.version)
+        self.notify_change_listeners(changed_keys)
+
+    def reload_if_changed(self) -> bool:
+        """Load the settings, unless the database has not changed since the last load."""
+        with self.reload_lock:
+            self.reload_timer = None
+            data_version = self.get_data_version()
+            if data_version is not None and data_version == self.data_version:
+                return False
+            self.data_version = data_version
+        self.load_settings()
+        return True
 
     def save_settings(self):
-        db_connection = sqlite3.connect(self.prefs_db_file_path)
-        db_cursor = db_connection.cursor()
-        db_cursor.execute('''CREATE TABLE IF NOT EXISTS config_preferences
-                            (name TEXT PRIMARY KEY, value TEXT)''')
-        # Define the SQL query as a string variable (it's always the same)
-        sql_query = "INSERT OR REPLACE INTO config_preferences (name, value) VALUES (?, ?)"
-        # Execute the SQL query with different parameters
-        db_cursor.execute(sql_query, ('autostart_tray_icon',    str(self.autostart_tray_icon)   ))
-        db_cursor.execute(sql_query, ('gui_dark_theme',         str(self.gui_dark_theme)        ))
-        db_cursor.execute(sql_query, ('override_kbtype',        str(self.override_kbtype)       ))
-        db_cursor.execute(sql_query, ('optspec_layout',         str(self.optspec_layout)        ))
-        db_cursor.execute(sql_query, ('forced_numpad',          str(self.forced_numpad)         ))
-        db_cursor.execute(sql_query, ('media_arrows_fix',       str(self.media_arrows_fix)      ))
-        db_cursor.execute(sql_query, ('multi_lang',             str(self.multi_lang)            ))
-        db_cursor.execute(sql_query, ('Caps2Cmd',               str(self.Caps2Cmd)              ))
-        db_cursor.execute(sql_query, ('Caps2Esc_Cmd',           str(self.Caps2Esc_Cmd)          ))
-        db_cursor.execute(sql_query, ('Enter2Ent_Cmd',          str(self.Enter2Ent_Cmd)         ))
-        db_cursor.execute(sql_query, ('ST3_in_VSCode',          str(self.ST3_in_VSCode)         ))
-        # Commit changes to the database
-        db_connection.commit()
-        db_connection.close()
-
-    def load_settings(self):
-        # create the database file and save default settings if necessary
-        if not os.path.isfile(self.prefs_db_file_path):
-            self.save_settings()
-        
-        db_connection = sqlite3.connect(self.prefs_db_file_path)
-        db_cursor = db_connection.cursor()
-        db_cursor.execute("SELECT * FROM config_preferences")
-        rows: List[Tuple[str, str]] = db_cursor.fetchall()
-        for row in rows:
-            # Convert the string value to a Python boolean correctly
-            setting_value = row[1].lower() == 'true'
-            if True is False: pass  # dummy first `if` line so other rows line up
-            elif row[0] == 'autostart_tray_icon'    : self.autostart_tray_icon      = setting_value
-            elif row[0] == 'gui_dark_theme'         : self.gui_dark_theme           = setting_value
-            elif row[0] == 'override_kbtype'        : self.override_kbtype          = row[1]
-            elif row[0] == 'optspec_layout'         : self.optspec_layout           = row[1]
-            elif row[0] == 'forced_numpad'          : self.forced_numpad            = setting_value
-            elif row[0] == 'media_arrows_fix'       : self.media_arrows_fix         = setting_value
-            elif row[0] == 'multi_lang'             : self.multi_lang               = setting_value
-            elif row[0] == 'Caps2Cmd'               : self.Caps2Cmd                 = setting_value
-            elif row[0] == 'Caps2Esc_Cmd'           : self.Caps2Esc_Cmd             = setting_value
-            elif row[0] == 'Enter2Ent_Cmd'          : self.Enter2Ent_Cmd            = setting_value
-            elif row[0] == 'ST3_in_VSCode'          : self.ST3_in_VSCode            = setting_value
-        db_connection.close()
-
-        # Compare the current settings with the last settings, and 
-        # update last_settings if they are different
-        self.current_settings = self.get_settings_list()
-        if self.last_settings != self.current_settings:
-            self.last_settings = self.current_settings
-            if not self.first_run:
-                debug(f'User preferences database modified... loading new settings...')
-                if keyszer.lib.logger.VERBOSE:
-                    debug(self, ctx="CG")   # print out the changed settings when verbose logging
-            else:
-                self.first_run = False
-
-    def get_settings_list(self):
-        # get all attributes from the object
-        all_attributes = [attr for attr in dir(self) 
-                            if not callable(getattr(self, attr)) and 
-                            not attr.startswith("__")]
-        
-        # filter out attributes that are not strings or booleans
-        filtered_attributes = [attr for attr in all_attributes 
-                                if isinstance(getattr(self, attr), (str, bool, int))]
-        
-        # create a list of tuples with attribute name and value pairs
-        settings_list = [(attr, getattr(self, attr)) for attr in filtered_attributes]
-        return settings_list
+        """Write all preferences (prefer `set()` to change one of them)."""
+        with self.db_lock:
+            db_connection = self.get_db_connection()
+            # one transaction, committed when the `with` block ends
+            with db_connection:
+                db_connection.executemany(
+                    "INSERT OR REPLACE INTO config_preferences (name, value) VALUES (?, ?)",
+                    [(name, str(getattr(self.prefs, name))) for name in PREFERENCE_NAMES])
+                self._bump_version(db_connection)
+        self.notify_local_changes()
+
+    def set_from_db_value(self, name: str, value: str):
+        """Set a preference from its text value, as stored in the database."""
+        pref = PREFERENCES.get(name)
+        if pref is None:
+            return      # not a preference (any more), ignore the row
+        try:
+            setattr(self.prefs, name, pref.from_db_value(value))
+        except ValueError as e:
+            error(f"Bad value for preference '{name}' in the database, keeping {getattr(self.prefs, name)!r}:\n\t{e}")
+
+    def load_settings(self, force: bool = False):
+        with self.db_lock:
+            db_connection = self.get_db_connection()
+            version = db_connection.execute(
+                "SELECT version FROM config_version WHERE id = 0").fetchone()[0]
+            # Every write bumps the version, so the same version should mean nothing 
+            # changed. It's only a hint: after this process wrote, the rows are read 
+            # anyway, in case the version was taken without seeing another write.
+            if not self.first_run and not force and not self.written_since_load and version == self.version:
+                return
+            rows: List[Tuple[str, str]] = db_connection.execute(
+                "SELECT name, value FROM config_preferences").fetchall()
+            if not rows:
+                # new database, save default settings
+                self.save_settings()
+                rows = db_connection.execute("SELECT name, value FROM config_preferences").fetchall()
+                version = self.version
+            self.version = version
+            self.written_since_load = False
+            for row in rows:
+                self.set_from_db_value(row[0], row[1])
+
+        # Only report the settings that really changed since the latest load 
+        # (changes saved by this process were already reported when saved)
+        changed_keys = self.prefs.changed_from(self.loaded_prefs)
+        self.loaded_prefs = self.prefs.copy()
+
+        if self.first_run:
+            self.first_run = False
+            if self.data_version is None:
+                self.data_version = self.get_data_version()
+            return
+
+        if changed_keys:
+            debug(f'User preferences database modified... changed: {", ".join(changed_keys)}')
+            if keyszer.lib.logger.VERBOSE:
+                debug(self, ctx="CG")   # print out the changed settings when verbose logging
+            self.notify_change_listeners(changed_keys)
+
+    def get_settings_list(self) -> List[Tuple[str, Union[str, bool]]]:
+        """Return the user preferences as (name, value) pairs, in schema order."""
+        return [(name, getattr(self.prefs, name)) for name in PREFERENCE_NAMES]
+
+    def _connect_kbtype_cache(self):
+        db_connection = self.get_db_connection()
+        db_connection.execute('''CREATE TABLE IF NOT EXISTS kbtype_cache
+                            (dev_name TEXT, vendor INTEGER, product INTEGER,
+                            kbtype TEXT, source TEXT, rules_hash TEXT,
+                            PRIMARY KEY (dev_name, vendor, product))''')
+        return db_connection
+
+    def load_kbtype_cache(self, rules_hash: str) -> Dict[Tuple[str, int, int], Tuple[str, str]]:
+        """
+        Return the saved keyboard types, as `{(dev_name, vendor, product): (kbtype, source)}`.
+        Rows saved with different keyboard type rules (the `rules_hash` of the keyboard
+        lists and custom keyboard dict in the config) are out of date, and are deleted.
+        """
+        try:
+            with self.db_lock:
+                db_connection = self._connect_kbtype_cache()
+                with db_connection:
+                    db_connection.execute("DELETE FROM kbtype_cache WHERE rules_hash != ?", (rules_hash,))
+                rows = db_connection.execute(
+                    "SELECT dev_name, vendor, product, kbtype, source FROM kbtype_cache").fetchall()
+        except sqlite3.Error as e:
+            error(f"Unable to load the keyboard type cache:\n\t{e}")
+            return {}
+        return {(row[0], row[1], row[2]): (row[3], row[4]) for row in rows}
+
+    def save_kbtype_cache_entry(self, dev_name: str, vendor: int, product: int,
+                                kbtype: str, source: str, rules_hash: str):
+        """Save the keyboard type identified for a device (vendor/product are 0 if not known)."""
+        try:
+            with self.db_lock:
+                db_connection = self._connect_kbtype_cache()
+                with db_connection:
+                    db_connection.execute("INSERT OR REPLACE INTO kbtype_cache VALUES (?, ?, ?, ?, ?, ?)",
+                                            (dev_name, vendor, product, kbtype, source, rules_hash))
+        except sqlite3.Error as e:
+            error(f"Unable to save the keyboard type of '{dev_name}':\n\t{e}")
+
+    def get_kbtype_cache_list(self) -> List[Tuple[str, int, int, str, str]]:
+        """Return the saved keyboard types as (dev_name, vendor, product, kbtype, source) rows."""
+        try:
+            with self.db_lock:
+                db_connection = self._connect_kbtype_cache()
+                return db_connection.execute("SELECT dev_name, vendor, product, kbtype, source "
+                                                "FROM kbtype_cache ORDER BY dev_name").fetchall()
+        except sqlite3.Error as e:
+            error(f"Unable to read the keyboard type cache:\n\t{e}")
+            return []
+
+    def clear_kbtype_cache(self):
+        """Forget all saved keyboard types, so they are identified again on the next start."""
+        try:
+            with self.db_lock:
+                db_connection = self._connect_kbtype_cache()
+                with db_connection:
+                    db_connection.execute("DELETE FROM kbtype_cache")
+        except sqlite3.Error as e:
+            error(f"Unable to clear the keyboard type cache:\n\t{e}")
 
     def watch_synergy_log(self):
         log_dir = os.path.dirname(self.synergy_log_path)
@@ -180,30 +485,35 @@ class Settings:
                     most_recent_state = True
 
             if most_recent_state is not None:
+                focus_changed = self.screen_focus != most_recent_state
                 self.screen_focus = most_recent_state
+                if focus_changed:
+                    self.notify_change_listeners(('screen_focus',))
                 if self.screen_focus:
                     debug("Synergy log watcher detected return of screen focus.")
                 else:
                     debug("Synergy log watcher detected loss of screen focus.")
 
     def __str__(self):
-        return f"""Current settings:
-        -------------------------------------------
-        calling_module          = '{self.calling_module}'
-        prefs_db_file_path      = '{self.prefs_db_file_path}'
-        -------------------------------------------
-        autostart_tray_icon     = {self.autostart_tray_icon}
-        gui_dark_theme          = {self.gui_dark_theme}
-        -------------------------------------------
-        override_kbtype         = '{self.override_kbtype}'
-        -------------------------------------------
-        optspec_layout          = '{self.optspec_layout}'
-        -------------------------------------------
-        forced_numpad           = {self.forced_numpad}
-        media_arrows_fix        = {self.media_arrows_fix}
-        multi_lang              = {self.multi_lang}
-        Caps2Cmd                = {self.Caps2Cmd}
-        Caps2Esc_Cmd            = {self.Caps2Esc_Cmd}
-        Enter2Ent_Cmd           = {self.Enter2Ent_Cmd}
-        ST3_in_VSCode           = {self.ST3_in_VSCode}
-        -------------------------------------------"""
+        separator = '        -------------------------------------------'
+        lines = ['Current settings:', separator,
+                    f"        {'calling_module':<24}= '{self.calling_module}'",
+                    f"        {'prefs_db_file_path':<24}= '{self.prefs_db_file_path}'",
+                    separator]
+        lines += [f"        {name:<24}= {getattr(self.prefs, name)!r}" for name in PREFERENCE_NAMES]
+        lines.append(separator)
+        return '\n'.join(lines)
+
+
+def _preference_property(name: str) -> property:
+    def get_pref(self: Settings):
+        return getattr(self.prefs, name)
+    def set_pref(self: Settings, value):
+        setattr(self.prefs, name, value)
+    return property(get_pref, set_pref, doc=f"User preference '{name}' (see PREFERENCES_SCHEMA)")
+
+
+# `cnfg.<preference name>` reads/writes the preference slot, as it always has
+for _pref in PREFERENCES_SCHEMA:
+    setattr(Settings, _pref.name, _preference_property(_pref.name))
+del _pref
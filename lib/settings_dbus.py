@@ -0,0 +1,65 @@
+from typing import Callable, Dict
+from keyszer.lib.logger import error
+
+from lib.glib_loop import start_glib_main_loop
+
+
+
+# D-Bus names for the settings change signal, sent on the session bus by the
+# Toshy process (config, tray or preferences app) that changed the settings
+TOSHY_SETTINGS_DBUS_PATH    = '/org/toshy/Settings'
+TOSHY_SETTINGS_DBUS_IFACE   = 'org.toshy.Settings'
+TOSHY_SETTINGS_DBUS_SIGNAL  = 'Changed'
+
+
+class SettingsBroadcast:
+    """
+    Send and receive the `org.toshy.Settings.Changed` signal, which carries the
+    changed settings as `{name: value as text}` and the settings version after
+    the change (signature `a{ss}t`).
+
+    Receiving needs a GLib main loop. The tray already runs one, other processes
+    can have one started in a background thread with `run_main_loop=True` (shared
+    with other D-Bus receivers, see `lib.glib_loop`).
+    Raises ImportError or DBusException if the session bus can't be used.
+    """
+    def __init__(self, on_changed: Callable[[Dict[str, str], int], None], run_main_loop: bool = True):
+        import dbus
+        import dbus.lowlevel
+        from dbus.mainloop.glib import DBusGMainLoop
+        self.dbus           = dbus
+        self.on_changed     = on_changed
+        # a private connection, so the main loop setting doesn't affect other D-Bus users
+        self.session_bus    = dbus.SessionBus(private=True, mainloop=DBusGMainLoop())
+        self.unique_name    = self.session_bus.get_unique_name()
+        self.session_bus.add_signal_receiver(
+            self._receive,
+            signal_name     = TOSHY_SETTINGS_DBUS_SIGNAL,
+            dbus_interface  = TOSHY_SETTINGS_DBUS_IFACE,
+            path            = TOSHY_SETTINGS_DBUS_PATH,
+            sender_keyword  = 'sender',
+        )
+        if run_main_loop:
+            start_glib_main_loop()
+
+    def send(self, changes: Dict[str, str], version: int):
+        """Tell the other Toshy processes which settings changed."""
+        if not changes:
+            return
+        signal_msg = self.dbus.lowlevel.SignalMessage(
+            TOSHY_SETTINGS_DBUS_PATH, TOSHY_SETTINGS_DBUS_IFACE, TOSHY_SETTINGS_DBUS_SIGNAL)
+        signal_msg.append(self.dbus.Dictionary(changes, signature='ss'), self.dbus.UInt64(version),
+                            signature='a{ss}t')
+        try:
+            self.session_bus.send_message(signal_msg)
+        except self.dbus.exceptions.DBusException as e:
+            error(f"Unable to send the settings change signal:\n\t{e}")
+
+    def _receive(self, changes, version, sender=None):
+        # a process also gets the signals it sent itself
+        if sender == self.unique_name:
+            return
+        try:
+            self.on_changed({str(name): str(value) for name, value in changes.items()}, int(version))
+        except Exception as e:
+            error(f"Error handling the settings change signal:\n\t{e}")
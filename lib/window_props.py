@@ -0,0 +1,382 @@
+import os
+import threading
+
+from abc import ABC, abstractmethod
+from typing import Optional
+from keyszer.lib.logger import debug, error
+
+from lib.matching import snapshot, window_state_changed
+from lib.glib_loop import start_glib_main_loop
+
+
+
+# Window types that can be matched with `matchProps(wtype=...)`, named like the
+# `_NET_WM_WINDOW_TYPE_*` atoms (lowercase, without the prefix)
+WINDOW_TYPES = ( 'normal', 'dialog', 'utility', 'splash', 'menu', 'toolbar',
+                    'dock', 'desktop', 'notification', 'other' )
+
+# D-Bus names of the Toshy KDE D-Bus service, which the KWin script notifies
+TOSHY_KDE_DBUS_SVC_NAME     = 'org.toshy.Toshy'
+TOSHY_KDE_DBUS_SVC_PATH     = '/org/toshy/Toshy'
+
+# D-Bus names of the Toshy wlroots D-Bus service (wlr-foreign-toplevel-management)
+TOSHY_WLR_DBUS_SVC_NAME     = 'org.toshy.Wlroots'
+TOSHY_WLR_DBUS_SVC_PATH     = '/org/toshy/Wlroots'
+
+# Signal of both services, sent when the state (like fullscreen) of the active
+# window changes, without a change of the window class or title
+TOSHY_WINDOW_STATE_SIGNAL   = 'WindowStateChanged'
+
+# Wayland desktops without the wlr-foreign-toplevel-management protocol
+NON_WLR_DESKTOPS            = ('kde', 'gnome', 'cinnamon')
+
+# Seconds to wait for the reply of a D-Bus service. The services answer from what
+# they already know, and the key event waits for the reply, so this is kept short
+# (instead of the default D-Bus timeout of about 25 seconds).
+DBUS_QUERY_TIMEOUT          = 0.25
+
+
+class WindowProps:
+    """
+    Type, transient, modal and fullscreen state of a window, and the ID of the 
+    process that owns it. None means "not known". The executable and command line of the 
+    process are only read from /proc if a matcher asks (see `get_process_info()`).
+    """
+    __slots__ = ('window_type', 'transient', 'modal', 'fullscreen', 'pid', 'exe', 'cmd')
+
+    def __init__(self, window_type: Optional[str], transient: Optional[bool], 
+                    modal: Optional[bool], pid: Optional[int] = None, 
+                    fullscreen: Optional[bool] = None):
+        self.window_type    = window_type
+        self.transient      = transient
+        self.modal          = modal
+        self.fullscreen     = fullscreen
+        self.pid            = pid or None
+        self.exe            = None
+        self.cmd            = None
+
+    def __repr__(self):
+        return (f"WindowProps(window_type={self.window_type!r}, "
+                f"transient={self.transient}, modal={self.modal}, "
+                f"fullscreen={self.fullscreen}, pid={self.pid})")
+
+
+# Returned when there is no provider for the session, or the provider has no answer.
+# Providers return None instead when asking failed (see `get_window_props()`).
+UNKNOWN_PROPS = WindowProps(None, None, None)
+
+
+class X11WindowPropsProvider:
+    """
+    Read the EWMH/ICCCM properties of the active window from the X server. A background 
+    thread (with its own X connection) watches for changes of the fullscreen/modal state 
+    of the active window, and for focus changes between windows with the same class and 
+    title (which the matchers can't tell apart), and tells the matchers with 
+    `window_state_changed()`.
+    """
+    def __init__(self):
+        from Xlib import X, Xatom
+        from Xlib.display import Display
+        from Xlib.error import XError
+        self.X              = X
+        self.Xatom          = Xatom
+        self.XError         = XError
+        self.display        = Display()
+        self.root           = self.display.screen().root
+        atom                = self.display.intern_atom
+        self.NET_ACTIVE_WINDOW      = atom('_NET_ACTIVE_WINDOW')
+        self.NET_WM_WINDOW_TYPE     = atom('_NET_WM_WINDOW_TYPE')
+        self.NET_WM_STATE           = atom('_NET_WM_STATE')
+        self.NET_WM_STATE_MODAL     = atom('_NET_WM_STATE_MODAL')
+        self.NET_WM_STATE_FULLSCREEN = atom('_NET_WM_STATE_FULLSCREEN')
+        self.NET_WM_PID             = atom('_NET_WM_PID')
+        self.NET_WM_NAME            = atom('_NET_WM_NAME')
+        self.UTF8_STRING            = atom('UTF8_STRING')
+        self.window_type_atoms      = { atom(f'_NET_WM_WINDOW_TYPE_{window_type.upper()}'): window_type
+                                        for window_type in WINDOW_TYPES if window_type != 'other' }
+        watch_thread                = threading.Thread(target=self._watch_window_state,
+                                                        name='toshy-x11-window-state')
+        watch_thread.daemon         = True
+        watch_thread.start()
+
+    def query(self) -> Optional[WindowProps]:
+        try:
+            active = self.root.get_full_property(self.NET_ACTIVE_WINDOW, self.X.AnyPropertyType)
+            if not active or not active.value or not active.value[0]:
+                return UNKNOWN_PROPS
+            window      = self.display.create_resource_object('window', active.value[0])
+            type_prop   = window.get_full_property(self.NET_WM_WINDOW_TYPE, self.Xatom.ATOM)
+            trans_prop  = window.get_full_property(self.Xatom.WM_TRANSIENT_FOR, self.Xatom.WINDOW)
+            state_prop  = window.get_full_property(self.NET_WM_STATE, self.Xatom.ATOM)
+            pid_prop    = window.get_full_property(self.NET_WM_PID, self.Xatom.CARDINAL)
+        except self.XError as e:
+            error(f"Unable to read X11 window properties:\n\t{e}")
+            return None
+        transient = bool(trans_prop and trans_prop.value and trans_prop.value[0])
+        modal = bool(state_prop) and self.NET_WM_STATE_MODAL in state_prop.value
+        fullscreen = bool(state_prop) and self.NET_WM_STATE_FULLSCREEN in state_prop.value
+        if type_prop and type_prop.value:
+            # the first type the window manager knows is the one to use
+            window_type = next( (self.window_type_atoms[type_atom] for type_atom in type_prop.value
+                                    if type_atom in self.window_type_atoms), 'other')
+        else:
+            # EWMH: windows without a type are dialogs if transient, otherwise normal
+            window_type = 'dialog' if transient else 'normal'
+        pid = pid_prop.value[0] if pid_prop and pid_prop.value else None
+        return WindowProps(window_type, transient, modal, pid, fullscreen)
+
+    def _watch_window_state(self):
+        from Xlib.display import Display
+        try:
+            display         = Display()
+            root            = display.screen().root
+            root.change_attributes(event_mask=self.X.PropertyChangeMask)
+            active          = self._watch_active_window(display, root, None)
+            active_state    = self._window_state(active)
+            active_ident    = self._window_ident(active)
+            while True:
+                event = display.next_event()
+                if event.type != self.X.PropertyNotify:
+                    continue
+                if event.window == root and event.atom == self.NET_ACTIVE_WINDOW:
+                    previous, previous_ident = active, active_ident
+                    active = self._watch_active_window(display, root, active)
+                    active_state = self._window_state(active)
+                    active_ident = self._window_ident(active)
+                    # a change of class or title already tells the matchers
+                    if active != previous and active_ident is not None and active_ident == previous_ident:
+                        window_state_changed()
+                elif active is not None and event.window == active and event.atom == self.NET_WM_STATE:
+                    window_state = self._window_state(active)
+                    if window_state != active_state:
+                        active_state = window_state
+                        window_state_changed()
+        except Exception as e:
+            error(f"Stopped watching X11 window state changes:\n\t{e}")
+
+    def _watch_active_window(self, display, root, previous):
+        # the property changes of a window are only sent to clients that ask for them
+        ignore_error = lambda *args: None
+        if previous is not None:
+            previous.change_attributes(event_mask=0, onerror=ignore_error)
+        active_prop = root.get_full_property(self.NET_ACTIVE_WINDOW, self.X.AnyPropertyType)
+        if not active_prop or not active_prop.value or not active_prop.value[0]:
+            return None
+        active = display.create_resource_object('window', active_prop.value[0])
+        active.change_attributes(event_mask=self.X.PropertyChangeMask, onerror=ignore_error)
+        return active
+
+    def _window_state(self, window):
+        if window is None:
+            return None
+        try:
+            state_prop = window.get_full_property(self.NET_WM_STATE, self.Xatom.ATOM)
+        except self.XError:
+            return None     # closed already
+        state_atoms = state_prop.value if state_prop else ()
+        return (self.NET_WM_STATE_FULLSCREEN in state_atoms, self.NET_WM_STATE_MODAL in state_atoms)
+
+    def _window_ident(self, window):
+        # class and title, as far as the matchers see the window
+        if window is None:
+            return None
+        try:
+            name_prop = window.get_full_property(self.NET_WM_NAME, self.UTF8_STRING)
+            return (window.get_wm_class(), name_prop.value if name_prop else window.get_wm_name())
+        except self.XError:
+            return None     # closed already
+
+
+class DBusWindowPropsProvider(ABC):
+    """
+    Ask a Toshy D-Bus service for the active window (`GetActiveWindow()`). The service 
+    sends the `WindowStateChanged` signal when the state of the active window changes, 
+    which is passed on to the matchers with `window_state_changed()`.
+    """
+    service_name    = None
+    service_path    = None
+    service_desc    = None
+
+    def __init__(self):
+        import dbus
+        from dbus.exceptions import DBusException
+        self.DBusException  = DBusException
+        session_bus         = dbus.SessionBus()
+        proxy               = session_bus.get_object(self.service_name, self.service_path)
+        self.interface      = dbus.Interface(proxy, self.service_name)
+        try:
+            self._receive_window_state_changes()
+        except Exception as e:
+            error(f"Window state changes from the {self.service_desc} not available:\n\t{e}")
+
+    def _receive_window_state_changes(self):
+        import dbus
+        from dbus.mainloop.glib import DBusGMainLoop
+        # a private connection, so the main loop setting doesn't affect other D-Bus users
+        self.signal_bus     = dbus.SessionBus(private=True, mainloop=DBusGMainLoop())
+        self.signal_bus.add_signal_receiver(
+            lambda: window_state_changed(),
+            signal_name     = TOSHY_WINDOW_STATE_SIGNAL,
+            dbus_interface  = self.service_name,
+            path            = self.service_path,
+        )
+        start_glib_main_loop()
+
+    def query(self) -> Optional[WindowProps]:
+        try:
+            window_info = self.interface.GetActiveWindow(timeout=DBUS_QUERY_TIMEOUT)
+        except self.DBusException as e:
+            error(f"Unable to get window properties from the {self.service_desc}:\n\t{e}")
+            return None
+        return self.window_props(window_info)
+
+    @abstractmethod
+    def window_props(self, window_info) -> WindowProps:
+        """Turn the `GetActiveWindow()` reply of the service into window properties."""
+
+
+class KDEWindowPropsProvider(DBusWindowPropsProvider):
+    """Ask the Toshy KDE D-Bus service, which the Toshy KWin script keeps up to date."""
+    service_name    = TOSHY_KDE_DBUS_SVC_NAME
+    service_path    = TOSHY_KDE_DBUS_SVC_PATH
+    service_desc    = 'Toshy KDE D-Bus service'
+
+    def window_props(self, window_info) -> WindowProps:
+        # an older KWin script (or the service) doesn't send these, so they stay unknown
+        window_type = str(window_info.get('window_type', '')) or None
+        if window_type is None:
+            return UNKNOWN_PROPS
+        return WindowProps( window_type,
+                            bool(window_info.get('transient', False)),
+                            bool(window_info.get('modal', False)),
+                            int(window_info.get('pid', 0)),
+                            bool(window_info.get('fullscreen', False)) )
+
+
+class WlrootsWindowPropsProvider(DBusWindowPropsProvider):
+    """
+    Ask the Toshy wlroots D-Bus service, which follows the toplevels of the compositor
+    (wlr-foreign-toplevel-management). The protocol gives the parent and fullscreen 
+    state of a toplevel, but not the window type, modal state or PID.
+    """
+    service_name    = TOSHY_WLR_DBUS_SVC_NAME
+    service_path    = TOSHY_WLR_DBUS_SVC_PATH
+    service_desc    = 'Toshy wlroots D-Bus service'
+
+    def window_props(self, window_info) -> WindowProps:
+        # an older service doesn't send it, so it stays unknown
+        if 'transient' not in window_info:
+            return UNKNOWN_PROPS
+        return WindowProps( None, bool(window_info['transient']), None,
+                            fullscreen=bool(window_info.get('fullscreen', False)) )
+
+
+_provider           = None
+_last_window        = None
+_last_props         = UNKNOWN_PROPS
+_failed_window      = None
+_last_process       = (None, UNKNOWN_PROPS)     # ((wm_class, window state serial), props)
+
+
+def use_window_props_provider(session_type: str, desktop_env: str) -> bool:
+    """
+    Pick the provider of window type/transient/modal properties for the session:
+    the X server on X11, the Toshy KWin script and D-Bus service on KDE Wayland, or
+    the Toshy wlroots D-Bus service on other Wayland sessions (transient/fullscreen).
+    GNOME and Cinnamon Wayland have no provider, so the properties stay unknown, and
+    matchers using them don't match. Returns True if a provider is available.
+    """
+    global _provider
+    provider_cls = None
+    if session_type == 'x11':
+        provider_cls = X11WindowPropsProvider
+    elif session_type == 'wayland' and desktop_env == 'kde':
+        provider_cls = KDEWindowPropsProvider
+    elif session_type == 'wayland' and desktop_env not in NON_WLR_DESKTOPS:
+        provider_cls = WlrootsWindowPropsProvider
+    if provider_cls is None:
+        debug(f"No window type provider for session '{session_type}' on '{desktop_env}'")
+        return False
+    try:
+        _provider = provider_cls()
+    except Exception as e:
+        error(f"Window type matching not available, '{provider_cls.__name__}' failed:\n\t{e}")
+        return False
+    return True
+
+
+def get_window_props(ctx) -> WindowProps:
+    """
+    Return the properties of the focused window. The provider is only asked again
+    when the window class or title changes (focus change), or the provider reported 
+    a change of the window's state, or of the focus between windows with the same class 
+    and title (X11 property changes, or the `WindowStateChanged` signal of the D-Bus 
+    services, see `window_state_changed()`). 
+    The answer is kept on the context snapshot for the rest of the key event.
+
+    If asking the provider fails, the properties are unknown for this key event, 
+    and the provider is asked once more on the next one (for the same window), 
+    with the window state serial bumped so condition results that saw the unknown 
+    properties are not reused.
+    """
+    global _last_window, _last_props, _failed_window
+    snap = snapshot(ctx)
+    if snap.window_props is not None:
+        return snap.window_props
+    window = (snap.wm_class, snap.wm_name, snap.window_state)
+    if window != _last_window:
+        _last_window = window
+        _last_props = _provider.query() if _provider is not None else UNKNOWN_PROPS
+        if _last_props is not None:
+            _failed_window = None
+        else:
+            _last_props = UNKNOWN_PROPS
+            if _failed_window != window[:2]:
+                _failed_window = window[:2]
+                window_state_changed()
+    snap.window_props = _last_props
+    return _last_props
+
+
+def get_process_info(ctx) -> WindowProps:
+    """
+    Return the window properties, with `exe` (file name of the executable) and `cmd` 
+    (the command line, arguments joined with spaces) of the window's process filled 
+    in from /proc/<pid>. The process is only looked up again (and the provider asked 
+    for the PID) when the window class or the window state serial changes, so title 
+    changes don't cost a provider query. Windows with the same class are taken to 
+    belong to the same program, unless the provider reports a change of the window 
+    (see `window_state_changed()`).
+
+    Both are empty strings if the PID is not known, or the process can't be read.
+    Sandboxed apps (like Flatpak) may report a PID from inside their sandbox, 
+    which doesn't point at the right process.
+    """
+    global _last_process
+    snap = snapshot(ctx)
+    process_key = (snap.wm_class, snap.window_state)
+    if _last_process[0] != process_key:
+        window_props = get_window_props(ctx)
+        process_info = WindowProps( window_props.window_type, window_props.transient,
+                                    window_props.modal, window_props.pid,
+                                    window_props.fullscreen )
+        process_info.exe, process_info.cmd = _read_process(window_props.pid)
+        _last_process = (process_key, process_info)
+    return _last_process[1]
+
+
+def _read_process(pid: Optional[int]):
+    exe, cmd = '', ''
+    if not pid:
+        return exe, cmd
+    proc_dir = f'/proc/{pid}'
+    try:
+        exe = os.path.basename(os.readlink(f'{proc_dir}/exe'))
+    except OSError:
+        pass    # gone already, or owned by another user
+    try:
+        with open(f'{proc_dir}/cmdline', 'rb') as cmdline_file:
+            cmd = cmdline_file.read().rstrip(b'\0').replace(b'\0', b' ').decode(errors='replace')
+    except OSError:
+        pass
+    return exe, cmd
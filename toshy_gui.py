@@ -209,7 +209,7 @@ icon_file_inverse               = "toshy_app_icon_rainbow_inverse"
 
 config_dir_path = current_folder_path
 cnfg = Settings(config_dir_path)
-cnfg.watch_database()
+cnfg.watch_changes()    # get settings changes from the other Toshy processes (D-Bus)
 debug("")
 debug(cnfg)   # prints out the __str__ method of Settings class
 
@@ -218,30 +218,11 @@ from lib.notification_manager import NotificationManager
 ntfy = NotificationManager(icon_file_active, title='Toshy Alert (GUI)')
 
 
-def get_settings_list(settings_obj):
-    # get all attributes from the object
-    all_attributes = [attr for attr in dir(settings_obj) if not callable(getattr(settings_obj, attr)) and not attr.startswith("__")]
-    # filter out attributes that are not strings or booleans
-    filtered_attributes = [attr for attr in all_attributes if isinstance(getattr(settings_obj, attr), (str, bool, int))]
-    # create a list of tuples with attribute name and value pairs
-    settings_list = [(attr, getattr(settings_obj, attr)) for attr in filtered_attributes]
-    return settings_list
-
-
-# Store the settings as a list to see when they change.
-# Monitor from a separate thread.
-last_settings_list = get_settings_list(cnfg)
-
-
-def fn_monitor_internal_settings():
-    global last_settings_list
-    while True:
-        time.sleep(1)
-        if last_settings_list != get_settings_list(cnfg):
-            # debug(f'Updating GUI preferences switch settings...')
-            load_radio_btn_settings(cnfg, optspec_var, "optspec_layout")
-            load_switch_settings(cnfg)
-            last_settings_list = get_settings_list(cnfg)
+def on_settings_changed():
+    """Update the switches when settings change (called by the Settings object)."""
+    # debug(f'Updating GUI preferences switch settings...')
+    load_radio_btn_settings(cnfg, optspec_var, "optspec_layout")
+    load_switch_settings(cnfg)
 
 
 sysctl_cmd      = f"{shutil.which('systemctl')}"
@@ -436,13 +417,11 @@ wrap_len        = 380
 
 
 def save_radio_settings(cnfg: Settings, var: tk.StringVar, key: str):
-    setattr(cnfg, key, var.get())
-    cnfg.save_settings()
+    cnfg.set(key, var.get())
 
 
 def save_switch_settings(cnfg: Settings, var: tk.BooleanVar, key: str):
-    setattr(cnfg, key, var.get())
-    cnfg.save_settings()
+    cnfg.set(key, var.get())
 
 
 def load_radio_btn_settings(cnfg: Settings, var: tk.StringVar, key: str):
@@ -740,6 +719,84 @@ help_about_btn = ttk.Button(
 )
 help_about_btn.pack(anchor=tk.SW, side=tk.BOTTOM, padx=10, pady=6)
 
+
+def show_kbtype_cache_dialog():
+    popup_root = tk.Toplevel(root)
+    popup_root.title("Keyboard Types")
+    popup_root.bind("<Control-w>", lambda event: popup_root.destroy())
+    popup_root.bind("<Escape>", lambda event: popup_root.destroy())
+    popup_root.grab_set()
+
+    main_popup_frame = tk.Frame(popup_root, highlightbackground='gray', highlightthickness=1)
+    main_popup_frame.pack(anchor=tk.N, side=tk.TOP, ipadx=10, ipady=10, fill=tk.BOTH, expand=True)
+
+    intro_label = tk.Label(
+        main_popup_frame,
+        justify=tk.LEFT,
+        text=(  'Keyboard types identified by the Toshy config, saved so they are not '
+                'identified again on every start. They are identified again when the '
+                'keyboard lists in the config are changed, or when cleared here (takes '
+                'effect when Toshy services are restarted).'),
+        font=sw_lbl_font,
+        wraplength=500,
+        fg=sw_lbl_font_color
+    )
+    intro_label.pack(anchor=tk.W, padx=10, pady=10)
+
+    columns = ('dev_name', 'vendor', 'product', 'kbtype', 'source')
+    kbtype_tree = ttk.Treeview(main_popup_frame, columns=columns, show='headings', height=8)
+    for column, heading, width in zip(columns,
+                                        ('Device', 'Vendor', 'Product', 'Type', 'Identified by'),
+                                        (260, 60, 60, 90, 160)):
+        kbtype_tree.heading(column, text=heading)
+        kbtype_tree.column(column, width=width, anchor=tk.W)
+    kbtype_tree.pack(padx=10, pady=10, fill=tk.BOTH, expand=True)
+
+    def fill_kbtype_tree():
+        kbtype_tree.delete(*kbtype_tree.get_children())
+        for dev_name, vendor, product, kbtype, source in cnfg.get_kbtype_cache_list():
+            kbtype_tree.insert('', tk.END, values=(
+                dev_name, f'{vendor:04x}' if vendor else '', 
+                f'{product:04x}' if product else '', kbtype, source))
+
+    def clear_kbtype_tree():
+        cnfg.clear_kbtype_cache()
+        fill_kbtype_tree()
+
+    fill_kbtype_tree()
+
+    buttons_frame = tk.Frame(main_popup_frame)
+    buttons_frame.pack(padx=10, pady=10)
+    clear_button = ttk.Button(buttons_frame, text="Clear", command=clear_kbtype_tree)
+    clear_button.pack(side=tk.LEFT, padx=10)
+    ok_button = ttk.Button(buttons_frame, text="OK", command=popup_root.destroy)
+    ok_button.pack(side=tk.LEFT, padx=10)
+
+    # Center the popup over the parent window (do this after packing widgets)
+    popup_root.update_idletasks()
+    width = popup_root.winfo_width()
+    height = popup_root.winfo_height()
+    parent_x = root.winfo_rootx()
+    parent_y = root.winfo_rooty()
+    parent_width = root.winfo_width()
+    parent_height = root.winfo_height()
+    x = parent_x + (parent_width    // 2) - (width // 2)
+    y = parent_y + (parent_height   // 3) - (height // 2)
+    popup_root.geometry(f"{width}x{height}+{x}+{y}")
+    popup_root.wait_window(popup_root)
+
+
+kbtype_cache_btn = ttk.Button(
+    left_column_low_spacer,
+    width=25,
+    text='Keyboard Types',
+    command=show_kbtype_cache_dialog
+)
+
+# The "barebones" config file doesn't identify keyboard types
+if not barebones_config:
+    kbtype_cache_btn.pack(anchor=tk.SW, side=tk.BOTTOM, padx=10, pady=6)
+
 # Pack this after the help button, to get it to appear ABOVE the help button.
 left_column_low_spacer_label = tk.Label(
     left_column_low_spacer,
@@ -934,10 +991,8 @@ if __name__ == "__main__":
         monitor_toshy_settings_thread.daemon = True
         monitor_toshy_settings_thread.start()
 
-    # Start separate thread to watch the internal state of settings
-    monitor_internal_settings_thread = threading.Thread(target=fn_monitor_internal_settings)
-    monitor_internal_settings_thread.daemon = True
-    monitor_internal_settings_thread.start()
+    # Update the switches when another Toshy process changes settings
+    cnfg.add_change_listener(on_settings_changed)
 
     # Force the window to process pending tasks and calculate its dimensions
     root.update_idletasks()
@@ -207,38 +207,20 @@ loop = None
 # Settings class object setup
 config_dir_path = current_folder_path
 cnfg = Settings(config_dir_path)
-cnfg.watch_database()   # start watching the preferences file for changes
+# get settings changes from the other Toshy processes (D-Bus), in the GLib main loop below
+cnfg.watch_changes(run_main_loop=False)
 
 # Notification handler object setup
 from lib.notification_manager import NotificationManager
 ntfy = NotificationManager(icon_file_active, title='Toshy Alert (Tray)')
 
 
-def get_settings_list(settings_obj):
-    # get all attributes from the object
-    all_attributes = [attr for attr in dir(settings_obj) if not callable(getattr(settings_obj, attr)) and not attr.startswith("__")]
-    # filter out attributes that are not strings or booleans
-    filtered_attributes = [attr for attr in all_attributes if isinstance(getattr(settings_obj, attr), (str, bool, int))]
-    # create a list of tuples with attribute name and value pairs
-    settings_list = [(attr, getattr(settings_obj, attr)) for attr in filtered_attributes]
-    return settings_list
-
-
-# Store the settings as a list to see when they change.
-# Monitor from a separate thread.
-last_settings_list = get_settings_list(cnfg)
-
-
-def fn_monitor_internal_settings():
-    global last_settings_list
-    while True:
-        time.sleep(1)
-        if last_settings_list != get_settings_list(cnfg):
-            # debug(f'settings list changed...')
-            last_settings_list = get_settings_list(cnfg)
-            load_prefs_submenu_settings()
-            load_optspec_layout_submenu_settings()
-            load_kbtype_submenu_settings()
+def on_settings_changed():
+    """Update the menu items when settings change (called by the Settings object)."""
+    if not barebones_config:
+        GLib.idle_add(load_prefs_submenu_settings)
+        GLib.idle_add(load_optspec_layout_submenu_settings)
+        GLib.idle_add(load_kbtype_submenu_settings)
 
 
 sysctl_cmd      = f"{shutil.which('systemctl')}"
@@ -555,15 +537,10 @@ if not barebones_config:
         set_item_active_with_retry(Caps2Esc_Cmd_item, cnfg.Caps2Esc_Cmd)
         set_item_active_with_retry(Enter2Ent_Cmd_item, cnfg.Enter2Ent_Cmd)
 
-    def save_prefs_settings(widget):
-        cnfg.forced_numpad      = forced_numpad_item.get_active()
-        cnfg.media_arrows_fix   = media_arrows_fix_item.get_active()
-        cnfg.multi_lang         = multi_lang_item.get_active()
-        cnfg.ST3_in_VSCode      = ST3_in_VSCode_item.get_active()
-        cnfg.Caps2Cmd           = Caps2Cmd_item.get_active()
-        cnfg.Caps2Esc_Cmd       = Caps2Esc_Cmd_item.get_active()
-        cnfg.Enter2Ent_Cmd      = Enter2Ent_Cmd_item.get_active()
-        cnfg.save_settings()
+    def save_prefs_settings(widget, key):
+        # only write the preference of the item that was toggled
+        if getattr(cnfg, key) != widget.get_active():
+            cnfg.set(key, widget.get_active())
         GLib.idle_add(load_prefs_submenu_settings)  # Queue the update to run in GTK's main loop
 
     ###############################################################
@@ -576,37 +553,37 @@ if not barebones_config:
 
     multi_lang_item = Gtk.CheckMenuItem(label='Alt_Gr on Right Cmd')
     multi_lang_item.set_active(cnfg.multi_lang)
-    multi_lang_item.connect('toggled', save_prefs_settings)
+    multi_lang_item.connect('toggled', save_prefs_settings, 'multi_lang')
     prefs_submenu.append(multi_lang_item)
 
     Caps2Cmd_item = Gtk.CheckMenuItem(label='CapsLock is Cmd')
     Caps2Cmd_item.set_active(cnfg.Caps2Cmd)
-    Caps2Cmd_item.connect('toggled', save_prefs_settings)
+    Caps2Cmd_item.connect('toggled', save_prefs_settings, 'Caps2Cmd')
     prefs_submenu.append(Caps2Cmd_item)
 
     Caps2Esc_Cmd_item = Gtk.CheckMenuItem(label='CapsLock is Esc & Cmd')
     Caps2Esc_Cmd_item.set_active(cnfg.Caps2Esc_Cmd)
-    Caps2Esc_Cmd_item.connect('toggled', save_prefs_settings)
+    Caps2Esc_Cmd_item.connect('toggled', save_prefs_settings, 'Caps2Esc_Cmd')
     prefs_submenu.append(Caps2Esc_Cmd_item)
 
     Enter2Ent_Cmd_item = Gtk.CheckMenuItem(label='Enter is Ent & Cmd')
     Enter2Ent_Cmd_item.set_active(cnfg.Enter2Ent_Cmd)
-    Enter2Ent_Cmd_item.connect('toggled', save_prefs_settings)
+    Enter2Ent_Cmd_item.connect('toggled', save_prefs_settings, 'Enter2Ent_Cmd')
     prefs_submenu.append(Enter2Ent_Cmd_item)
 
     ST3_in_VSCode_item = Gtk.CheckMenuItem(label='Sublime3 in VSCode')
     ST3_in_VSCode_item.set_active(cnfg.ST3_in_VSCode)
-    ST3_in_VSCode_item.connect('toggled', save_prefs_settings)
+    ST3_in_VSCode_item.connect('toggled', save_prefs_settings, 'ST3_in_VSCode')
     prefs_submenu.append(ST3_in_VSCode_item)
 
     forced_numpad_item = Gtk.CheckMenuItem(label='Forced Numpad')
     forced_numpad_item.set_active(cnfg.forced_numpad)
-    forced_numpad_item.connect('toggled', save_prefs_settings)
+    forced_numpad_item.connect('toggled', save_prefs_settings, 'forced_numpad')
     prefs_submenu.append(forced_numpad_item)
 
     media_arrows_fix_item = Gtk.CheckMenuItem(label='Media Arrows Fix')
     media_arrows_fix_item.set_active(cnfg.media_arrows_fix)
-    media_arrows_fix_item.connect('toggled', save_prefs_settings)
+    media_arrows_fix_item.connect('toggled', save_prefs_settings, 'media_arrows_fix')
     prefs_submenu.append(media_arrows_fix_item)
 
     # End of Preferences submenu
@@ -623,8 +600,7 @@ if not barebones_config:
         if not menu_item.get_active():
             return
         
-        cnfg.optspec_layout = layout
-        cnfg.save_settings()
+        cnfg.set('optspec_layout', layout)
         load_optspec_layout_submenu_settings()
 
     # OptSpec layout submenu
@@ -662,8 +638,7 @@ if not barebones_config:
         if not menu_item.get_active():
             return
         
-        cnfg.override_kbtype = kbtype
-        cnfg.save_settings()
+        cnfg.set('override_kbtype', kbtype)
 
         GLib.idle_add(load_kbtype_submenu_settings)
 
@@ -732,8 +707,7 @@ if not barebones_config:
     def save_autostart_tray_icon_setting(menu_item):
         autostart_tray_icon_setting = autostart_tray_icon_item.get_active()
         # debug(f'{autostart_tray_icon_setting = }')
-        cnfg.autostart_tray_icon    = autostart_tray_icon_setting
-        cnfg.save_settings()
+        cnfg.set('autostart_tray_icon', autostart_tray_icon_setting)
         load_autostart_tray_icon_setting()
 
         tray_dt_file_name       = 'Toshy_Tray.desktop'
@@ -807,10 +781,8 @@ def main():
         monitor_toshy_services_thread.daemon = True
         monitor_toshy_services_thread.start()
 
-    # Start separate thread to watch the internal state of settings
-    monitor_internal_settings_thread = threading.Thread(target=fn_monitor_internal_settings)
-    monitor_internal_settings_thread.daemon = True
-    monitor_internal_settings_thread.start()
+    # Update the menu items when another Toshy process changes settings
+    cnfg.add_change_listener(on_settings_changed)
 
     if not barebones_config:
         # load the settings for the preferences submenu toggle items
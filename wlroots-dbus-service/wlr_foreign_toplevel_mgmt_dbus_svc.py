@@ -6,6 +6,7 @@ import os
 import sys
 import dbus
 import time
+import array
 import signal
 import platform
 import dbus.service
@@ -41,7 +42,8 @@ os.environ['PYTHONPATH'] = f'{parent_folder_path}:{current_folder_path}:{existin
 
 # local imports now that path is prepped
 import lib.env as env
-from wayland_protocols.wlr_foreign_toplevel_management_unstable_v1 import ZwlrForeignToplevelManagerV1
+from wayland_protocols.wlr_foreign_toplevel_management_unstable_v1 import (
+    ZwlrForeignToplevelManagerV1, ZwlrForeignToplevelHandleV1 )
 
 if os.name == 'posix' and os.geteuid() == 0:
     error("This app should not be run as root/superuser.")
@@ -128,6 +130,15 @@ TOSHY_WLR_DBUS_SVC_IFACE        = 'org.toshy.Wlroots'
 
 wlr_app_id                      = "NO_WLR_DATA"
 wlr_title                       = "NO_WLR_DATA"
+wlr_transient                   = False
+wlr_fullscreen                  = False
+dbus_object                     = None
+
+# Info of each toplevel (app_id, title, parent, activated, fullscreen), by handle.
+# The active window is the toplevel with the "activated" state, updated on its
+# "done" event.
+toplevels                       = {}
+active_toplevel                 = None
 
 try:
     display = Display()
@@ -146,9 +157,12 @@ else:
 toplevel_manager                = None
 
 
-def registry_global(event):
-    if event.interface == ZwlrForeignToplevelManagerV1.interface_name:
-        toplevel_manager = registry.bind(event.name, ZwlrForeignToplevelManagerV1, event.version)
+def registry_global(registry, name, interface, version):
+    global toplevel_manager
+    if interface == ZwlrForeignToplevelManagerV1.interface_name:
+        # version 3 of the protocol adds the "parent" event (transient windows)
+        version = min(version, ZwlrForeignToplevelManagerV1.version)
+        toplevel_manager = registry.bind(name, ZwlrForeignToplevelManagerV1, version)
         toplevel_manager.dispatcher["toplevel"] = handle_toplevel
 
 registry.dispatcher["global"]    = registry_global
@@ -165,25 +179,71 @@ class DBUS_Object(dbus.service.Object):
     def GetActiveWindow(self):
         debug(f'{LOG_PFX}: GetActiveWindow() called...')
         return {'app_id':           wlr_app_id,
-                'title':            wlr_title}
+                'title':            wlr_title,
+                'transient':        dbus.Boolean(wlr_transient),
+                'fullscreen':       dbus.Boolean(wlr_fullscreen)}
+
+    @dbus.service.signal(TOSHY_WLR_DBUS_SVC_IFACE, signature='')
+    def WindowStateChanged(self):
+        # tells the Toshy config to ask for the window properties again
+        debug(f'{LOG_PFX}: Active window state changed')
+
+
+def handle_app_id(toplevel, app_id):
+    debug(f"Window app_id changed: '{app_id}'")
+    toplevels[toplevel]['app_id'] = app_id
+
+
+def handle_title(toplevel, title):
+    debug(f"Window title changed: '{title}'")
+    toplevels[toplevel]['title'] = title
+
+
+def handle_parent(toplevel, parent):
+    toplevels[toplevel]['parent'] = parent
+
+
+def handle_state(toplevel, state):
+    # the states are an array of uint32 values, which may arrive as raw bytes
+    if isinstance(state, (bytes, bytearray)):
+        state = array.array('I', state)
+    toplevels[toplevel]['activated'] = ZwlrForeignToplevelHandleV1.state.activated in state
+    toplevels[toplevel]['fullscreen'] = ZwlrForeignToplevelHandleV1.state.fullscreen in state
 
 
-def handle_app_id(event):
-    debug(f"Window app_id changed: '{event.app_id}'")
-    global wlr_app_id
-    wlr_app_id   = event.app_id
+def handle_done(toplevel):
+    global wlr_app_id, wlr_title, wlr_transient, wlr_fullscreen, active_toplevel
+    info = toplevels[toplevel]
+    if info['activated']:
+        # the Toshy config only asks again on its own when the app_id or title changes
+        old_state       = (active_toplevel, wlr_transient, wlr_fullscreen)
+        same_title      = (wlr_app_id, wlr_title) == (info['app_id'], info['title'])
+        active_toplevel = toplevel
+        wlr_app_id      = info['app_id']
+        wlr_title       = info['title']
+        wlr_transient   = info['parent'] is not None
+        wlr_fullscreen  = info['fullscreen']
+        new_state       = (active_toplevel, wlr_transient, wlr_fullscreen)
+        if same_title and old_state != new_state and dbus_object is not None:
+            dbus_object.WindowStateChanged()
 
 
-def handle_title(event):
-    debug(f"Window title changed: '{event.title}'")
-    global wlr_title
-    wlr_title    = event.title
+def handle_closed(toplevel):
+    global active_toplevel
+    toplevels.pop(toplevel, None)
+    if toplevel is active_toplevel:
+        active_toplevel = None
 
 
-def handle_toplevel(toplevel):
-    # Here, you should set up event listeners for the toplevel
+def handle_toplevel(toplevel_manager, toplevel):
+    toplevels[toplevel] = { 'app_id': "NO_WLR_DATA", 'title': "NO_WLR_DATA",
+                            'parent': None, 'activated': False, 'fullscreen': False }
     toplevel.dispatcher["app_id"]   = handle_app_id
     toplevel.dispatcher["title"]    = handle_title
+    toplevel.dispatcher["parent"]   = handle_parent
+    toplevel.dispatcher["state"]    = handle_state
+    toplevel.dispatcher["done"]     = handle_done
+    toplevel.dispatcher["closed"]   = handle_closed
 
 
 def wayland_event_check():
@@ -194,6 +254,7 @@ def wayland_event_check():
 
 
 def main():
+    global dbus_object
 
     # Initialize the D-Bus main loop
     dbus.mainloop.glib.DBusGMainLoop(set_as_default=True)
@@ -203,7 +264,7 @@ def main():
 
     # Create the DBUS_Object
     try:
-        DBUS_Object(session_bus, TOSHY_WLR_DBUS_SVC_PATH, TOSHY_WLR_DBUS_SVC_IFACE)
+        dbus_object = DBUS_Object(session_bus, TOSHY_WLR_DBUS_SVC_PATH, TOSHY_WLR_DBUS_SVC_IFACE)
     except DBusException as dbus_error:
         error(f"{LOG_PFX}: Error occurred while creating D-Bus service object:\n\t{dbus_error}")
         sys.exit(1)